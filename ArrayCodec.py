@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+文字列のプロパティに格納されている配列の復号・符号化
+    数値の配列: "1.0,0.5,0.0" (FLOAT_ARRAY_STRING、グラデーションのゾーンごとの値 pcl4mtl_zone_*)
+    色の配列: "r,g,b;r,g,b" (COLOR_ARRAY_STRING、グラデーションのゾーンの色 pcl4mtl_zone_colors)
+復号した値は型ごとの array に格納する
+"""
+
+from array import array
+
+from . import template as _MP
+
+
+_typecodes = {
+    _MP.AType.INT: "q",
+    _MP.AType.FLOAT: "d",
+    _MP.AType.BOOL: "b",
+}
+
+_TRUE_STRINGS = frozenset(("True", "true", "1"))
+
+
+def decode_array(s, attr_type=_MP.AType.FLOAT) -> array:
+    """
+    ","区切りの文字列を復号する
+    :param attr_type: 要素の型 (INT / FLOAT / BOOL)
+    """
+    typecode = _typecodes[attr_type]
+    if not s:
+        return array(typecode)
+    items = s.split(",")
+    # イテレータから直接作るより、一度リストにした方が速い
+    if attr_type == _MP.AType.BOOL:
+        return array(typecode, list(map(_TRUE_STRINGS.__contains__, items)))
+    return array(typecode, list(map(int if attr_type == _MP.AType.INT else float, items)))
+
+
+def to_list(values: array, attr_type=_MP.AType.FLOAT) -> list:
+    """
+    復号した配列をJSONに書き出す値のリストにする
+    """
+    if attr_type == _MP.AType.BOOL:
+        return list(map(bool, values))
+    return values.tolist()
+
+
+def encode_array(values, attr_type=_MP.AType.FLOAT) -> str:
+    """
+    値の列を","区切りの文字列にする
+    """
+    if attr_type == _MP.AType.BOOL:
+        return ",".join("True" if x else "False" for x in values)
+    return ",".join(map(str, values))
+
+
+def decode_color_array(s):
+    """
+    ";"区切りの色の文字列を復号する
+    :return: (全ての色の成分を並べた array('d'), 各色の成分数の array('B'))
+    """
+    if not s:
+        return array("d"), array("B")
+    values = array("d", list(map(float, s.replace(";", ",").split(","))))
+    widths = array("B", (x.count(",") + 1 for x in s.split(";")))
+    return values, widths
+
+
+def split_colors(values, widths, components=None, alpha=None) -> list:
+    """
+    並べた色の成分を色ごとのリストに分ける
+    :param components: Noneでない場合は各色の先頭からこの数の成分だけを取り出す
+    :param alpha: Noneでない場合は各色の末尾に追加する値
+    """
+    ret = []
+    i = 0
+    for width in widths:
+        color = values[i:i + (width if components is None else min(width, components))]
+        i += width
+        if alpha is not None:
+            color.append(alpha)
+        ret.append(color)
+    return ret
+
+
+def encode_color_array(colors) -> str:
+    """
+    色の列を";"区切りの文字列にする
+    """
+    return ";".join([",".join(map(str, x)) for x in colors])
@@ -0,0 +1,645 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+JSONと同じ内容を保持するバイナリ形式のBridgeファイル
+
+ファイル構成
+    ヘッダー: マジック(8) + フォーマットバージョン(u32) + 予約(u32)
+    本体:     セクション (LineNode, MaterialNode, ...) の各ノードの値を順に並べたもの
+    目次:     文字列テーブル、オブジェクトの形状テーブル、トップレベルの値とセクションのノードオフセット表
+    トレーラー: 目次のオフセット(u64) + マジック(8)
+
+値はタグ(u8)に続けて格納する
+    キー・ノード名・文字列値は文字列テーブルのインデックスで表す
+    全要素がfloatのリスト (色・ベクトル・グラデーションの位置など) は固定長のf64配列として格納する
+    オブジェクトは「キーと値の型の並び」を形状テーブルに登録し、スカラー値を1つの固定長レコードにまとめて格納する
+      (同じ種類のノードは同じ形状を共有するため、1回のstruct.unpack_fromで復元できる)
+    スカラー値だけのリスト (カーブの制御点など) も同様に要素の型の並びを形状テーブルに登録して格納する
+    同じ形状のリストのリスト (カーブの制御点列など) は行列として1つのレコードにまとめて格納する
+float はf64で格納するため、JSONとの相互変換で値は変化しない
+"""
+
+import io
+import sys
+import struct
+from array import array
+from collections import OrderedDict
+
+from .template import KeyNames as _keys
+from . import Settings
+from . import JsonStream
+
+
+MAGIC = b"PCL4BRDG"
+
+"""
+ノードを格納するセクションのキー
+"""
+SECTION_KEYS = (_keys.LINES, _keys.MATERIALS, _keys.POSITION_GROUP, _keys.COLOR_GROUP)
+
+_HEADER = struct.Struct("<8sII")
+_TRAILER = struct.Struct("<Q8s")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_SECTION_ENTRY = struct.Struct("<IQ")
+
+# 値のタグ
+_T_NULL = 0
+_T_FALSE = 1
+_T_TRUE = 2
+_T_INT = 3
+_T_FLOAT = 4
+_T_STRING = 5
+_T_LIST = 6
+_T_OBJECT = 7
+_T_FLOAT_ARRAY = 8
+_T_BIG_INT = 9
+_T_RECORD = 10
+_T_RECORD_ARRAY = 11
+
+# オブジェクトの形状に登録するフィールドの型
+_F_NULL = 0
+_F_BOOL = 1
+_F_INT = 2
+_F_FLOAT = 3
+_F_STRING = 4
+_F_VALUE = 5
+
+_FIELD_FORMATS = {_F_BOOL: "?", _F_INT: "q", _F_FLOAT: "d", _F_STRING: "I"}
+
+# トップレベルの要素の種類
+_ROOT_VALUE = 0
+_ROOT_SECTION = 1
+
+_I64_MIN = -(1 << 63)
+_I64_MAX = (1 << 63) - 1
+_NEEDS_BYTESWAP = sys.byteorder != "little"
+
+
+def is_binary_file_path(file_path) -> bool:
+    return file_path.lower().endswith(Settings.BINARY_FILE_EXTENSION)
+
+
+class _Shape:
+    """
+    オブジェクトの形状 (キーと値の型の並び)
+    """
+
+    def __init__(self, fields, strings):
+        """
+        :param fields: (キーの文字列ID, フィールドの型) のタプル
+        :param strings: 文字列テーブル
+        """
+        self.fields = fields
+        self.keys = tuple(strings[key_id] for key_id, _ in fields)
+        fixed = [(key, field_type) for key, (_, field_type) in zip(self.keys, fields) if field_type in _FIELD_FORMATS]
+        self.fixed_keys = tuple(key for key, _ in fixed)
+        self.struct = struct.Struct("<" + "".join(_FIELD_FORMATS[field_type] for _, field_type in fixed))
+        self.string_keys = tuple(key for key, field_type in fixed if field_type == _F_STRING)
+        self.value_keys = tuple(key for key, (_, field_type) in zip(self.keys, fields) if field_type == _F_VALUE)
+
+
+class _RecordShape:
+    """
+    スカラー値だけのリストの形状 (要素の型の並び)
+    """
+
+    def __init__(self, field_types):
+        self.field_types = field_types
+        fixed = [i for i, field_type in enumerate(field_types) if field_type != _F_NULL]
+        self.struct = struct.Struct("<" + "".join(_FIELD_FORMATS[field_types[i]] for i in fixed))
+        self.string_indices = tuple(i for i, field_type in enumerate(field_types) if field_type == _F_STRING)
+        # Noneを含まない場合は復元した値をそのまま要素とする
+        self.fixed_indices = None if len(fixed) == len(field_types) else tuple(fixed)
+        self._array_structs = dict()
+
+    def get_array_struct(self, count):
+        """
+        count個のレコードをまとめて読み書きするstruct.Struct
+        """
+        array_struct = self._array_structs.get(count)
+        if array_struct is None:
+            array_struct = struct.Struct("<" + self.struct.format[1:] * count)
+            self._array_structs[count] = array_struct
+        return array_struct
+
+    def make_record(self, values):
+        if self.fixed_indices is None:
+            result = list(values)
+        else:
+            result = [None] * len(self.field_types)
+            for i, value in zip(self.fixed_indices, values):
+                result[i] = value
+        return result
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings = []
+        self._string_ids = dict()
+        self.shapes = []
+        self._shape_ids = dict()
+        self.record_shapes = []
+        self._record_shape_ids = dict()
+
+    def string_id(self, s):
+        string_id = self._string_ids.get(s)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._string_ids[s] = string_id
+            self.strings.append(s)
+        return string_id
+
+    def encode(self, value, out: bytearray):
+        value_type = type(value)
+        if value is None:
+            out.append(_T_NULL)
+        elif value_type is bool:
+            out.append(_T_TRUE if value else _T_FALSE)
+        elif value_type is float:
+            out.append(_T_FLOAT)
+            out += _F64.pack(value)
+        elif value_type is str:
+            out.append(_T_STRING)
+            out += _U32.pack(self.string_id(value))
+        elif value_type is int:
+            if _I64_MIN <= value <= _I64_MAX:
+                out.append(_T_INT)
+                out += _I64.pack(value)
+            else:
+                out.append(_T_BIG_INT)
+                out += _U32.pack(self.string_id(str(value)))
+        elif isinstance(value, dict):
+            out.append(_T_OBJECT)
+            self._encode_object(value, out)
+        elif isinstance(value, (list, tuple)):
+            if len(value) > 0 and all(type(x) is float for x in value):
+                out.append(_T_FLOAT_ARRAY)
+                out += _U32.pack(len(value))
+                values = array("d", value)
+                if _NEEDS_BYTESWAP:
+                    values.byteswap()
+                out += values.tobytes()
+            elif not self._encode_record_array(value, out) and not self._encode_record(value, out):
+                out.append(_T_LIST)
+                out += _U32.pack(len(value))
+                for x in value:
+                    self.encode(x, out)
+        elif isinstance(value, bool):
+            self.encode(bool(value), out)
+        elif isinstance(value, int):
+            self.encode(int(value), out)
+        elif isinstance(value, float):
+            self.encode(float(value), out)
+        elif isinstance(value, str):
+            self.encode(str(value), out)
+        else:
+            raise TypeError(f"Object of type {value_type.__name__} is not serializable")
+
+    def _encode_record_array(self, values, out: bytearray):
+        """
+        同じ形状のスカラー値だけのリストのリストを行列として書き出す
+        :return: 書き出した場合はTrue
+        """
+        if len(values) == 0 or not all(isinstance(x, (list, tuple)) for x in values):
+            return False
+        shape_id = None
+        fixed_values = []
+        for row in values:
+            row_shape_id = self._register_record(row, fixed_values)
+            if row_shape_id is None or (shape_id is not None and row_shape_id != shape_id):
+                return False
+            shape_id = row_shape_id
+        shape = self.record_shapes[shape_id]
+        if shape.struct.size == 0:
+            return False
+        out.append(_T_RECORD_ARRAY)
+        out += _U32.pack(shape_id)
+        out += _U32.pack(len(values))
+        out += shape.get_array_struct(len(values)).pack(*fixed_values)
+        return True
+
+    def _encode_record(self, values, out: bytearray):
+        """
+        スカラー値だけのリストを固定長レコードとして書き出す
+        :return: 書き出した場合はTrue
+        """
+        fixed_values = []
+        shape_id = self._register_record(values, fixed_values)
+        if shape_id is None:
+            return False
+        out.append(_T_RECORD)
+        out += _U32.pack(shape_id)
+        out += self.record_shapes[shape_id].struct.pack(*fixed_values)
+        return True
+
+    def _register_record(self, values, fixed_values):
+        """
+        スカラー値だけのリストの形状を登録し、格納する値をfixed_valuesに追加する
+        :return: 形状のID (スカラー値以外を含む場合はNone)
+        """
+        if len(values) == 0:
+            return None
+        field_types = []
+        for value in values:
+            value_type = type(value)
+            if value is None:
+                field_types.append(_F_NULL)
+                continue
+            if value_type is bool:
+                field_types.append(_F_BOOL)
+            elif value_type is float:
+                field_types.append(_F_FLOAT)
+            elif value_type is str:
+                field_types.append(_F_STRING)
+                value = self.string_id(value)
+            elif value_type is int and _I64_MIN <= value <= _I64_MAX:
+                field_types.append(_F_INT)
+            else:
+                return None
+            fixed_values.append(value)
+        field_types = tuple(field_types)
+        shape_id = self._record_shape_ids.get(field_types)
+        if shape_id is None:
+            shape_id = len(self.record_shapes)
+            self._record_shape_ids[field_types] = shape_id
+            self.record_shapes.append(_RecordShape(field_types))
+        return shape_id
+
+    def _encode_object(self, obj, out: bytearray):
+        fields = []
+        fixed_values = []
+        other_values = []
+        for key, value in obj.items():
+            if not isinstance(key, str):
+                raise TypeError("Object keys must be str.")
+            value_type = type(value)
+            if value is None:
+                field_type = _F_NULL
+            elif value_type is bool:
+                field_type = _F_BOOL
+            elif value_type is float:
+                field_type = _F_FLOAT
+            elif value_type is str:
+                field_type = _F_STRING
+                value = self.string_id(value)
+            elif value_type is int and _I64_MIN <= value <= _I64_MAX:
+                field_type = _F_INT
+            else:
+                field_type = _F_VALUE
+            fields.append((self.string_id(key), field_type))
+            if field_type == _F_VALUE:
+                other_values.append(value)
+            elif field_type != _F_NULL:
+                fixed_values.append(value)
+        fields = tuple(fields)
+        shape = self._shape_ids.get(fields)
+        if shape is None:
+            shape = (len(self.shapes), _Shape(fields, self.strings))
+            self._shape_ids[fields] = shape
+            self.shapes.append(shape[1])
+        out += _U32.pack(shape[0])
+        out += shape[1].struct.pack(*fixed_values)
+        for value in other_values:
+            self.encode(value, out)
+
+    def encode_directory(self, root_items, out: bytearray):
+        """
+        :param root_items: (キー, 値) または (キー, [(ノードID, オフセット)]) のリスト
+        """
+        # 文字列テーブルに追加されるものを先に登録する
+        encoded_root = bytearray()
+        encoded_root += _U32.pack(len(root_items))
+        for key, is_section, value in root_items:
+            encoded_root += _U32.pack(self.string_id(key))
+            if is_section:
+                encoded_root.append(_ROOT_SECTION)
+                encoded_root += _U32.pack(len(value))
+                for nid, offset in value:
+                    encoded_root += _SECTION_ENTRY.pack(self.string_id(nid), offset)
+            else:
+                encoded_root.append(_ROOT_VALUE)
+                encoded_root += value
+
+        out += _U32.pack(len(self.strings))
+        for s in self.strings:
+            encoded = s.encode("utf-8", "surrogatepass")
+            out += _U32.pack(len(encoded))
+            out += encoded
+        out += _U32.pack(len(self.shapes))
+        for shape in self.shapes:
+            out += _U32.pack(len(shape.fields))
+            for key_id, field_type in shape.fields:
+                out += _U32.pack(key_id)
+                out.append(field_type)
+        out += _U32.pack(len(self.record_shapes))
+        for shape in self.record_shapes:
+            out += _U32.pack(len(shape.field_types))
+            out += bytes(shape.field_types)
+        out += encoded_root
+
+
+class _Decoder:
+    def __init__(self, strings, shapes, record_shapes):
+        self.strings = strings
+        self.shapes = shapes
+        self.record_shapes = record_shapes
+
+    def decode(self, buf, pos):
+        """
+        :return: (値, 次の位置)
+        """
+        tag = buf[pos]
+        pos += 1
+        if tag == _T_OBJECT:
+            shape = self.shapes[_U32.unpack_from(buf, pos)[0]]
+            pos += 4
+            result = dict.fromkeys(shape.keys)
+            if len(shape.fixed_keys) > 0:
+                result.update(zip(shape.fixed_keys, shape.struct.unpack_from(buf, pos)))
+                pos += shape.struct.size
+            if len(shape.string_keys) > 0:
+                strings = self.strings
+                for key in shape.string_keys:
+                    result[key] = strings[result[key]]
+            for key in shape.value_keys:
+                result[key], pos = self.decode(buf, pos)
+            return result, pos
+        if tag == _T_RECORD:
+            shape = self.record_shapes[_U32.unpack_from(buf, pos)[0]]
+            pos += 4
+            result = shape.make_record(shape.struct.unpack_from(buf, pos))
+            pos += shape.struct.size
+            if len(shape.string_indices) > 0:
+                strings = self.strings
+                for i in shape.string_indices:
+                    result[i] = strings[result[i]]
+            return result, pos
+        if tag == _T_RECORD_ARRAY:
+            shape = self.record_shapes[_U32.unpack_from(buf, pos)[0]]
+            count = _U32.unpack_from(buf, pos + 4)[0]
+            pos += 8
+            array_struct = shape.get_array_struct(count)
+            values = array_struct.unpack_from(buf, pos)
+            pos += array_struct.size
+            width = len(values) // count
+            result = [shape.make_record(values[i:i + width]) for i in range(0, len(values), width)]
+            if len(shape.string_indices) > 0:
+                strings = self.strings
+                for record in result:
+                    for i in shape.string_indices:
+                        record[i] = strings[record[i]]
+            return result, pos
+        if tag == _T_FLOAT_ARRAY:
+            count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            values = array("d")
+            values.frombytes(buf[pos:pos + count * 8])
+            if _NEEDS_BYTESWAP:
+                values.byteswap()
+            return values.tolist(), pos + count * 8
+        if tag == _T_LIST:
+            count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            result = []
+            for _ in range(count):
+                value, pos = self.decode(buf, pos)
+                result.append(value)
+            return result, pos
+        if tag == _T_STRING:
+            return self.strings[_U32.unpack_from(buf, pos)[0]], pos + 4
+        if tag == _T_FLOAT:
+            return _F64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _T_INT:
+            return _I64.unpack_from(buf, pos)[0], pos + 8
+        if tag == _T_NULL:
+            return None, pos
+        if tag == _T_TRUE:
+            return True, pos
+        if tag == _T_FALSE:
+            return False, pos
+        if tag == _T_BIG_INT:
+            return int(self.strings[_U32.unpack_from(buf, pos)[0]]), pos + 4
+        raise ValueError(f"Invalid value tag {tag} at {pos - 1}.")
+
+
+class BinaryStreamWriter:
+    """
+    バイナリ形式でノードを逐次書き出す
+    JsonStream.JsonStreamWriterと同じ呼び出し方で、トップレベルの値とセクション内のノードを書き出す
+    """
+
+    def __init__(self, fp, buffer_size=1 << 16):
+        """
+        :param fp: 書き込み先のバイナリストリーム (シーク不要)
+        :param buffer_size: fp.writeを呼ぶまでに溜め込む最大バイト数
+        """
+        self._fp = fp
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._encoder = _Encoder()
+        self._offset = 0
+        self._root_items = []
+        self._section = None
+        self._depth = 0
+
+    def begin_object(self):
+        if self._depth != 0:
+            raise ValueError("Nested objects must be written with write_item.")
+        self._depth = 1
+        self._write(_HEADER.pack(MAGIC, Settings.BINARY_FORMAT_VERSION, 0))
+
+    def begin_object_item(self, key):
+        if self._depth != 1:
+            raise ValueError("Sections can only be placed at the top level.")
+        self._depth = 2
+        self._section = []
+        self._root_items.append((key, True, self._section))
+
+    def write_item(self, key, value):
+        if self._depth == 2:
+            self._section.append((key, self._offset))
+            encoded = bytearray()
+            self._encoder.encode(value, encoded)
+            self._write(encoded)
+        elif self._depth == 1:
+            encoded = bytearray()
+            self._encoder.encode(value, encoded)
+            self._root_items.append((key, False, encoded))
+        else:
+            raise ValueError("begin_object must be called first.")
+
+    def end_object(self):
+        if self._depth == 2:
+            self._section = None
+            self._depth = 1
+        elif self._depth == 1:
+            self._depth = 0
+            directory_offset = self._offset
+            directory = bytearray()
+            self._encoder.encode_directory(self._root_items, directory)
+            self._write(directory)
+            self._write(_TRAILER.pack(directory_offset, MAGIC))
+        else:
+            raise ValueError("No object to end.")
+
+    def flush(self):
+        if len(self._buffer) > 0:
+            self._fp.write(self._buffer)
+            self._buffer = bytearray()
+
+    def _write(self, data):
+        self._buffer += data
+        self._offset += len(data)
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+
+class BinaryNodeFile:
+    """
+    バイナリ形式のファイルを開き、トップレベルの値を保持する
+    セクション内のノードはオフセット表から参照された時点で読み込む (JsonStream.JsonNodeFileと同じく values から参照する)
+    """
+
+    def __init__(self, fp, cache_size=256, data=None):
+        """
+        :param fp: シーク可能なバイナリストリーム (closeでBinaryNodeFileと共に閉じる)
+        :param cache_size: セクションごとに保持しておく読み込み済みノードの数
+        :param data: ファイル全体を読み込み済みの場合はその内容 (ノードをfpから読まずにここから復元する)
+        """
+        self.values = OrderedDict()
+        self._fp = fp
+        self._data = data
+        try:
+            self._read_directory(cache_size)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            self.close()
+            raise ValueError(f"Binary bridge file is broken. ({e})")
+        except Exception:
+            self.close()
+            raise
+
+    def _read_directory(self, cache_size):
+        fp = self._fp
+        magic, version, _ = _HEADER.unpack(fp.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not a binary bridge file.")
+        if version != Settings.BINARY_FORMAT_VERSION:
+            raise ValueError("Binary format version is not supported.")
+        fp.seek(-_TRAILER.size, 2)
+        trailer_offset = fp.tell()
+        directory_offset, magic = _TRAILER.unpack(fp.read(_TRAILER.size))
+        if magic != MAGIC or not _HEADER.size <= directory_offset <= trailer_offset:
+            raise ValueError("Binary bridge file is broken.")
+        fp.seek(directory_offset)
+        buf = fp.read(trailer_offset - directory_offset)
+
+        pos = 0
+        count = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        strings = []
+        for _ in range(count):
+            length = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            strings.append(buf[pos:pos + length].decode("utf-8", "surrogatepass"))
+            pos += length
+        count = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        shapes = []
+        for _ in range(count):
+            field_count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            fields = []
+            for _ in range(field_count):
+                fields.append((_U32.unpack_from(buf, pos)[0], buf[pos + 4]))
+                pos += 5
+            shapes.append(_Shape(tuple(fields), strings))
+        count = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        record_shapes = []
+        for _ in range(count):
+            field_count = _U32.unpack_from(buf, pos)[0]
+            pos += 4
+            record_shapes.append(_RecordShape(tuple(buf[pos:pos + field_count])))
+            pos += field_count
+        self._decoder = _Decoder(strings, shapes, record_shapes)
+
+        # 本体のノードは連続して並んでいるため、次のノードの先頭 (最後は目次の先頭) を終端とする
+        sections = []
+        offsets = [directory_offset]
+        count = _U32.unpack_from(buf, pos)[0]
+        pos += 4
+        for _ in range(count):
+            key = strings[_U32.unpack_from(buf, pos)[0]]
+            kind = buf[pos + 4]
+            pos += 5
+            if kind == _ROOT_SECTION:
+                entry_count = _U32.unpack_from(buf, pos)[0]
+                pos += 4
+                entries = []
+                for _ in range(entry_count):
+                    string_id, offset = _SECTION_ENTRY.unpack_from(buf, pos)
+                    pos += _SECTION_ENTRY.size
+                    entries.append((strings[string_id], offset))
+                    offsets.append(offset)
+                sections.append((key, entries))
+                self.values[key] = None
+            else:
+                self.values[key], pos = self._decoder.decode(buf, pos)
+        offsets.sort()
+        ends = dict(zip(offsets, offsets[1:]))
+        for key, entries in sections:
+            ranges = OrderedDict((nid, (offset, ends.get(offset, directory_offset))) for nid, offset in entries)
+            self.values[key] = JsonStream.JsonLazySection(self, ranges, cache_size)
+
+    def read_range(self, byte_range):
+        start, end = byte_range
+        try:
+            if self._data is not None:
+                return self._decoder.decode(self._data, start)[0]
+            self._fp.seek(start)
+            return self._decoder.decode(self._fp.read(end - start), 0)[0]
+        except (struct.error, IndexError) as e:
+            raise ValueError(f"Binary bridge file is broken. ({e})")
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def dump(json_dict, fp):
+    """
+    JSONから読み込んだ辞書をバイナリ形式で書き出す
+    """
+    writer = BinaryStreamWriter(fp)
+    writer.begin_object()
+    for key, value in json_dict.items():
+        if key in SECTION_KEYS and isinstance(value, dict):
+            writer.begin_object_item(key)
+            for nid, node in value.items():
+                writer.write_item(nid, node)
+            writer.end_object()
+        else:
+            writer.write_item(key, value)
+    writer.end_object()
+    writer.flush()
+
+
+def load(fp):
+    """
+    バイナリ形式のファイル全体を読み込み、JSONを読み込んだ場合と同じ辞書を返す
+    :param fp: バイナリストリーム
+    """
+    data = fp.read()
+    with BinaryNodeFile(io.BytesIO(data), cache_size=0, data=data) as binary_file:
+        return dict((k, dict(v.items()) if isinstance(v, JsonStream.JsonLazySection) else v)
+                    for k, v in binary_file.values.items())
@@ -1,9 +1,14 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 # The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
 
+import os
+import contextlib
 import bpy
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 from . import Utilities
+from . import Settings
+from . import Profiling
+from . import ExportSnapshot
 from .Exporter import Exporter
 from .Importer import Importer, ImporterSettings
 from . import Translation
@@ -12,6 +17,12 @@ NODE_TREE_TYPE_NAME = "Pencil4NodeTreeType"
 LINE_EDITOR_MENU_NAME = "PCL4_MT_LineEditorMenu"
 current_filepath = ""
 
+# バックグラウンドでの書き出しの完了を確認する間隔 [秒]
+BACKGROUND_WRITE_POLL_INTERVAL = 0.2
+
+# バックグラウンドで書き出し中のジョブ
+background_writes = []
+
 class ImportItem(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty()
     is_import: bpy.props.BoolProperty()
@@ -53,7 +64,7 @@ class PCL4BRIDGE_OT_ShowImportDialogOperator(bpy.types.Operator, ImportHelper):
     filename_ext = ".json"
 
     filter_glob: bpy.props.StringProperty(
-        default="*.json",
+        default="*.json;*.json.gz;*.pcl4b",
         options={'HIDDEN'},
     )
 
@@ -73,6 +84,12 @@ class PCL4BRIDGE_OT_ShowImportDialogOperator(bpy.types.Operator, ImportHelper):
     material_list_selected_index: bpy.props.IntProperty()
     is_import_disabled_specific_brush_settings: bpy.props.BoolProperty(default=False)
     is_import_disabled_reduction_settings: bpy.props.BoolProperty(default=False)
+    is_streaming_import: bpy.props.BoolProperty(default=False)
+    is_skip_unchanged: bpy.props.BoolProperty(default=False)
+    is_performance_report: bpy.props.BoolProperty(default=False)
+    is_capture_profile: bpy.props.BoolProperty(default=False)
+    # 差分ファイルは選択や読み込みモードに関わらず全ての差分を適用するため、一覧とモードを無効にする
+    is_patch_file: bpy.props.BoolProperty(default=False, options={'HIDDEN'})
 
     def __del__(self):
         global current_filepath
@@ -85,6 +102,7 @@ class PCL4BRIDGE_OT_ShowImportDialogOperator(bpy.types.Operator, ImportHelper):
         if current_filepath != self.filepath:
             current_filepath = self.filepath
             importer = Importer()
+            self.is_patch_file = importer.is_patch_file(current_filepath)
             lines, materials = importer.enumerate_lines_and_materials_from_json_file(current_filepath)
             for list_prop, json_items in ((self.line_list, lines), (self.material_list, materials)):
                 list_prop.clear()
@@ -112,13 +130,18 @@ class PCL4BRIDGE_OT_ShowImportDialogOperator(bpy.types.Operator, ImportHelper):
         settings.custom_scale_factor = self.scale_factor
         settings.should_import_disabled_brush = self.is_import_disabled_specific_brush_settings
         settings.should_import_disabled_reduction = self.is_import_disabled_reduction_settings
+        settings.should_skip_unchanged = self.is_skip_unchanged
 
         importer = Importer()
-        try:
-            with open(self.filepath, mode="r") as f:
-                importer.import_from_json_file(f, context.window_manager.pcl4bridge_target_node_tree, context.scene, settings)
-        except ValueError as e:
-            self.report({"ERROR"}, f"Pencil+ 4 Bridge: {e.args[0]}")
+        perf = importer.enable_instrumentation() if self.is_performance_report else None
+        with capture_profile(self, self.is_capture_profile, self.filepath):
+            try:
+                importer.import_from_file(self.filepath, context.window_manager.pcl4bridge_target_node_tree,
+                                          context.scene, settings, streaming=self.is_streaming_import)
+            except ValueError as e:
+                self.report({"ERROR"}, f"Pencil+ 4 Bridge: {e.args[0]}")
+        if perf is not None:
+            write_performance_report(self, perf, self.filepath)
 
         context.window_manager.pcl4bridge_target_node_tree = None
         return {"FINISHED"}
@@ -173,7 +196,11 @@ class PCL4BRIDGE_PT_ImportOptions(bpy.types.Panel, PCL4BRIDGE_PT_ImportMixin):
 
     def draw_impl(self, operator, _):
         layout = self.layout
-        layout.prop(operator, "import_mode", expand=True)
+        if operator.is_patch_file:
+            layout.label(text="Patch File: all differences are applied", text_ctxt=Translation.ctxt, icon="INFO")
+        row = layout.row()
+        row.enabled = not operator.is_patch_file
+        row.prop(operator, "import_mode", expand=True)
 
 class PCL4BRIDGE_PT_ImportUnitConversion(bpy.types.Panel, PCL4BRIDGE_PT_ImportMixin):
     bl_idname = "PCL4BRIDGE_PT_ImportUnitConversion"
@@ -200,7 +227,7 @@ class PCL4BRIDGE_PT_ImportMaterials(bpy.types.Panel, PCL4BRIDGE_PT_ImportMixin):
 
     def draw_impl(self, operator, _):
         layout = self.layout
-        layout.enabled = operator.import_materials
+        layout.enabled = operator.import_materials and not operator.is_patch_file
         layout.template_list(
             "PCL4BRIDGE_UL_LineListView", "materials",
             operator, "material_list",
@@ -227,7 +254,7 @@ class PCL4BRIDGE_PT_ImportLines(bpy.types.Panel, PCL4BRIDGE_PT_ImportMixin):
         layout.template_ID(bpy.context.window_manager, "pcl4bridge_target_node_tree", new="pcl4bridge.new_line_node_tree")
         layout.separator()
         col = layout.column()
-        col.enabled = bpy.context.window_manager.pcl4bridge_target_node_tree is not None
+        col.enabled = bpy.context.window_manager.pcl4bridge_target_node_tree is not None and not operator.is_patch_file
         col.template_list(
             "PCL4BRIDGE_UL_LineListView", "lines",
             operator, "line_list",
@@ -250,6 +277,100 @@ class PCL4BRIDGE_PT_ImportOthers(bpy.types.Panel, PCL4BRIDGE_PT_ImportMixin):
                     "is_import_disabled_reduction_settings",
                     text="Import disabled Reduction Settings",
                     text_ctxt=Translation.ctxt)
+        layout.prop(operator,
+                    "is_streaming_import",
+                    text="Low Memory Import",
+                    text_ctxt=Translation.ctxt)
+        layout.prop(operator,
+                    "is_skip_unchanged",
+                    text="Skip Unchanged",
+                    text_ctxt=Translation.ctxt)
+        layout.prop(operator,
+                    "is_performance_report",
+                    text="Performance Report",
+                    text_ctxt=Translation.ctxt)
+        layout.prop(operator,
+                    "is_capture_profile",
+                    text="Capture Profile",
+                    text_ctxt=Translation.ctxt)
+
+
+def write_performance_report(operator, perf, file_path):
+    """
+    処理時間の計測結果をBridgeファイルの隣にJSONで書き出し、コンソールに表示する
+    """
+    perf.write_json(file_path + Settings.PERFORMANCE_REPORT_FILE_EXTENSION)
+    print(perf.format())
+    operator.report({"INFO"}, f"Pencil+ 4 Bridge: {perf.summary()}")
+
+
+@contextlib.contextmanager
+def capture_profile(operator, is_enabled, file_path):
+    """
+    withの範囲をプロファイルし、結果をBridgeファイルの隣に書き出す
+    """
+    if not is_enabled:
+        yield
+        return
+    capture = Profiling.ProfileCapture()
+    try:
+        with capture:
+            yield
+    finally:
+        prof_path, _ = capture.write(file_path)
+        operator.report({"INFO"}, f"Pencil+ 4 Bridge: {os.path.basename(prof_path)} {capture.summary()}")
+
+
+class PCL4BRIDGE_OT_ReportBackgroundWrite(bpy.types.Operator):
+    """
+    バックグラウンドでの書き出しの結果をレポートとして表示する (タイマーから呼び出す)
+    """
+    bl_label = "Report Background Write"
+    bl_idname = "pcl4bridge.report_background_write"
+    bl_options = {"INTERNAL"}
+
+    message: bpy.props.StringProperty()
+    is_error: bpy.props.BoolProperty()
+
+    def execute(self, context):
+        self.report({"ERROR"} if self.is_error else {"INFO"}, self.message)
+        return {"FINISHED"}
+
+
+def report_background_write(job):
+    if job.error is not None:
+        message = f"Pencil+ 4 Bridge: {os.path.basename(job.file_path)} write failed: {job.error}"
+    else:
+        message = f"Pencil+ 4 Bridge: {os.path.basename(job.file_path)} written in {job.elapsed:.2f}s"
+    try:
+        bpy.ops.pcl4bridge.report_background_write(message=message, is_error=job.error is not None)
+    except RuntimeError:
+        # レポートを表示できない状態 (ウィンドウが無いなど) ではコンソールに表示する
+        print(message)
+
+
+def start_background_write(snapshot, file_path, compact, compression_level):
+    """
+    スナップショットを別スレッドで書き出し、完了をタイマーで確認する
+    """
+    # 同じファイルへの書き出しが残っている場合は、一時ファイルを共有しないように完了を待つ
+    for job in background_writes:
+        if job.file_path == file_path:
+            job.join()
+    background_writes.append(ExportSnapshot.BackgroundWrite(snapshot, file_path, compact, compression_level).start())
+    if not bpy.app.timers.is_registered(poll_background_writes):
+        bpy.app.timers.register(poll_background_writes, first_interval=BACKGROUND_WRITE_POLL_INTERVAL)
+
+
+def poll_background_writes():
+    """
+    書き出しが完了したジョブの結果をレポートとして表示する
+    :return: 次に確認するまでの秒数 (全ての書き出しが完了した場合はNone)
+    """
+    for job in [x for x in background_writes if x.is_done()]:
+        background_writes.remove(job)
+        report_background_write(job)
+    return BACKGROUND_WRITE_POLL_INTERVAL if len(background_writes) > 0 else None
 
 
 class PCL4BRIDGE_OT_ShowExportDialogOperator(bpy.types.Operator, ExportHelper):
@@ -261,17 +382,110 @@ class PCL4BRIDGE_OT_ShowExportDialogOperator(bpy.types.Operator, ExportHelper):
     filename_ext = ".json"
 
     filter_glob: bpy.props.StringProperty(
-        default="*.json",
+        default="*.json;*.json.gz;*.pcl4b",
         options={'HIDDEN'},
     )
 
+    file_format_items = (
+        ("JSON", "JSON", "JSON", 0),
+        ("JSON_GZ", "JSON (gzip)", "JSON compressed with gzip", 1),
+        ("BINARY", "Binary", "Binary format for fast loading", 2)
+    )
+
+    file_format: bpy.props.EnumProperty(name="Format", items=file_format_items, default="JSON")
+    is_compact: bpy.props.BoolProperty(name="Compact", default=False)
+    is_incremental: bpy.props.BoolProperty(
+        name="Incremental",
+        description="Reuse the previous export results for data that has not been changed",
+        default=False)
+    compression_level: bpy.props.IntProperty(
+        name="Compression Level", default=Settings.DEFAULT_COMPRESSION_LEVEL, min=1, max=9)
+    is_performance_report: bpy.props.BoolProperty(
+        name="Performance Report",
+        description="Write the processing time of each step to a .perf.json file next to the exported file",
+        default=False)
+    is_capture_profile: bpy.props.BoolProperty(
+        name="Capture Profile",
+        description="Profile the export and write .prof and collapsed stack files next to the exported file",
+        default=False)
+    is_background_write: bpy.props.BoolProperty(
+        name="Background Write",
+        description="Write the file in a background thread. Blender is blocked only while the scene data is read",
+        default=False)
+    baseline_filepath: bpy.props.StringProperty(
+        name="Baseline",
+        description="Export only the differences from this file",
+        subtype="FILE_PATH",
+        default="")
+
+    def get_file_extension(self):
+        if self.file_format == "JSON_GZ":
+            return Settings.COMPRESSED_JSON_FILE_EXTENSION
+        if self.file_format == "BINARY":
+            return Settings.BINARY_FILE_EXTENSION
+        return Settings.JSON_FILE_EXTENSION
+
+    def check(self, context):
+        # ExportHelper.checkは最後の拡張子しか置き換えないため、".json.gz" を考慮して自前で拡張子を整える
+        filepath = self.filepath
+        if os.path.basename(filepath):
+            for ext in (Settings.COMPRESSED_JSON_FILE_EXTENSION,
+                        Settings.JSON_FILE_EXTENSION,
+                        Settings.BINARY_FILE_EXTENSION):
+                if filepath.lower().endswith(ext):
+                    filepath = filepath[:-len(ext)]
+                    break
+            filepath += self.get_file_extension()
+        if filepath != self.filepath:
+            self.filepath = filepath
+            return True
+        return False
+
     def execute(self, context):
+        self.check(context)
         exporter = Exporter()
-        json_str = exporter.export_to_json_string(context)
-        with open(self.filepath, mode="w") as f:
-            f.write(json_str)
+        perf = exporter.enable_instrumentation() if self.is_performance_report else None
+        try:
+            with capture_profile(self, self.is_capture_profile, self.filepath):
+                if self.is_background_write and not self.baseline_filepath:
+                    # メインスレッドではデータの読み出しだけを行う
+                    snapshot = exporter.create_snapshot(context, incremental=self.is_incremental)
+                    start_background_write(snapshot, self.filepath, self.is_compact, self.compression_level)
+                    self.report({"INFO"}, f"Pencil+ 4 Bridge: writing {os.path.basename(self.filepath)} "
+                                          f"in the background")
+                else:
+                    exporter.export_to_file(context, self.filepath,
+                                            compact=self.is_compact,
+                                            compression_level=self.compression_level,
+                                            incremental=self.is_incremental,
+                                            baseline_file_path=bpy.path.abspath(self.baseline_filepath)
+                                            if self.baseline_filepath else None)
+        except ValueError as e:
+            self.report({"ERROR"}, f"Pencil+ 4 Bridge: {e.args[0]}")
+            return {"CANCELLED"}
+        if perf is not None:
+            write_performance_report(self, perf, self.filepath)
         return {"FINISHED"}
 
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "file_format")
+        row = layout.row()
+        row.enabled = self.file_format != "BINARY"
+        row.prop(self, "is_compact")
+        row = layout.row()
+        row.enabled = self.file_format == "JSON_GZ"
+        row.prop(self, "compression_level")
+        row = layout.row()
+        row.enabled = not self.baseline_filepath
+        row.prop(self, "is_incremental")
+        row = layout.row()
+        row.enabled = not self.baseline_filepath
+        row.prop(self, "is_background_write")
+        layout.prop(self, "baseline_filepath")
+        layout.prop(self, "is_performance_report")
+        layout.prop(self, "is_capture_profile")
+
 
 class BridgeMenuMixin:
     def draw(self, context):
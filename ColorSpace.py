@@ -0,0 +1,69 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+sRGBとリニアの色空間の変換
+Bridgeファイルの色はsRGB、Blenderのプロパティの色はリニアで扱う
+
+要素数が NUMPY_MIN_SIZE 以上の場合はNumPy (Blenderに同梱) でまとめて変換する
+NumPyの変換結果は要素ごとの変換と TOLERANCE 以内で一致する (NumPyのpowの実装により最下位ビットが異なる場合がある)
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TOLERANCE = 1e-12
+
+"""
+NumPyで変換する最小の要素数
+これより少ない場合はNumPyの配列の作成の方が時間がかかるため、要素ごとに変換する
+"""
+NUMPY_MIN_SIZE = 256
+
+_SRGB_THRESHOLD = 0.040448
+_LINEAR_THRESHOLD = 0.003231
+_GAMMA = 2.4
+_INV_GAMMA = 1 / 2.4
+
+
+def _srgb_to_linear_list(values):
+    return [x / 12.92 if x <= _SRGB_THRESHOLD else pow((x + 0.055) / 1.055, _GAMMA) for x in values]
+
+
+def _linear_to_srgb_list(values):
+    return [1.055 * pow(x, _INV_GAMMA) - 0.055 if x > _LINEAR_THRESHOLD else 12.92 * x for x in values]
+
+
+def _srgb_to_linear_numpy(values):
+    a = np.asarray(values, dtype=np.float64)
+    # np.where は両方の式を評価するため、負の値のべき乗にならないようにしきい値で切り詰める
+    curve = np.power((np.maximum(a, _SRGB_THRESHOLD) + 0.055) / 1.055, _GAMMA)
+    return np.where(a <= _SRGB_THRESHOLD, a / 12.92, curve).tolist()
+
+
+def _linear_to_srgb_numpy(values):
+    a = np.asarray(values, dtype=np.float64)
+    curve = 1.055 * np.power(np.maximum(a, _LINEAR_THRESHOLD), _INV_GAMMA) - 0.055
+    return np.where(a > _LINEAR_THRESHOLD, curve, 12.92 * a).tolist()
+
+
+def srgb_to_linear(values) -> list:
+    """
+    :param values: sRGBの値の列 (色の各成分を並べたもの)
+    :return: リニアの値のリスト
+    """
+    if np is not None and len(values) >= NUMPY_MIN_SIZE:
+        return _srgb_to_linear_numpy(values)
+    return _srgb_to_linear_list(values)
+
+
+def linear_to_srgb(values) -> list:
+    """
+    :param values: リニアの値の列 (色の各成分を並べたもの)
+    :return: sRGBの値のリスト
+    """
+    if np is not None and len(values) >= NUMPY_MIN_SIZE:
+        return _linear_to_srgb_numpy(values)
+    return _linear_to_srgb_list(values)
@@ -0,0 +1,110 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+インポートの単位 (ライン・マテリアル) ごとの、Bridgeファイルの内容のハッシュ
+インポートしたラインのノード・マテリアルにハッシュを保存し、上書きインポートでハッシュが一致する単位のインポートを省略する
+インポート後にBlender上で変更された単位を検出するため、インポート直後のBlender上のデータのハッシュも保存する
+"""
+
+import pickle
+import hashlib
+from collections import namedtuple
+
+"""
+ハッシュの計算方法・インポートの結果が変わる変更をした場合は値を変更する
+(以前のインポートで保存したハッシュと一致しなくなり、全ての単位を再度インポートする)
+"""
+HASH_VERSION = 2
+
+"""
+ハッシュの計算に使用するpickleのプロトコル (変更するとハッシュが変わる)
+"""
+_PICKLE_PROTOCOL = 4
+
+"""
+インポートの単位
+    key: 単位のID (ラインのノード・Pencil+ 4 マテリアルのID)
+    name: ハッシュを保存するBlender上のデータ (ラインのノード・マテリアル) の名前
+    content_hash: 単位に含まれる全てのノードの内容のハッシュ (計算できない場合はNone)
+    members: 単位に含まれるノードの (セクションのキー, ID) のfrozenset
+"""
+ContentUnit = namedtuple("ContentUnit", ("key", "name", "content_hash", "members"))
+
+
+class _HashWriter:
+    """
+    pickleの出力を直接ハッシュに渡すファイルの代わり
+    """
+
+    def __init__(self):
+        self.hash = hashlib.blake2b(digest_size=16)
+
+    def write(self, data):
+        self.hash.update(data)
+
+
+def hash_content(members, get_node, context_values=()):
+    """
+    ノードの辞書はpickleで直列化する (JSONへの変換より十分に速い)
+    memoを使用しないため、同じ値であれば辞書・文字列のオブジェクトの共有の仕方によらず同じ結果になる
+    辞書のキーの順序もハッシュに含める (同じファイルからは同じ順序で読み込まれる)
+    :param members: ハッシュに含めるノードの (セクションのキー, ID) の列
+    :param get_node: (セクションのキー, ID) からノードの辞書を返す関数 (ノードがない場合はNone)
+    :param context_values: インポートの結果に影響するノード以外の値 (スケールなど)
+    :return: ハッシュの16進数の文字列 (直列化できない値を含む場合はNone)
+    """
+    content = [HASH_VERSION, list(context_values)]
+    content.extend((section_key, nid, get_node(section_key, nid)) for section_key, nid in sorted(members, key=repr))
+    return _hash(content)
+
+
+def hash_state(items):
+    """
+    Blender上のデータのハッシュ
+    :param items: Exporterが返す (ID, 書き出し結果・フィンガープリント) の列
+    :return: ハッシュの16進数の文字列 (直列化できない値を含む場合はNone)
+    """
+    return _hash([HASH_VERSION, list(items)])
+
+
+def _hash(content):
+    writer = _HashWriter()
+    pickler = pickle.Pickler(writer, protocol=_PICKLE_PROTOCOL)
+    pickler.fast = True
+    try:
+        pickler.dump(content)
+    except (pickle.PicklingError, TypeError, ValueError, RecursionError):
+        return None
+    return writer.hash.hexdigest()
+
+
+def create_unit(key, name, members, get_node, context_values=()) -> ContentUnit:
+    members = frozenset(members)
+    return ContentUnit(key, name, hash_content(members, get_node, context_values), members)
+
+
+def find_unchanged(units, is_unchanged) -> set:
+    """
+    インポートを省略できる単位を返す
+    ノードを共有する単位は、どれか1つが変更されている場合は全て変更されているものとする
+    (共有するノードを作り直す単位と、古いノードを参照し続ける単位が混在しないようにするため)
+    :param is_unchanged: 単位を受け取り、前回のインポートから単位もBlender上のデータも変更されていない場合にTrueを返す関数
+    :return: 省略できる単位のキーの集合
+    """
+    unchanged = dict()
+    changed_members = set()
+    for unit in units:
+        if is_unchanged(unit):
+            unchanged[unit.key] = unit
+        else:
+            changed_members.update(unit.members)
+    is_updated = True
+    while is_updated:
+        is_updated = False
+        for key, unit in list(unchanged.items()):
+            if not unit.members.isdisjoint(changed_members):
+                del unchanged[key]
+                changed_members.update(unit.members)
+                is_updated = True
+    return set(unchanged)
@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+from collections import namedtuple
+
+from . import template as _MP
+from . import Schema
+
+
+SWITCH_BRUSH = "brush"
+SWITCH_REDUCTION = "reduction"
+
+"""
+参照先のノードを読み込むかを切り替えるパラメータの規則
+    ノードの種類ごとに (パラメータ名の接尾辞, 切り替えの種類) のタプル
+    NODEパラメータ X に対して X + 接尾辞 のパラメータがある場合は、その値がFalseなら参照先を辿らない
+    最初に一致した規則を使用する
+"""
+_switch_rules = {
+    _MP.LineSetNode: (("SpecificOn", SWITCH_BRUSH),
+                      ("On", SWITCH_REDUCTION)),
+}
+
+"""
+ノードの参照の定義
+    json_name: 参照するパラメータのJSON上の名前
+    is_list: NODE_LISTの場合はTrue
+    switch_json_name: 参照を切り替えるパラメータのJSON上の名前 (切り替えがない場合はNone)
+    switch: 切り替えの種類 (SWITCH_BRUSH / SWITCH_REDUCTION)
+"""
+ReferenceDef = namedtuple("ReferenceDef", ("json_name", "is_list", "switch_json_name", "switch"))
+
+
+def compile_references(node_class) -> tuple:
+    json_names = set(x.json_name for x in Schema.get_params(node_class))
+    rules = _switch_rules.get(node_class, ())
+    references = []
+    for param in Schema.get_params(node_class):
+        if param.attr_type != _MP.AType.NODE and param.attr_type != _MP.AType.NODE_LIST:
+            continue
+        switch_json_name, switch = next(((param.json_name + suffix, switch) for suffix, switch in rules
+                                         if param.json_name + suffix in json_names), (None, None))
+        references.append(ReferenceDef(param.json_name, param.attr_type == _MP.AType.NODE_LIST,
+                                       switch_json_name, switch))
+    return tuple(references)
+
+
+_references = dict()
+
+
+def get_references(node_class) -> tuple:
+    references = _references.get(node_class)
+    if references is None:
+        references = compile_references(node_class)
+        _references[node_class] = references
+    return references
+
+
+class DependencyIndex:
+    """
+    Bridgeファイルのノードの参照関係の索引
+    ノードごとの参照先は最初に辿った時に作成して保持する
+    """
+
+    def __init__(self, nodes_dict):
+        """
+        :param nodes_dict: IDをキーにしたノードの辞書 (ストリーミングインポートの遅延読み込みの辞書でもよい)
+        """
+        self.nodes_dict = nodes_dict
+        self.export_name_to_schema = Schema.get_registry().export_name_to_schema
+        self._edges = dict()
+
+    def get_edges(self, nid) -> tuple:
+        """
+        :return: ノードの参照先の (ID, 切り替えの種類, 切り替えの値) のタプル
+        """
+        edges = self._edges.get(nid)
+        if edges is None:
+            edges = self._create_edges(nid)
+            self._edges[nid] = edges
+        return edges
+
+    def _create_edges(self, nid) -> tuple:
+        data = self.nodes_dict.get(nid)
+        if not isinstance(data, dict):
+            return ()
+        schema = self.export_name_to_schema.get(data.get(_MP.KeyNames.NODE_TYPE))
+        params = data.get(_MP.KeyNames.PARAMS)
+        if schema is None or not isinstance(params, dict):
+            return ()
+        edges = []
+        for json_name, is_list, switch_json_name, switch in get_references(schema.node_class):
+            value = params.get(json_name)
+            if value is None:
+                continue
+            is_on = True
+            if switch_json_name is not None:
+                if switch_json_name not in params:
+                    continue
+                is_on = bool(params[switch_json_name])
+            if is_list:
+                edges.extend((x, switch, is_on) for x in value if x is not None)
+            else:
+                edges.append((value, switch, is_on))
+        return tuple(edges)
+
+    def closure(self, root_ids, ignored_switches=frozenset()) -> set:
+        """
+        ノードから参照を辿って到達できる全てのノードのIDを返す
+        :param root_ids: 辿り始めるノードのID (戻り値に含む)
+        :param ignored_switches: 値がFalseでも参照先を辿る切り替えの種類
+        """
+        visited = set()
+        stack = [x for x in root_ids if x is not None]
+        edges_cache = self._edges
+        while len(stack) > 0:
+            nid = stack.pop()
+            if nid in visited:
+                continue
+            visited.add(nid)
+            edges = edges_cache.get(nid)
+            if edges is None:
+                edges = self.get_edges(nid)
+            for child_id, switch, is_on in edges:
+                if child_id not in visited and (is_on or switch in ignored_switches):
+                    stack.append(child_id)
+        return visited
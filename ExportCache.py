@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+import bpy
+
+
+class FragmentCache:
+    """
+    差分エクスポート用に、ノードツリー・マテリアル・グループごとの書き出し結果 (ノードの辞書) を保持する
+    depsgraph_update_post で更新が通知されたデータだけを再度書き出す
+    ノードツリーは、更新されたツリーの中でもノードごとのフィンガープリント (パラメータの変換前の値) を比較し、
+    変化したノードだけを再度書き出す (どのノードが変更されたかは通知されないため)
+    シーンなどツリー以外の更新が通知された場合は、全てのツリーでフィンガープリントを比較する
+    書き出すシーン・ビューレイヤーが変わった場合は、上書きされたパラメータの値が変わるため全てを書き出し直す
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._entries = dict()
+        self._dirty_keys = set()
+        self._is_all_dirty = True
+        self._fingerprint = None
+
+    @staticmethod
+    def make_key(id_data):
+        """
+        ノードツリー・マテリアルのキャッシュのキー
+        """
+        return ("NodeTree" if isinstance(id_data, bpy.types.NodeTree) else "Material", id_data.name_full)
+
+    def mark_dirty(self, id_data):
+        self._dirty_keys.add(self.make_key(id_data))
+
+    def mark_all_dirty(self):
+        self._is_all_dirty = True
+
+    def begin_export(self, fingerprint):
+        """
+        :param fingerprint: シーン全体に関わる情報 (シーン・ビューレイヤー・名前の一覧など)
+                            前回と異なる場合は前回の書き出し結果を破棄し、全てを書き出し直す
+        """
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._entries.clear()
+            self._is_all_dirty = True
+
+    def end_export(self):
+        self._dirty_keys.clear()
+        self._is_all_dirty = False
+
+    def get_clean(self, key):
+        """
+        更新されていないデータの書き出し結果を返す
+        :return: 書き出し結果、更新されている場合やキャッシュが無い場合はNone
+        """
+        if self._is_all_dirty or key in self._dirty_keys:
+            return None
+        return self._entries.get(key)
+
+    def get(self, key):
+        """
+        更新の有無にかかわらず前回の書き出し結果を返す
+        """
+        return self._entries.get(key)
+
+    def put(self, key, fragments):
+        self._entries[key] = fragments
+
+
+_cache = FragmentCache()
+
+
+def get_cache() -> FragmentCache:
+    return _cache
+
+
+@bpy.app.handlers.persistent
+def _on_depsgraph_update_post(scene, depsgraph):
+    for update in depsgraph.updates:
+        id_data = update.id
+        if isinstance(id_data, (bpy.types.NodeTree, bpy.types.Material)):
+            if getattr(id_data, "is_embedded_data", False):
+                # マテリアルのノードツリーの更新は持ち主を特定できないため全て更新対象とする
+                _cache.mark_all_dirty()
+            else:
+                _cache.mark_dirty(id_data)
+        elif isinstance(id_data, bpy.types.Object):
+            # オブジェクトは名前しか書き出さないため、名前の変更はbegin_exportのフィンガープリントで検出する
+            continue
+        else:
+            _cache.mark_all_dirty()
+
+
+@bpy.app.handlers.persistent
+def _on_data_replaced(*args):
+    _cache.clear()
+
+
+_handlers = (
+    (bpy.app.handlers.depsgraph_update_post, _on_depsgraph_update_post),
+    (bpy.app.handlers.load_post, _on_data_replaced),
+    (bpy.app.handlers.undo_post, _on_data_replaced),
+    (bpy.app.handlers.redo_post, _on_data_replaced),
+)
+
+
+def register():
+    for handlers, handler in _handlers:
+        if handler not in handlers:
+            handlers.append(handler)
+
+
+def unregister():
+    for handlers, handler in _handlers:
+        if handler in handlers:
+            handlers.remove(handler)
+    _cache.clear()
@@ -0,0 +1,108 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+エクスポートのスナップショットと、その書き出し
+スナップショットはBlenderのデータから読み出した値だけを持ち、書き出し (JSON・バイナリへの変換、圧縮、ファイルへの書き込み) はbpyを参照しない
+そのため、メインスレッドでスナップショットを作成した後、書き出しを別スレッドで行うことができる
+"""
+
+import os
+import time
+import threading
+import contextlib
+
+from . import Utilities as util
+from . import Settings
+from . import JsonStream
+from . import BinaryFormat
+
+
+@contextlib.contextmanager
+def open_writer(file_path, compact=False, compression_level=Settings.DEFAULT_COMPRESSION_LEVEL):
+    """
+    拡張子に応じたライターでファイルを開く (.json / .json.gz / .pcl4b)
+    :param compact: Trueの場合はインデント無しで出力する (バイナリ形式では無視する)
+    """
+    if BinaryFormat.is_binary_file_path(file_path):
+        with open(file_path, mode="wb") as f:
+            yield BinaryFormat.BinaryStreamWriter(f)
+    else:
+        with util.open_bridge_file(file_path, "w", compression_level) as f:
+            yield JsonStream.JsonStreamWriter(f, indent=None if compact else 4)
+
+
+class ExportSnapshot:
+    """
+    書き出すデータのスナップショット
+        items: ノード以外のトップレベルの (キー, 値) のリスト
+        sections: セクションごとの (キー, [(ID, ノードの辞書)]) のリスト
+    """
+
+    def __init__(self, items, sections):
+        self.items = items
+        self.sections = sections
+
+    def write(self, writer):
+        writer.begin_object()
+        for key, value in self.items:
+            writer.write_item(key, value)
+        for key, nodes in self.sections:
+            writer.begin_object_item(key)
+            for nid, a_node_dict in nodes:
+                writer.write_item(nid, a_node_dict)
+            writer.end_object()
+        writer.end_object()
+        writer.flush()
+
+    def write_to_file(self, file_path, compact=False, compression_level=Settings.DEFAULT_COMPRESSION_LEVEL):
+        """
+        一時ファイルに書き出してから置き換えるため、書き出し途中のファイルが読み込まれることはない
+        """
+        directory, file_name = os.path.split(file_path)
+        temp_path = os.path.join(directory, Settings.TEMPORARY_FILE_PREFIX + file_name)
+        try:
+            with open_writer(temp_path, compact, compression_level) as writer:
+                self.write(writer)
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class BackgroundWrite:
+    """
+    スナップショットを別スレッドでファイルへ書き出す
+    """
+
+    def __init__(self, snapshot: ExportSnapshot, file_path, compact=False,
+                 compression_level=Settings.DEFAULT_COMPRESSION_LEVEL):
+        self.snapshot = snapshot
+        self.file_path = file_path
+        self.compact = compact
+        self.compression_level = compression_level
+        self.error = None
+        self.elapsed = 0.0
+        # Blenderの終了時も書き出しを完了させるため、デーモンスレッドにしない
+        self._thread = threading.Thread(target=self._run, daemon=False)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def is_done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.snapshot.write_to_file(self.file_path, self.compact, self.compression_level)
+        except Exception as e:
+            self.error = e
+        finally:
+            # 書き出し後はスナップショットを保持しない
+            self.snapshot = None
+            self.elapsed = time.perf_counter() - start
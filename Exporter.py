@@ -1,17 +1,123 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 # The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
 
+import io
 import bpy
-import json
 import math
-import inspect
-from collections import OrderedDict
+import operator
+from collections import OrderedDict, namedtuple
 
 from . import template as _MP
 from .template import KeyNames as _keyNames
 
 from . import Utilities as util
 from . import Settings
+from . import Schema
+from . import JsonStream
+from . import BinaryFormat
+from . import ExportCache
+from . import ExportSnapshot
+from . import Patch
+from . import Instrumentation
+from . import ColorSpace
+from . import ArrayCodec
+
+
+"""
+Blenderのクラス・ノードの種類ごとにコンパイルしたパラメータの読み出し処理
+    json_name: JSON上のパラメータ名
+    attr_type: AType
+    exporter: (読み出し元) を受け取り、JSONに書き出す値を返す関数
+    fingerprinter: (読み出し元) を受け取り、差分エクスポートで変化の検出に使用する値を返す関数
+"""
+CompiledParam = namedtuple("CompiledParam", ("json_name", "attr_type", "exporter", "fingerprinter"))
+
+
+def _same(value):
+    return value
+
+
+def _none(_):
+    return None
+
+
+def _from_percentage(value):
+    #  Blender: percentage -> JSON: raw value
+    return value / 100.0
+
+
+def _to_name(value):
+    return value.name if value is not None else None
+
+
+def _to_content_names(value):
+    return [x.content.name for x in value if x.content is not None]
+
+
+def _to_bool_list_8(value):
+    values = list(value)
+    return values + [False] * (8 - len(values))
+
+
+def _to_vector_2(value):
+    return [value.x, value.y]
+
+
+def _to_srgb_color(value):
+    return ColorSpace.linear_to_srgb(value[:3]) + [1.0]
+
+
+def _to_material_reference(value):
+    return {
+        "Name": value.name,
+        "Id": None,
+        "MaterialType": "Other"
+    }
+
+
+def _to_material_references(value):
+    return [_to_material_reference(x.content) for x in value if x.content is not None]
+
+
+def _decode_float_array(value):
+    return ArrayCodec.decode_array(value).tolist()
+
+
+def _decode_color_array(value):
+    values, widths = ArrayCodec.decode_color_array(value)
+    return ArrayCodec.split_colors(ColorSpace.linear_to_srgb(values), widths, components=3, alpha=1.0)
+
+
+"""
+読み出した値だけから書き出す値を求めるATypeの変換関数 (Blenderの値 -> JSONの値)
+"""
+_converters = {
+    _MP.AType.OBJECT: _to_name,
+    _MP.AType.OBJECT_LIST: _to_content_names,
+    _MP.AType.STRING: _same,
+    _MP.AType.INT: _same,
+    _MP.AType.FLOAT: _same,
+    _MP.AType.FLOAT_PERCENTAGE: _from_percentage,
+    _MP.AType.FLOAT_ANGLE: math.degrees,
+    _MP.AType.FLOAT_WITH_SCALE: _same,
+    _MP.AType.BOOL: _same,
+    _MP.AType.BOOL_LIST_8: _to_bool_list_8,
+    _MP.AType.FLOAT_VECTOR_2: _to_vector_2,
+    _MP.AType.COLOR: _to_srgb_color,
+    _MP.AType.IMAGE: _to_name,
+    _MP.AType.MATERIAL: _to_material_reference,
+    _MP.AType.MATERIAL_LIST: _to_material_references,
+    _MP.AType.POSITION_GROUP: _same,
+    _MP.AType.COLOR_GROUP: _same,
+    _MP.AType.FLOAT_ARRAY_STRING: _decode_float_array,
+    _MP.AType.COLOR_ARRAY_STRING: _decode_color_array,
+}
+
+"""
+書き出さないAType (常にNoneを書き出す)
+"""
+_ignored_types = frozenset((_MP.AType.GRADATION, _MP.AType.ADVANCED_MATERIAL, _MP.AType.USERDEF,
+                            _MP.AType.NOT_IMPLEMENTED))
 
 
 class Exporter:
@@ -48,148 +154,578 @@ class Exporter:
             _MP.AType.NOT_IMPLEMENTED: self._export_not_implemented
         }
 
-        self.node_types = dict((cls._blenderNodeName, cls) for _, cls
-                               in inspect.getmembers(_MP, inspect.isclass)
-                               if issubclass(cls, _MP.Node) and cls.is_blender_node())
+        # 差分エクスポートでノードの変化を検出するための値の取得関数 (変換処理を省いた値を返す)
+        self.fingerprinters = {
+            _MP.AType.CURVE: self._fingerprint_curve,
+            _MP.AType.FLOAT_PERCENTAGE: self.getattr,
+            _MP.AType.FLOAT_ANGLE: self.getattr,
+            _MP.AType.ENUM: self.getattr,
+            _MP.AType.FLOAT_VECTOR_2: self._fingerprint_sequence,
+            _MP.AType.COLOR: self._fingerprint_sequence,
+        }
+
+        self.node_types = Schema.get_registry().blender_node_name_to_schema
         
         self.context = None
 
+        # 差分エクスポートで使用するキャッシュ
+        self.fragment_cache = None
+
+        # 処理時間の計測 (enable_instrumentationで有効にする)
+        self.perf = Instrumentation.NULL_REPORT
+
+        # Blenderのクラス・ノードの種類ごとにコンパイルしたパラメータの読み出し処理
+        self._compiled_params = dict()
+
+        # Blenderのクラスごとの入力ソケットの識別子 -> インデックス
+        self._socket_indices = dict()
+
+    def enable_instrumentation(self) -> Instrumentation.PerformanceReport:
+        """
+            段階・ノードの種類・ATypeごとの処理時間と呼び出し回数の計測を有効にする
+            :return: 計測結果を記録するレポート
+        """
+        self.perf = Instrumentation.PerformanceReport("export")
+        self.exporters = self.perf.wrap_handlers(self.exporters)
+        self.perf.instrument_method(self, "_export_node_params",
+                                    lambda params_dict, node, node_params_def:
+                                    getattr(node_params_def, "_nameToExport", None) or node_params_def.__name__)
+        self._compiled_params.clear()
+        return self.perf
+
+    def get_compiled_params(self, cls, node_params_def) -> tuple:
+        """
+        Blenderのクラスのパラメータの読み出し処理を返す (エクスポーターごとに1度だけコンパイルする)
+        :param cls: 読み出し元のBlenderのクラス (ノード・マテリアル・ノードツリー)
+        :return: CompiledParamのタプル
+        """
+        key = (cls, node_params_def)
+        compiled = self._compiled_params.get(key)
+        if compiled is None:
+            compiled = self._compile_params(cls, node_params_def)
+            self._compiled_params[key] = compiled
+        return compiled
+
+    def _compile_params(self, cls, node_params_def) -> tuple:
+        is_instrumented = self.perf is not Instrumentation.NULL_REPORT
+        compiled = []
+        for json_name, attr_name, attr_type, _ in Schema.get_params(node_params_def):
+            if is_instrumented:
+                # ATypeごとの計測のため、計測する処理を呼び出す
+                exporter = self._compile_handler(self.exporters[attr_type], attr_name)
+                fingerprinter = self._compile_handler(self.fingerprinters.get(attr_type, self.exporters[attr_type]),
+                                                      attr_name)
+            else:
+                exporter, fingerprinter = self._compile_param(cls, attr_name, attr_type)
+            compiled.append(CompiledParam(json_name, attr_type, exporter, fingerprinter))
+        return tuple(compiled)
+
+    @staticmethod
+    def _compile_handler(handler, attr_name):
+        return lambda obj: handler(obj, attr_name)
+
+    def _compile_param(self, cls, attr_name, attr_type):
+        """
+        :return: (書き出す値を返す関数, 変化の検出に使用する値を返す関数)
+        """
+        if attr_type in _ignored_types:
+            return _none, _none
+        if attr_type == _MP.AType.NODE:
+            exporter = self._compile_node_connection(cls, attr_name)
+            return exporter, exporter
+        if attr_type == _MP.AType.NODE_LIST:
+            exporter = self._compile_node_list(cls, attr_name)
+            return exporter, exporter
+
+        read = self._compile_reader(cls, attr_name, [] if attr_type == _MP.AType.BOOL_LIST_8 else None)
+        if attr_type == _MP.AType.CURVE:
+            def export_curve(obj):
+                curve = read(obj)
+                ret = OrderedDict()
+                ret[_keyNames.BLENDER_CURVE_KEYS] = util.get_curve_points(obj, curve)
+                ret[_keyNames.UNIVERSAL_CURVE_KEYS] = util.make_universal_curve(obj, curve)
+                return ret
+            return export_curve, lambda obj: util.get_curve_points(obj, read(obj))
+        if attr_type == _MP.AType.ENUM:
+            return self._compile_enum(cls, attr_name, read), read
+
+        converter = _converters[attr_type]
+        exporter = read if converter is _same else lambda obj: converter(read(obj))
+        if attr_type == _MP.AType.FLOAT_PERCENTAGE or attr_type == _MP.AType.FLOAT_ANGLE:
+            return exporter, read
+        if attr_type == _MP.AType.FLOAT_VECTOR_2 or attr_type == _MP.AType.COLOR:
+            return exporter, lambda obj: tuple(read(obj))
+        return exporter, exporter
+
+    def _compile_reader(self, cls, attr_name, default=None):
+        """
+        プロパティの読み出し関数 (上書きされた値の読み出しが必要なクラスかをコンパイル時に判定する)
+        """
+        if hasattr(cls, "get_overrided_attr"):
+            return lambda obj: obj.get_overrided_attr(attr_name, default=default, context=self.context)
+        if default is not None:
+            return lambda obj: getattr(obj, attr_name, default)
+        return operator.attrgetter(attr_name)
+
+    @staticmethod
+    def _get_property_rna(cls, attr_name):
+        bl_rna = getattr(cls, "bl_rna", None)
+        return bl_rna.properties.get(attr_name) if bl_rna is not None else None
+
+    def _compile_enum(self, cls, attr_name, read):
+        property_rna = self._get_property_rna(cls, attr_name)
+        enum_values = dict((x.identifier, x.value) for x in property_rna.enum_items) if property_rna is not None \
+            else dict()
+
+        def export_enum(obj):
+            identifier = read(obj)
+            if identifier in enum_values:
+                return enum_values[identifier]
+            # 項目が動的に決まる列挙型は読み出し元の項目から探す
+            return self._export_enum(obj, attr_name)
+        return export_enum
+
+    def _compile_node_connection(self, cls, attr_name):
+        property_rna = self._get_property_rna(cls, attr_name)
+        if property_rna is None:
+            return self._compile_handler(self._export_node_connection, attr_name)
+        socket_id = property_rna.default
+        socket_indices = self._socket_indices.setdefault(cls, dict())
+
+        def export_node_connection(node):
+            inputs = node.inputs
+            index = socket_indices.get(socket_id)
+            if index is None or index >= len(inputs) or inputs[index].identifier != socket_id:
+                # ソケットの構成が同じクラスの他のノードと異なる場合は探し直す
+                index = next((i for i, x in enumerate(inputs) if x.identifier == socket_id), None)
+                if index is None:
+                    return None
+                socket_indices[socket_id] = index
+            child_node = inputs[index].get_connected_node()
+            return f"{child_node.tree_from_node().name}/{child_node.name}" if child_node is not None else None
+        return export_node_connection
+
+    def _compile_node_list(self, cls, attr_name):
+        property_rna = self._get_property_rna(cls, attr_name)
+        if property_rna is None:
+            return self._compile_handler(self._export_node_list, attr_name)
+        socket_id = property_rna.default
+
+        def export_node_list(node):
+            child_nodes = (x.get_connected_node() for x in node.inputs if x.identifier.startswith(socket_id))
+            return [f"{x.tree_from_node().name}/{x.name}" for x in child_nodes if x is not None]
+        return export_node_list
+
     def export_to_json_string(self, context):
         """
             PencilノードをJSONにエクスポートする
             :return: PencilノードをシリアライズしたJSON文字列
         """
-        
+
+        stream = io.StringIO()
+        self.export_to_stream(context, stream)
+        return stream.getvalue()
+
+    def export_to_file(self, context, file_path, compact=False, compression_level=Settings.DEFAULT_COMPRESSION_LEVEL,
+                       incremental=False, baseline_file_path=None):
+        """
+            Pencilノードをファイルへ書き出す
+            形式は拡張子で判別する (.json / .json.gz / .pcl4b)
+            :param baseline_file_path: 指定した場合はこのファイルとの差分だけを書き出す
+        """
+
+        if baseline_file_path:
+            try:
+                baseline = Patch.open_baseline(baseline_file_path)
+            except Exception as e:
+                raise ValueError("Baseline file load failed.")
+            with baseline, ExportSnapshot.open_writer(file_path, compact, compression_level) as writer:
+                self.context = context
+                self._write_patch_document(writer, baseline.values)
+        else:
+            with ExportSnapshot.open_writer(file_path, compact, compression_level) as writer:
+                self.context = context
+                self._write_document(writer, incremental)
+
+    def create_snapshot(self, context, incremental=False) -> ExportSnapshot.ExportSnapshot:
+        """
+            書き出す全てのデータをBlenderのデータから読み出し、Pythonの値だけを持つスナップショットを作成する
+            メインスレッドで呼び出すこと。スナップショットの書き出しはbpyを参照しないため、別スレッドで実行できる
+            (書き出しまでの間、全てのノードの辞書を保持する)
+            :param incremental: Trueの場合は前回のエクスポートから変化したノードだけを読み出し直す
+        """
+
+        self.context = context
+        if incremental:
+            self.fragment_cache = ExportCache.get_cache()
+            self.fragment_cache.begin_export(self._create_scene_fingerprint())
+        items = list(self._iter_header())
+        with self.perf.phase("index"):
+            items.append((_keyNames.INDEX, self._create_index()))
+        sections = []
+        for key, nodes in self._iter_sections():
+            with self.perf.phase(key):
+                sections.append((key, list(nodes)))
+        if self.fragment_cache is not None:
+            self.fragment_cache.end_export()
+            self.fragment_cache = None
+        return ExportSnapshot.ExportSnapshot(items, sections)
+
+    def export_to_stream(self, context, fp, compact=False, buffer_size=1 << 16, incremental=False):
+        """
+            PencilノードをJSONとしてストリームへ逐次書き出す
+            ノード毎に書き出すため、シーン全体の辞書と文字列を同時に保持しない
+            :param fp: 書き込み先のテキストストリーム
+            :param compact: Trueの場合はインデント無しで出力する
+            :param buffer_size: 書き込みバッファの最大文字数
+            :param incremental: Trueの場合は前回のエクスポートから変化したノードだけを書き出し直す
+        """
+
+        self.context = context
+        self._write_document(JsonStream.JsonStreamWriter(fp, indent=None if compact else 4, buffer_size=buffer_size),
+                             incremental)
+
+    def export_to_binary_stream(self, context, fp, incremental=False):
+        """
+            Pencilノードをバイナリ形式でストリームへ逐次書き出す
+            :param fp: 書き込み先のバイナリストリーム
+            :param incremental: Trueの場合は前回のエクスポートから変化したノードだけを書き出し直す
+        """
+
+        self.context = context
+        self._write_document(BinaryFormat.BinaryStreamWriter(fp), incremental)
+
+    def _write_document(self, writer, incremental=False):
+        if incremental:
+            self.fragment_cache = ExportCache.get_cache()
+            self.fragment_cache.begin_export(self._create_scene_fingerprint())
+        writer.begin_object()
+        for key, value in self._iter_header():
+            writer.write_item(key, value)
+        with self.perf.phase("index"):
+            writer.write_item(_keyNames.INDEX, self._create_index())
+        # ノードは生成しながら書き出すため、各セクションの時間は書き出しの時間を含む
+        for key, items in self._iter_sections():
+            with self.perf.phase(key):
+                writer.begin_object_item(key)
+                for nid, a_node_dict in items:
+                    writer.write_item(nid, a_node_dict)
+                writer.end_object()
+        writer.end_object()
+        with self.perf.phase("flush"):
+            writer.flush()
+        if self.fragment_cache is not None:
+            self.fragment_cache.end_export()
+            self.fragment_cache = None
+
+    def export_patch_to_stream(self, context, fp, baseline, compact=False):
+        """
+            ベースラインのファイルとの差分 (追加・削除・変更されたノードとパラメータ) だけをJSONとして書き出す
+            :param fp: 書き込み先のテキストストリーム
+            :param baseline: ベースラインのファイルのトップレベルの値 (Patch.open_baselineで開いたファイルのvalues)
+            :param compact: Trueの場合はインデント無しで出力する
+        """
+
+        self.context = context
+        self._write_patch_document(JsonStream.JsonStreamWriter(fp, indent=None if compact else 4), baseline)
+
+    def export_patch_to_binary_stream(self, context, fp, baseline):
+        """
+            ベースラインのファイルとの差分だけをバイナリ形式で書き出す
+            :param fp: 書き込み先のバイナリストリーム
+            :param baseline: ベースラインのファイルのトップレベルの値 (Patch.open_baselineで開いたファイルのvalues)
+        """
+
         self.context = context
-        json_dict = OrderedDict()
-        json_dict[_keyNames.PLATFORM] = f"Blender {bpy.app.version_string}"
-        json_dict[_keyNames.FILE_VERSION] = Settings.FILE_VERSION
-        json_dict[_keyNames.SCALE_FACTOR] = Settings.BLENDER_SCALE_FACTOR
-        json_dict[_keyNames.LINES] = self._create_node_dict()
-        json_dict[_keyNames.MATERIALS] = self._create_material_dict()
-        position_group_dict, color_group_dict = self._create_groupd_dict()
-        json_dict[_keyNames.POSITION_GROUP] = position_group_dict
-        json_dict[_keyNames.COLOR_GROUP] = color_group_dict
-
-        return json.dumps(json_dict, indent=4, ensure_ascii=False)
+        self._write_patch_document(BinaryFormat.BinaryStreamWriter(fp), baseline)
+
+    def _write_patch_document(self, writer, baseline):
+        writer.begin_object()
+        for key, value in self._iter_header():
+            writer.write_item(key, value)
+        with self.perf.phase("diff"):
+            patch = Patch.create_patch(baseline, self._iter_sections())
+        with self.perf.phase("write"):
+            writer.write_item(_keyNames.PATCH, patch)
+            writer.end_object()
+            writer.flush()
+
+    @staticmethod
+    def _iter_header():
+        yield _keyNames.PLATFORM, f"Blender {bpy.app.version_string}"
+        yield _keyNames.FILE_VERSION, Settings.FILE_VERSION
+        yield _keyNames.SCALE_FACTOR, Settings.BLENDER_SCALE_FACTOR
+
+    def _iter_sections(self):
+        yield _keyNames.LINES, self._iter_line_nodes()
+        yield _keyNames.MATERIALS, self._iter_materials()
+        yield _keyNames.POSITION_GROUP, self._iter_groups(_MP.PositionGroupNode, "is_pcl4_position_group")
+        yield _keyNames.COLOR_GROUP, self._iter_groups(_MP.ColorGroupNode, "is_pcl4_color_group")
+
+    def _create_scene_fingerprint(self):
+        """
+            ノード以外で書き出し結果に影響するもの (参照先のデータの名前など)
+        """
+        context = self.context
+        return (context.scene.name_full if context.scene is not None else None,
+                context.view_layer.name if context.view_layer is not None else None,
+                tuple(bpy.data.objects.keys()),
+                tuple(bpy.data.materials.keys()),
+                tuple(bpy.data.images.keys()),
+                tuple(bpy.data.node_groups.keys()))
+
+    def _create_index(self):
+        """
+            読み込みダイアログで一覧表示するラインとマテリアルのIDと名前
+            ファイル全体を読み込まずに一覧を作れるように、ノードより前に出力する
+        """
+        lines = [[f"{node.tree_from_node().name}/{node.name}", node.name]
+                 for node in util.enumerate_all_nodes()
+                 if self.node_types[node.__class__.__name__].node_class is _MP.LineNode]
+        # _iter_materialsでPencilMaterialとして出力されるものを同じ順序で列挙する
+        materials = [[x.name_full, x.name_full] for x in bpy.data.materials if getattr(x, "is_pcl4_material", False)]
+        exported_names = set(x for x, _ in materials)
+        for mat, _ in util.enumerate_material_and_line_functions():
+            if mat.name_full not in exported_names:
+                exported_names.add(mat.name_full)
+                materials.append([mat.name_full, mat.name_full])
+            exported_names.add(mat.pcl4_line_functions.name_full)
+        index = OrderedDict()
+        index[_keyNames.LINES] = lines
+        index[_keyNames.MATERIALS] = materials
+        return index
 
     def _export_node_params(self, params_dict: OrderedDict, node, node_params_def):
-        for json_param_name, (attr_name, attr_type) in node_params_def.get_params():
-            params_dict[json_param_name] = self.exporters[attr_type](node, attr_name)
+        for json_param_name, _, exporter, _ in self.get_compiled_params(node.__class__, node_params_def):
+            params_dict[json_param_name] = exporter(node)
 
     def _create_node_dict(self):
-        node_list = util.enumerate_all_nodes()
-        nodes = OrderedDict()
-        for node in node_list:
-            node_params_def = self.node_types[node.__class__.__name__]
-            a_node_dict = OrderedDict()
-            a_node_dict[_keyNames.NODE_NAME] = node.name
-            a_node_dict[_keyNames.NODE_TYPE] = node_params_def.get_node_to_export_name()
-            a_node_dict[_keyNames.NODE_LOCATION] = (node.location.x, node.location.y)
-            a_node_dict[_keyNames.PARAMS] = OrderedDict()
-            self._export_node_params(a_node_dict[_keyNames.PARAMS], node, node_params_def)
-            # Texture Map NodeはUnity版との相互運用のため特別な処理が必要
-            if a_node_dict[_keyNames.NODE_TYPE] == "TextureMap":
-                self._modify_texture_map_node(a_node_dict)
-            nodes[f"{node.tree_from_node().name}/{node.name}"] = a_node_dict
-        return nodes
+        return OrderedDict(self._iter_line_nodes())
+
+    def _iter_line_nodes(self):
+        cache = self.fragment_cache
+        for tree in util.enumerate_all_node_trees():
+            if cache is None:
+                for node in tree.nodes:
+                    yield self._create_line_node_item(node)
+                continue
+            key = cache.make_key(tree)
+            fragments = cache.get_clean(key)
+            if fragments is None:
+                # 更新されたツリーはフィンガープリントが変化したノードだけを書き出し直す
+                previous = dict((x[0], x) for x in cache.get(key) or ())
+                fragments = []
+                for node in tree.nodes:
+                    fingerprint = self._create_node_fingerprint(node)
+                    previous_fragment = previous.get(node.name)
+                    if previous_fragment is not None and previous_fragment[1] == fingerprint:
+                        item = previous_fragment[2]
+                    else:
+                        item = self._create_line_node_item(node)
+                    fragments.append((node.name, fingerprint, item))
+                cache.put(key, fragments)
+            for _, _, item in fragments:
+                yield item
+
+    def _create_node_fingerprint(self, node):
+        node_params_def = self.node_types[node.__class__.__name__].node_class
+        return [node.name, tuple(node.location)] + \
+            [x.fingerprinter(node) for x in self.get_compiled_params(node.__class__, node_params_def)]
+
+    def _create_line_node_item(self, node):
+        node_params_def = self.node_types[node.__class__.__name__].node_class
+        a_node_dict = OrderedDict()
+        a_node_dict[_keyNames.NODE_NAME] = node.name
+        a_node_dict[_keyNames.NODE_TYPE] = node_params_def.get_node_to_export_name()
+        a_node_dict[_keyNames.NODE_LOCATION] = (node.location.x, node.location.y)
+        a_node_dict[_keyNames.PARAMS] = OrderedDict()
+        self._export_node_params(a_node_dict[_keyNames.PARAMS], node, node_params_def)
+        # Texture Map NodeはUnity版との相互運用のため特別な処理が必要
+        if a_node_dict[_keyNames.NODE_TYPE] == "TextureMap":
+            self._modify_texture_map_node(a_node_dict)
+        return f"{node.tree_from_node().name}/{node.name}", a_node_dict
+
+    def create_line_state_items(self, context, line_node) -> list:
+        """
+            ラインのノードと、接続を辿った全てのノードのフィンガープリント (インポート後のBlender上の変更の検出に使用する)
+            書き出し結果の代わりに、差分エクスポートと同じ変換処理を省いた値を使用する
+            :return: (ノードの名前, フィンガープリント) のリスト
+        """
+        self.context = context
+        items = []
+        visited = set()
+        nodes = [line_node]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            if node.name in visited or node.__class__.__name__ not in self.node_types:
+                continue
+            visited.add(node.name)
+            items.append((node.name, self._create_node_fingerprint(node)))
+            nodes.extend(reversed([x for x in (y.get_connected_node() for y in node.inputs) if x is not None]))
+        return items
+
+    def create_material_state_items(self, context, mat) -> list:
+        """
+            マテリアルと、参照するライン関連機能・グループの書き出し結果 (インポート後のBlender上の変更の検出に使用する)
+            :return: (ID, ノードの辞書) のリスト
+        """
+        self.context = context
+        items = []
+        if getattr(mat, "is_pcl4_material", False):
+            items.extend(self._create_pencil_material_items(mat, set()))
+            for group_name, node_params_def in ((mat.pcl4mtl_position_group, _MP.PositionGroupNode),
+                                                (mat.pcl4mtl_color_group, _MP.ColorGroupNode)):
+                tree = bpy.data.node_groups.get(group_name) if group_name else None
+                if tree is not None:
+                    items.append(self._create_group_item(tree, node_params_def))
+        line_functions_node = util.get_line_functions_node(mat)
+        if line_functions_node is not None:
+            items.append(self._create_line_functions_item(mat, line_functions_node))
+        return items
 
     def _create_groupd_dict(self):
-        groups_def = (
-            (OrderedDict(), _MP.PositionGroupNode, "is_pcl4_position_group"),
-            (OrderedDict(), _MP.ColorGroupNode, "is_pcl4_color_group"),
-        )
+        return (OrderedDict(self._iter_groups(_MP.PositionGroupNode, "is_pcl4_position_group")),
+                OrderedDict(self._iter_groups(_MP.ColorGroupNode, "is_pcl4_color_group")))
+
+    def _iter_groups(self, node_params_def, check_property_name):
         # 位置グループ・カラーグループを出力
-        for groups, node_params_def, check_property_name in groups_def:
-            for tree in bpy.data.node_groups:
-                if getattr(tree, check_property_name, False):
-                    a_group_dict = OrderedDict()
-                    groups[tree.name_full] = a_group_dict
-                    a_group_dict[_keyNames.NODE_NAME] = tree.name_full
-                    a_group_dict[_keyNames.PARAMS] = OrderedDict()
-                    self._export_node_params(a_group_dict[_keyNames.PARAMS], tree, node_params_def)
-        return (groups_def[0][0], groups_def[1][0])
+        for tree in bpy.data.node_groups:
+            if getattr(tree, check_property_name, False):
+                yield from self._get_fragments(tree, lambda: [self._create_group_item(tree, node_params_def)])
+
+    def _create_group_item(self, tree, node_params_def):
+        a_group_dict = OrderedDict()
+        a_group_dict[_keyNames.NODE_NAME] = tree.name_full
+        a_group_dict[_keyNames.PARAMS] = OrderedDict()
+        self._export_node_params(a_group_dict[_keyNames.PARAMS], tree, node_params_def)
+        return tree.name_full, a_group_dict
+
+    def _get_fragments(self, id_data, create_fragments):
+        """
+            データの書き出し結果を返す
+            差分エクスポート時は、更新されていないデータは前回の書き出し結果を再利用する
+            :param create_fragments: (ID, ノードの辞書) のリストを作成する関数
+        """
+        cache = self.fragment_cache
+        if cache is None:
+            return create_fragments()
+        key = cache.make_key(id_data)
+        fragments = cache.get_clean(key)
+        if fragments is None:
+            fragments = create_fragments()
+            cache.put(key, fragments)
+        return fragments
 
     def _create_material_dict(self):
+        return OrderedDict(self._iter_materials())
+
+    def _iter_materials(self):
         material_names = set(bpy.data.materials.keys())
-        materials = OrderedDict()
+        exported_names = set()
         # Pencil+ マテリアルを出力
         for mat in (x for x in bpy.data.materials if getattr(x, "is_pcl4_material", False)):
-            a_material_dict = OrderedDict()
-            materials[mat.name_full] = a_material_dict
-            a_material_dict[_keyNames.NODE_NAME] = mat.name_full
-            a_material_dict[_keyNames.NODE_TYPE] = _MP.PencilMaterialNode.get_node_to_export_name()
-            a_material_dict[_keyNames.PARAMS] = OrderedDict()
-            self._export_node_params(a_material_dict[_keyNames.PARAMS], mat, _MP.PencilMaterialNode)
-            # グラデーションの出力
-            a_gradation_dict = OrderedDict()
-            a_material_dict[_keyNames.PARAMS]["Gradation"] = a_gradation_dict
-            gradation_params = dict()
-            for _, (attr_name, attr_type) in _MP.MaxGradation.get_params():
-                if attr_type == _MP.AType.NOT_IMPLEMENTED:
-                    continue
-                s = getattr(mat, attr_name)
-                gradation_params[attr_name] = [eval(attr_type)(x) for x in s.split(",")] if attr_type != _MP.AType.COLOR else\
-                    [util.linear_to_srgb([float(y) for y in x.split(",")]) + [1.0] for x in s.split(";")]
-            max_gradation = []
-            a_gradation_dict["MaxGradation"] = max_gradation
-            for i in range(mat.pcl4mtl_num_zones):
-                a_zone_dict = OrderedDict()
-                max_gradation.append(a_zone_dict)
-                for json_param_name, (attr_name, attr_type) in _MP.MaxGradation.get_params():
-                    a_zone_dict[json_param_name] = gradation_params[attr_name][i] if attr_name in gradation_params else None
-            universal_gradation = []
-            a_gradation_dict["UniversalGradation"] = universal_gradation
-            for i in range(mat.pcl4mtl_num_zones):
-                zone = max_gradation[i]
-                def create_universal_zone_dict(zone, position, interpolation) -> OrderedDict:
-                    univaersal_zone_dict = OrderedDict((("Position", position), ("Interpolation", interpolation)))
-                    for json_param_name, (_, _) in _MP.UniversalGradation.get_params():
-                        if json_param_name in zone:
-                            univaersal_zone_dict[json_param_name] = zone[json_param_name]
-                    return univaersal_zone_dict
-                if zone["PosMin"] != zone["PosMax"]:
-                    universal_gradation.append(create_universal_zone_dict(zone, zone["PosMin"], "None"))
-                if zone["PosMin"] == zone["PosMax"] or\
-                    (i < len(max_gradation) - 1 and zone["PosMax"] < max_gradation[i + 1]["PosMin"]): # 連続していない場合
-                    universal_gradation.append(create_universal_zone_dict(zone, zone["PosMax"], "SMOOTH"))
-            # 拡張機能の名前を重複しないようにする
-            advanced_name = mat.name_full + "_Advanced"
-            while advanced_name in material_names:
-                advanced_name += "_"
-            material_names.add(advanced_name)
-            a_material_dict[_keyNames.PARAMS]["AdvancedMaterial"] = advanced_name
-            # 拡張機能を出力
-            a_advanced_dict = OrderedDict()
-            materials[advanced_name] = a_advanced_dict
-            a_advanced_dict[_keyNames.NODE_NAME] = advanced_name
-            a_advanced_dict[_keyNames.NODE_TYPE] = _MP.AdvancedMaterialNode.get_node_to_export_name()
-            a_advanced_dict[_keyNames.PARAMS] = OrderedDict()
-            self._export_node_params(a_advanced_dict[_keyNames.PARAMS], mat, _MP.AdvancedMaterialNode)
-            # ライン関連機能を設定
-            if getattr(mat, "pcl4_line_functions", None) is not None:
-                a_material_dict[_keyNames.PARAMS]["LineFunctions"] = mat.pcl4_line_functions.name_full
+            fragments = self._get_fragments(mat, lambda: self._create_pencil_material_items(mat, material_names))
+            for name, _ in fragments:
+                # 再利用した場合も拡張機能の名前を使用済みにする
+                material_names.add(name)
+                exported_names.add(name)
+            yield from fragments
         # ライン関連機能を出力
         for mat, line_functions_node in util.enumerate_material_and_line_functions():
-            if mat.name_full not in materials:
-                materials[mat.name_full] = \
+            if mat.name_full not in exported_names:
+                exported_names.add(mat.name_full)
+                yield mat.name_full, \
                     util.create_pencil_material_dummy(mat.name_full, mat.pcl4_line_functions.name_full)
-            if mat.pcl4_line_functions.name_full in materials:
+            if mat.pcl4_line_functions.name_full in exported_names:
                 continue
-            a_line_functions_dict = OrderedDict()
-            materials[mat.pcl4_line_functions.name_full] = a_line_functions_dict
-            a_line_functions_dict[_keyNames.NODE_NAME] = mat.pcl4_line_functions.name_full
-            a_line_functions_dict[_keyNames.NODE_TYPE] = _MP.MaterialLineFunctionsNode.get_node_to_export_name()
-            a_line_functions_dict[_keyNames.PARAMS] = OrderedDict()
-            self._export_node_params(a_line_functions_dict[_keyNames.PARAMS], line_functions_node,
-                                     _MP.MaterialLineFunctionsNode)
-        return materials
+            exported_names.add(mat.pcl4_line_functions.name_full)
+            yield from self._get_fragments(
+                mat.pcl4_line_functions, lambda: [self._create_line_functions_item(mat, line_functions_node)])
+
+    def _create_pencil_material_items(self, mat, material_names):
+        a_material_dict = OrderedDict()
+        a_material_dict[_keyNames.NODE_NAME] = mat.name_full
+        a_material_dict[_keyNames.NODE_TYPE] = _MP.PencilMaterialNode.get_node_to_export_name()
+        a_material_dict[_keyNames.PARAMS] = OrderedDict()
+        self._export_node_params(a_material_dict[_keyNames.PARAMS], mat, _MP.PencilMaterialNode)
+        # グラデーションの出力
+        a_material_dict[_keyNames.PARAMS]["Gradation"] = self._create_gradation_dict(mat)
+        # 拡張機能の名前を重複しないようにする
+        advanced_name = mat.name_full + "_Advanced"
+        while advanced_name in material_names:
+            advanced_name += "_"
+        material_names.add(advanced_name)
+        a_material_dict[_keyNames.PARAMS]["AdvancedMaterial"] = advanced_name
+        # ライン関連機能を設定
+        if getattr(mat, "pcl4_line_functions", None) is not None:
+            a_material_dict[_keyNames.PARAMS]["LineFunctions"] = mat.pcl4_line_functions.name_full
+        # 拡張機能を出力
+        a_advanced_dict = OrderedDict()
+        a_advanced_dict[_keyNames.NODE_NAME] = advanced_name
+        a_advanced_dict[_keyNames.NODE_TYPE] = _MP.AdvancedMaterialNode.get_node_to_export_name()
+        a_advanced_dict[_keyNames.PARAMS] = OrderedDict()
+        self._export_node_params(a_advanced_dict[_keyNames.PARAMS], mat, _MP.AdvancedMaterialNode)
+        return [(mat.name_full, a_material_dict), (advanced_name, a_advanced_dict)]
+
+    def _create_line_functions_item(self, mat, line_functions_node):
+        a_line_functions_dict = OrderedDict()
+        a_line_functions_dict[_keyNames.NODE_NAME] = mat.pcl4_line_functions.name_full
+        a_line_functions_dict[_keyNames.NODE_TYPE] = _MP.MaterialLineFunctionsNode.get_node_to_export_name()
+        a_line_functions_dict[_keyNames.PARAMS] = OrderedDict()
+        self._export_node_params(a_line_functions_dict[_keyNames.PARAMS], line_functions_node,
+                                 _MP.MaterialLineFunctionsNode)
+        return mat.pcl4_line_functions.name_full, a_line_functions_dict
+
+    def _create_gradation_dict(self, mat):
+        a_gradation_dict = OrderedDict()
+        gradation_params = dict()
+        for _, attr_name, attr_type, _ in Schema.get_implemented_params(_MP.MaxGradation):
+            s = getattr(mat, attr_name)
+            if attr_type != _MP.AType.COLOR:
+                gradation_params[attr_name] = ArrayCodec.to_list(ArrayCodec.decode_array(s, attr_type), attr_type)
+            else:
+                values, widths = ArrayCodec.decode_color_array(s)
+                gradation_params[attr_name] = ArrayCodec.split_colors(
+                    ColorSpace.linear_to_srgb(values), widths, alpha=1.0)
+        max_gradation = []
+        a_gradation_dict["MaxGradation"] = max_gradation
+        for i in range(mat.pcl4mtl_num_zones):
+            a_zone_dict = OrderedDict()
+            max_gradation.append(a_zone_dict)
+            for json_param_name, attr_name, _, _ in Schema.get_params(_MP.MaxGradation):
+                a_zone_dict[json_param_name] = gradation_params[attr_name][i] if attr_name in gradation_params else None
+        universal_gradation = []
+        a_gradation_dict["UniversalGradation"] = universal_gradation
+        for i in range(mat.pcl4mtl_num_zones):
+            zone = max_gradation[i]
+            def create_universal_zone_dict(zone, position, interpolation) -> OrderedDict:
+                univaersal_zone_dict = OrderedDict((("Position", position), ("Interpolation", interpolation)))
+                for json_param_name, _, _, _ in Schema.get_params(_MP.UniversalGradation):
+                    if json_param_name in zone:
+                        univaersal_zone_dict[json_param_name] = zone[json_param_name]
+                return univaersal_zone_dict
+            if zone["PosMin"] != zone["PosMax"]:
+                universal_gradation.append(create_universal_zone_dict(zone, zone["PosMin"], "None"))
+            if zone["PosMin"] == zone["PosMax"] or\
+                (i < len(max_gradation) - 1 and zone["PosMax"] < max_gradation[i + 1]["PosMin"]): # 連続していない場合
+                universal_gradation.append(create_universal_zone_dict(zone, zone["PosMax"], "SMOOTH"))
+        return a_gradation_dict
 
     def getattr(self, obj, prop_name, default=None):
         if hasattr(obj, "get_overrided_attr"):
             return obj.get_overrided_attr(prop_name, default=default, context=self.context)
         return getattr(obj, prop_name, default) if default is not None else getattr(obj, prop_name)
 
+    """
+    Fingerprinters
+    """
+
+    def _fingerprint_curve(self, node, prop_name):
+        return util.get_curve_points(node, self.getattr(node, prop_name))
+
+    def _fingerprint_sequence(self, node, prop_name):
+        return tuple(self.getattr(node, prop_name))
+
     """
     Exporters
     """
@@ -205,19 +741,17 @@ class Exporter:
         return [f"{x.tree_from_node().name}/{x.name}" for x in child_nodes if x is not None]
 
     def _export_curve(self, node, prop_name):
-        curve_points = util.get_curve_points(node, self.getattr(node, prop_name))
-        universal_curve = util.make_universal_curve(node, self.getattr(node, prop_name))
+        curve = self.getattr(node, prop_name)
         ret = OrderedDict()
-        ret[_keyNames.BLENDER_CURVE_KEYS] = curve_points
-        ret[_keyNames.UNIVERSAL_CURVE_KEYS] = universal_curve
+        ret[_keyNames.BLENDER_CURVE_KEYS] = util.get_curve_points(node, curve)
+        ret[_keyNames.UNIVERSAL_CURVE_KEYS] = util.make_universal_curve(node, curve)
         return ret
 
     def _export_object(self, node, prop_name):
-        obj = self.getattr(node, prop_name)
-        return obj.name if obj is not None else None
+        return _to_name(self.getattr(node, prop_name))
 
     def _export_object_list(self, node, prop_name):
-        return [x.content.name for x in self.getattr(node, prop_name) if x.content is not None]
+        return _to_content_names(self.getattr(node, prop_name))
 
     def _export_string(self, node, prop_name):
         return self.getattr(node, prop_name)
@@ -229,9 +763,7 @@ class Exporter:
         return self.getattr(node, prop_name)
 
     def _export_float_percentage(self, node, prop_name):
-        #  Blender: percentage -> JSON: raw value
-        percentage_value = self.getattr(node, prop_name)
-        return percentage_value / 100.0
+        return _from_percentage(self.getattr(node, prop_name))
 
     def _export_float_angle(self, node, prop_name):
         #  Blender: radian -> JSON: degree
@@ -245,7 +777,7 @@ class Exporter:
         return self.getattr(node, prop_name)
 
     def _export_bool_list_8(self, node, prop_name):
-        return list(self.getattr(node, prop_name, [])) + [False] * (8 - len(list(self.getattr(node, prop_name, []))))
+        return _to_bool_list_8(self.getattr(node, prop_name, []))
 
     def _export_enum(self, node, prop_name):
         enum_str = self.getattr(node, prop_name)
@@ -253,32 +785,22 @@ class Exporter:
         return next(x.value for x in enum_items if x.identifier == enum_str)
 
     def _export_float_vector_2(self, node, prop_name):
-        vector2 = self.getattr(node, prop_name)
-        return [vector2.x, vector2.y]
+        return _to_vector_2(self.getattr(node, prop_name))
 
     def _export_color(self, node, prop_name):
-        color = self.getattr(node, prop_name)
-        srgb_color = util.linear_to_srgb(color[:3])
-        return [srgb_color[0], srgb_color[1], srgb_color[2], 1.0]
+        return _to_srgb_color(self.getattr(node, prop_name))
 
     def _export_image(self, node, prop_name):
-        image = self.getattr(node, prop_name)
-        return image.name if image is not None else None
+        return _to_name(self.getattr(node, prop_name))
 
     def _export_gradation(self, node, prop_name):
         pass
 
     def _export_material(self, node, prop_name):
-        return {
-            "Name": self.getattr(node, prop_name).name,
-            "Id": None,
-            "MaterialType": "Other"
-        }
+        return _to_material_reference(self.getattr(node, prop_name))
 
     def _export_material_list(self, node, prop_name):
-        return [{"Name": x.content.name,
-                 "Id": None,
-                 "MaterialType": "Other"} for x in self.getattr(node, prop_name) if x.content is not None]
+        return _to_material_references(self.getattr(node, prop_name))
 
     def _export_advanced_material(self, node, prop_name):
         pass
@@ -287,10 +809,10 @@ class Exporter:
         pass
 
     def _export_float_array_string(self, node, prop_name):
-        return [float(x) for x in self.getattr(node, prop_name).split(",")]
+        return _decode_float_array(self.getattr(node, prop_name))
 
     def _export_color_array_string(self, node, prop_name):
-        return [util.linear_to_srgb([float(y) for y in x.split(",")][:3]) + [1.0] for x in self.getattr(node, prop_name).split(";")]
+        return _decode_color_array(self.getattr(node, prop_name))
 
     def _export_not_implemented(self, *_):
         pass
@@ -0,0 +1,455 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+インポートの計画
+ファイルの内容を解釈し、シーンを変更せずに作成するデータ・名前・パラメータの値・ノードの接続を決める
+計画の実行 (bpyのデータの作成と代入) は Importer が行う
+"""
+
+from collections import namedtuple
+
+from . import template as _MP
+from .template import KeyNames as _keys
+from . import Schema
+from . import ArrayCodec
+from . import DependencyGraph
+from . import ContentHash
+
+
+class Dummy:
+    pass
+
+
+class GradationDummy:
+    def __init__(self, importer, nid, data) -> None:
+        gradation_data = data.get("MaxGradation")
+        if gradation_data is None and "UniversalGradation" in data:
+            gradation_data = list()
+            src_data = data["UniversalGradation"]
+            prev = None
+            prev_interpolation = 0
+            for gradation in src_data:
+                curr = Dummy()
+                importer._import_parameters_from_json_params(curr, nid, gradation, _MP.UniversalGradation)
+                position = gradation.get("Position", 0.0)
+                interpolation = gradation.get("Interpolation", 0)
+                if prev is not None and prev_interpolation == 0:
+                    gradation_data[-1]["PosMax"] = position
+                    if interpolation != 0 and vars(prev) == vars(curr):
+                        prev = None
+                        continue
+                zone = dict(vars(curr))
+                zone["PosMin"] = position
+                zone["PosMax"] = position
+                gradation_data.append(zone)
+                prev = curr
+                prev_interpolation = interpolation
+            if len(gradation_data) > 0:
+                gradation_data[0]["PosMin"] = 0.0
+                gradation_data[-1]["PosMax"] = 1.0
+        if gradation_data is None:
+            self.zone_num = 0
+            return
+        params_def = _MP.MaxGradation
+        self.zone_num = len(gradation_data)
+        dummies = []
+        for json_params in gradation_data:
+            dummy = Dummy()
+            dummies.append(dummy)
+            importer._import_parameters_from_json_params(dummy, nid, json_params, params_def)
+        attr_defaults = {
+            "pcl4mtl_zone_ids": 1,
+            "pcl4mtl_zone_min_positions": 0.0,
+            "pcl4mtl_zone_max_positions": 0.0,
+            "pcl4mtl_zone_color_ons": True,
+            "pcl4mtl_zone_colors": (0.0, 0.0, 0.0, 1.0),
+            "pcl4mtl_zone_map_opacities": 1.0,
+            "pcl4mtl_zone_map_ons": False,
+            "pcl4mtl_zone_color_amounts": 1.0,
+        }
+        for _, attr_name, attr_type, _ in Schema.get_implemented_params(params_def):
+            value_list = [getattr(dummy, attr_name, attr_defaults[attr_name]) for dummy in dummies]
+            attr = ArrayCodec.encode_array(value_list, attr_type) if attr_type != _MP.AType.COLOR else\
+                ArrayCodec.encode_color_array(value_list)
+            setattr(self, attr_name, attr)
+
+
+"""
+ノードの接続のAType
+全てのノードを作成してから接続する
+"""
+LINK_TYPES = frozenset((_MP.AType.NODE, _MP.AType.NODE_LIST))
+
+"""
+インポート時に何もしないAType
+"""
+_IGNORED_TYPES = frozenset((_MP.AType.GRADATION, _MP.AType.USERDEF, _MP.AType.NOT_IMPLEMENTED))
+
+"""
+パラメータの代入
+    attr_name: Blender上のプロパティ名
+    attr_type: AType
+    value: 変換がbpyのデータに依存しないATypeの場合は変換済みの値、それ以外はファイルの値
+    is_converted: valueが変換済みの場合はTrue
+"""
+ParamPlan = namedtuple("ParamPlan", ("attr_name", "attr_type", "value", "is_converted"))
+
+"""
+パラメータの代入の一覧
+    nid: ノードのID (スキップしたパラメータの記録に使用する)
+    node_type: ノードの種類のエクスポート名
+    params: ParamPlanのタプル (ノードの接続を除く)
+    links: ノードの接続のParamPlanのタプル
+"""
+ParamsPlan = namedtuple("ParamsPlan", ("nid", "node_type", "params", "links"))
+
+"""
+位置グループ・カラーグループの作成
+    section_key: グループのセクションのキー
+"""
+GroupPlan = namedtuple("GroupPlan", ("nid", "section_key", "name", "num_zones", "params"))
+
+"""
+Pencil+ 4 マテリアルの作成
+    zone_num: グラデーションのゾーン数
+    gradation: グラデーションのプロパティの (プロパティ名, 値) のタプル
+"""
+MaterialPlan = namedtuple("MaterialPlan", ("nid", "name", "zone_num", "gradation", "params"))
+
+"""
+ライン関連機能の作成と、マテリアルへの設定
+    nid: 設定先のマテリアルのID
+    material_name: 設定先のマテリアルの名前
+    name: ライン関連機能のマテリアルの名前
+"""
+LineFunctionsPlan = namedtuple("LineFunctionsPlan", ("nid", "material_name", "name", "params"))
+
+"""
+ラインのノードの作成
+    location: ノードの位置 (ファイルに含まれない場合はNone)
+"""
+LineNodePlan = namedtuple("LineNodePlan", ("nid", "bl_idname", "name", "location", "params"))
+
+
+class ImportPlan:
+    """
+    インポートの計画
+    """
+
+    def __init__(self):
+        self.scale_factor = 1.0
+        self.groups = []
+        self.advanced_materials = dict()
+        self.materials = []
+        self.line_functions = []
+        self.line_ids = []
+        self.line_nodes = []
+
+        # 内容のハッシュを保存・比較するマテリアル・ラインの単位 (ContentHash.ContentUnit)
+        self.material_units = []
+        self.line_units = []
+
+        # 計画の作成時にスキップしたノードとパラメータ
+        self.skipped_nodes = dict()
+        self.skipped_attributes = []
+
+    def remove_units(self, material_keys, line_keys):
+        """
+        インポートを省略する単位を取り除く
+        :param material_keys: 省略するマテリアルの単位のキーの集合
+        :param line_keys: 省略するラインの単位のキーの集合
+        """
+        self.material_units = [x for x in self.material_units if x.key not in material_keys]
+        self.line_units = [x for x in self.line_units if x.key not in line_keys]
+
+
+class ImportPlanner:
+    """
+    ファイルの内容からImportPlanを作成する
+    値の変換にはImporterがノードの種類ごとにコンパイルした変換関数を使用する (変換関数はbpyのデータを参照しない)
+    ファイルの構造が壊れている場合は、シーンを変更する前にValueErrorを送出する
+    """
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.plan = ImportPlan()
+        self.node_types = importer.node_types
+        self.export_name_to_blender_id_dict = importer.export_name_to_blender_id_dict
+        self._dependency_index = None
+
+    def create_plan(self, json_dict, importer_settings,
+                    should_plan_materials=True, should_plan_line_functions=True, should_plan_lines=True,
+                    should_plan_content_units=False, find_unchanged_units=None):
+        """
+        :param should_plan_materials: Falseの場合はグループ・マテリアルの計画を作成しない
+        :param should_plan_line_functions: Falseの場合はライン関連機能の計画を作成しない
+        :param should_plan_lines: Falseの場合はラインの計画を作成しない
+        :param should_plan_content_units: Trueの場合はマテリアル・ラインの単位ごとに内容のハッシュを計算する
+        :param find_unchanged_units: マテリアル・ラインの単位のリストを受け取り、インポートを省略する単位のキーの集合を
+                                     (マテリアル, ライン) で返す関数 (Noneの場合は省略しない)
+                                     パラメータの計画を作成する前に呼び出し、省略する単位のノードの計画は作成しない
+                                     (省略する単位は他の単位とノードを共有しないため (ContentHash.find_unchanged)、
+                                     残りの単位から参照されるノードだけを計画すればよい)
+        """
+        plan = self.plan
+        plan.scale_factor = self.importer.scale_factor
+
+        # インポート対象のマテリアルID
+        if importer_settings.material_ids is None:
+            material_ids = [x for (x, _) in self.importer._enumerate_materials_in_json_dict(json_dict)]
+        else:
+            material_ids = list(dict.fromkeys(importer_settings.material_ids))
+        materials_dict = json_dict[_keys.MATERIALS]
+        for nid in material_ids:
+            self._get_node(materials_dict, nid)
+
+        # インポート対象のラインID
+        line_ids = self._get_line_ids(json_dict, importer_settings) if should_plan_lines else []
+
+        if should_plan_content_units:
+            if should_plan_materials or should_plan_line_functions:
+                self.plan_material_units(material_ids, json_dict)
+            if should_plan_lines:
+                self.plan_line_units(line_ids, json_dict, importer_settings)
+            if find_unchanged_units is not None:
+                unchanged_materials, unchanged_lines = find_unchanged_units(plan.material_units, plan.line_units)
+                plan.remove_units(unchanged_materials, unchanged_lines)
+                material_ids = [x for x in material_ids if x not in unchanged_materials]
+                line_ids = [x for x in line_ids if x not in unchanged_lines]
+
+        if should_plan_materials:
+            self.plan_groups(material_ids, json_dict)
+            self.plan_materials(material_ids, materials_dict)
+        if should_plan_line_functions:
+            self.plan_line_functions(material_ids, materials_dict)
+        if should_plan_lines:
+            self.plan_lines(line_ids, json_dict, importer_settings)
+        return plan
+
+    @staticmethod
+    def _get_node(nodes_dict, nid, has_node_type=True):
+        """
+        :param has_node_type: Falseの場合はノードの種類を持たないノード (グループ) として検証する
+        :return: ノードの辞書 (ノードがない場合・構造が正しくない場合はValueErrorを送出する)
+        """
+        data = nodes_dict.get(nid)
+        if data is None:
+            raise ValueError(f"Node is not found: {nid}")
+        if not isinstance(data, dict) \
+                or (has_node_type and not isinstance(data.get(_keys.NODE_TYPE), str)) \
+                or not isinstance(data.get(_keys.NODE_NAME), str) \
+                or not isinstance(data.get(_keys.PARAMS), dict):
+            raise ValueError(f"Node structure is invalid: {nid}")
+        return data
+
+    def plan_params(self, nid, node_type, json_params, params_def) -> ParamsPlan:
+        """
+        パラメータの代入の一覧を作成する
+        ファイルにないパラメータ・変換できない値はスキップしたパラメータとして記録する
+        """
+        skipped_attributes = self.plan.skipped_attributes
+        # ParamPlan(...) より _make の方が速い (パラメータの数だけ呼び出すため)
+        new_param = ParamPlan._make
+        params = []
+        links = []
+        for json_param_name, attr_name, attr_type, converter, _ in self.importer.get_compiled_params(params_def):
+            try:
+                value = json_params[json_param_name]
+                if converter is not None:
+                    params.append(new_param((attr_name, attr_type, converter(value), True)))
+                elif attr_type in LINK_TYPES:
+                    links.append(new_param((attr_name, attr_type, value, False)))
+                elif attr_type not in _IGNORED_TYPES:
+                    params.append(new_param((attr_name, attr_type, value, False)))
+            except Exception as err:
+                skipped_attributes.append((nid, attr_name, err))
+        return ParamsPlan(nid, node_type, tuple(params), tuple(links))
+
+    def plan_groups(self, material_ids, json_dict):
+        plan = self.plan
+        if len(material_ids) == 0:
+            return
+        material_dict = json_dict[_keys.MATERIALS]
+        for groups_key, params_def, material_param, num_zones_func, _, _ in self.importer._get_groups_def():
+            groups_dict = json_dict.get(groups_key)
+            if groups_dict is None:
+                continue
+            group_ids = set()
+            for nid in material_ids:
+                group_id = material_dict[nid][_keys.PARAMS].get(material_param)
+                if group_id is not None:
+                    group_ids.add(group_id)
+            for nid in groups_dict:
+                if nid not in group_ids:
+                    continue
+                data = self._get_node(groups_dict, nid, has_node_type=False)
+                try:
+                    num_zones = num_zones_func(data[_keys.PARAMS])
+                except Exception as err:
+                    plan.skipped_nodes[nid] = err
+                    continue
+                plan.groups.append(GroupPlan(
+                    nid, groups_key, data[_keys.NODE_NAME], num_zones,
+                    self.plan_params(nid, params_def.get_node_to_export_name(), data[_keys.PARAMS], params_def)))
+
+    def plan_materials(self, material_ids, materials_dict):
+        plan = self.plan
+        for nid in material_ids:
+            data = materials_dict[nid]
+            if data[_keys.NODE_TYPE] != _keys.ADVANCED_MATERIAL or nid in plan.advanced_materials:
+                continue
+            # 拡張機能のパラメータは全て計画の作成時に変換できるため、変換済みの値を持つダミーを作成する
+            params = self.plan_params(nid, data[_keys.NODE_TYPE], data[_keys.PARAMS], _MP.AdvancedMaterialNode)
+            dummy = Dummy()
+            for param in params.params:
+                if param.is_converted:
+                    setattr(dummy, param.attr_name, param.value)
+            plan.advanced_materials[nid] = dummy
+        for nid in material_ids:
+            data = materials_dict[nid]
+            if data[_keys.NODE_TYPE] != _keys.PENCIL_MATERIAL:
+                continue
+            try:
+                dummy = GradationDummy(self.importer, nid, data[_keys.PARAMS].get("Gradation"))
+            except Exception as err:
+                plan.skipped_nodes[nid] = err
+                continue
+            gradation = tuple((attr_name, getattr(dummy, attr_name))
+                              for _, attr_name, _, _ in Schema.get_implemented_params(_MP.MaxGradation)
+                              if getattr(dummy, attr_name, None) is not None)
+            plan.materials.append(MaterialPlan(
+                nid, data[_keys.NODE_NAME], dummy.zone_num, gradation,
+                self.plan_params(nid, data[_keys.NODE_TYPE], data[_keys.PARAMS], _MP.PencilMaterialNode)))
+
+    def plan_line_functions(self, material_ids, materials_dict):
+        plan = self.plan
+        line_functions_name = _MP.MaterialLineFunctionsNode.get_node_to_export_name()
+        for nid in material_ids:
+            data = materials_dict[nid]
+            if data[_keys.NODE_TYPE] != _keys.PENCIL_MATERIAL:
+                continue
+            json_params = data[_keys.PARAMS]
+            if "LineFunctions" not in json_params:
+                plan.skipped_nodes[nid] = KeyError("LineFunctions")
+                continue
+            line_functions_id = json_params["LineFunctions"]
+            if line_functions_id is None or line_functions_id not in materials_dict:
+                continue
+            line_functions_data = self._get_node(materials_dict, line_functions_id)
+            plan.line_functions.append(LineFunctionsPlan(
+                nid, data[_keys.NODE_NAME], line_functions_data[_keys.NODE_NAME],
+                self.plan_params(nid, line_functions_name, line_functions_data[_keys.PARAMS],
+                                 _MP.MaterialLineFunctionsNode)))
+
+    def _get_line_ids(self, json_dict, importer_settings) -> list:
+        nodes_dict = json_dict[_keys.LINES]
+        if importer_settings.line_ids is None:
+            return [x for (x, _) in self.importer._enumerate_lines_in_json_dict(json_dict)]
+        for nid in importer_settings.line_ids:
+            self._get_node(nodes_dict, nid)
+        return importer_settings.line_ids
+
+    @staticmethod
+    def _get_ignored_switches(importer_settings) -> set:
+        """
+        :return: 値がFalseでも参照先を読み込む切り替えの種類
+        """
+        ignored_switches = set()
+        if importer_settings.should_import_disabled_brush:
+            ignored_switches.add(DependencyGraph.SWITCH_BRUSH)
+        if importer_settings.should_import_disabled_reduction:
+            ignored_switches.add(DependencyGraph.SWITCH_REDUCTION)
+        return ignored_switches
+
+    def _get_dependency_index(self, nodes_dict) -> DependencyGraph.DependencyIndex:
+        if self._dependency_index is None:
+            self._dependency_index = DependencyGraph.DependencyIndex(nodes_dict)
+        return self._dependency_index
+
+    def plan_lines(self, line_ids, json_dict, importer_settings):
+        plan = self.plan
+        nodes_dict = json_dict[_keys.LINES]
+        plan.line_ids = line_ids
+        line_family_ids = self._get_dependency_index(nodes_dict).closure(
+            line_ids, self._get_ignored_switches(importer_settings))
+
+        # ファイル内の順序でノードを作成する
+        for nid in nodes_dict:
+            if nid not in line_family_ids:
+                continue
+            node_plan = self.plan_line_node(nid, self._get_node(nodes_dict, nid))
+            if node_plan is not None:
+                plan.line_nodes.append(node_plan)
+
+    def plan_line_units(self, line_ids, json_dict, importer_settings):
+        """
+        ラインごとに、参照を辿って作成するノードの全てを1つの単位にする
+        """
+        plan = self.plan
+        nodes_dict = json_dict[_keys.LINES]
+        dependency_index = self._get_dependency_index(nodes_dict)
+        ignored_switches = self._get_ignored_switches(importer_settings)
+        get_node = self._create_get_node(json_dict)
+        context_values = (plan.scale_factor,)
+        for nid in line_ids:
+            members = ((_keys.LINES, x) for x in dependency_index.closure((nid,), ignored_switches))
+            plan.line_units.append(ContentHash.create_unit(
+                nid, nodes_dict[nid][_keys.NODE_NAME], members, get_node, context_values))
+
+    def plan_material_units(self, material_ids, json_dict):
+        """
+        Pencil+ 4 マテリアルごとに、参照する拡張機能・グループ・ライン関連機能を含めて1つの単位にする
+        """
+        plan = self.plan
+        materials_dict = json_dict[_keys.MATERIALS]
+        references = [(_keys.MATERIALS, "AdvancedMaterial"), (_keys.MATERIALS, "LineFunctions")]
+        references.extend((x[0], x[2]) for x in self.importer._get_groups_def())
+        get_node = self._create_get_node(json_dict)
+        context_values = (plan.scale_factor,)
+        for nid in material_ids:
+            data = materials_dict[nid]
+            if data[_keys.NODE_TYPE] != _keys.PENCIL_MATERIAL:
+                continue
+            json_params = data[_keys.PARAMS]
+            members = [(_keys.MATERIALS, nid)]
+            members.extend((section_key, json_params[json_name]) for section_key, json_name in references
+                           if isinstance(json_params.get(json_name), str))
+            plan.material_units.append(ContentHash.create_unit(
+                nid, data[_keys.NODE_NAME], members, get_node, context_values))
+
+    @staticmethod
+    def _create_get_node(json_dict):
+        def get_node(section_key, nid):
+            section = json_dict.get(section_key)
+            return section.get(nid) if section is not None else None
+        return get_node
+
+    def plan_line_node(self, nid, data):
+        """
+        :return: LineNodePlan (Blenderにない種類のノードの場合はNone)
+        """
+        node_type = data[_keys.NODE_TYPE]
+        schema = self.node_types.get(node_type)
+        bl_idname = self.export_name_to_blender_id_dict.get(node_type)
+        if schema is None or not bl_idname:
+            self.plan.skipped_nodes[nid] = KeyError(node_type)
+            return None
+        json_params = data[_keys.PARAMS]
+        params = self.plan_params(nid, node_type, json_params, schema.node_class)
+        if node_type == _MP.TextureMapNode.get_node_to_export_name() \
+                and "TextureUV" in json_params \
+                and "ExtendedTextureUV" not in json_params:
+            params = params._replace(params=params.params + self._plan_texture_uv(json_params["TextureUV"]))
+        return LineNodePlan(nid, bl_idname, data[_keys.NODE_NAME], data.get(_keys.NODE_LOCATION), params)
+
+    @staticmethod
+    def _plan_texture_uv(original_texture_uv) -> tuple:
+        """
+        for Unity
+        """
+        if original_texture_uv == 0:
+            return (ParamPlan("uv_source", _MP.AType.STRING, "SCREEN", True),)
+        return (ParamPlan("uv_source", _MP.AType.STRING, "OBJECTUV", True),
+                ParamPlan("uv_selection_mode", _MP.AType.STRING, "INDEX", True),
+                ParamPlan("uv_index", _MP.AType.INT, original_texture_uv - 1, True))
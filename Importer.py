@@ -1,16 +1,62 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 # The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
 
+import os
 import bpy
 import json
 import math
-import inspect
-from typing import Iterable
+import functools
+from itertools import chain
+from collections import namedtuple
 
 from . import template as _MP
 from .template import KeyNames as _keys
 
 from . import Utilities as util
+from . import Schema
+from . import JsonStream
+from . import BinaryFormat
+from . import Patch
+from . import Instrumentation
+from . import ColorSpace
+from . import ArrayCodec
+from . import ImportPlan
+from . import ContentHash
+from . import Exporter
+from . import Settings
+
+
+"""
+ノードの種類ごとにコンパイルしたパラメータの代入処理
+    json_name: JSON上のパラメータ名
+    attr_name: Blender上のプロパティ名
+    attr_type: AType
+    converter: ファイルの値をBlenderの値に変換する関数 (変換がbpyのデータに依存するATypeの場合はNone)
+    setter: (代入先, ファイルの値) を受け取り、変換して代入する関数
+"""
+CompiledParam = namedtuple("CompiledParam", ("json_name", "attr_name", "attr_type", "converter", "setter"))
+
+
+def _same(value):
+    return value
+
+
+def _to_percentage(value):
+    #  JSON: raw value -> Blender: percentage
+    return float(value) * 100.0
+
+
+def _to_radians(value):
+    #  JSON: degree -> Blender: radian
+    return math.radians(float(value))
+
+
+def _to_bool_list_8(value):
+    return value[:min(8, len(value))] + [False] * max(0, 8 - len(value))
+
+
+def _to_linear_color(value):
+    return ColorSpace.srgb_to_linear(value[0:3])
 
 
 class ImporterSettings:
@@ -21,6 +67,8 @@ class ImporterSettings:
     custom_scale_factor = 1.0
     should_import_disabled_brush = True
     should_import_disabled_reduction = True
+    # 上書きインポートで、前回のインポートからファイルの内容もBlender上のデータも変わっていないマテリアル・ラインを読み込まない
+    should_skip_unchanged = False
 
 
 class Importer:
@@ -67,16 +115,22 @@ class Importer:
             _MP.AType.NOT_IMPLEMENTED: self._import_not_implemented
         }
 
-        self.node_types = dict((cls.get_node_to_export_name(), cls) for _, cls
-                               in inspect.getmembers(_MP, inspect.isclass)
-                               if issubclass(cls, _MP.Node) and cls.is_blender_node())
-
-        param_defs = [cls for _, cls
-                      in inspect.getmembers(_MP, inspect.isclass)
-                      if issubclass(cls, _MP.Node) and cls.is_blender_node()]
+        # 差分の適用時に、インポートの前に既存の値を取り除く関数
+        self.resetters = {
+            _MP.AType.NODE: self._reset_node_connection,
+            _MP.AType.NODE_LIST: self._reset_node_list,
+            _MP.AType.OBJECT: self._reset_pointer,
+            _MP.AType.OBJECT_LIST: self._reset_collection,
+            _MP.AType.IMAGE: self._reset_pointer,
+            _MP.AType.MATERIAL: self._reset_pointer,
+            _MP.AType.MATERIAL_LIST: self._reset_collection,
+            _MP.AType.POSITION_GROUP: self._reset_string,
+            _MP.AType.COLOR_GROUP: self._reset_string,
+        }
 
-        self.export_name_to_blender_id_dict = \
-            dict((x.get_node_to_export_name(), x.get_blender_id_name()) for x in param_defs)
+        registry = Schema.get_registry()
+        self.node_types = registry.export_name_to_schema
+        self.export_name_to_blender_id_dict = registry.export_name_to_blender_id_name
 
         self.node_id_to_node_dict = dict()
         self.imported_materials = dict()
@@ -85,26 +139,232 @@ class Importer:
         self.target_node_tree = None
         self.target_scene = None
 
+        # ノードのクラス・プロパティ名ごとの (入力ソケットの識別子, インデックス)
+        self._input_socket_indices = dict()
+
         self.dummy_advanced_materials = dict()
 
+        # 処理時間の計測 (enable_instrumentationで有効にする)
+        self.perf = Instrumentation.NULL_REPORT
+
+        # ノードの種類ごとにコンパイルしたパラメータの代入処理 (スケール・計測の変更時に破棄する)
+        self._converters = None
+        self._compiled_params = dict()
+
+    def enable_instrumentation(self) -> Instrumentation.PerformanceReport:
+        """
+        段階・ノードの種類・ATypeごとの処理時間と呼び出し回数の計測を有効にする
+        :return: 計測結果を記録するレポート
+        """
+        self.perf = Instrumentation.PerformanceReport("import")
+        self.importers = self.perf.wrap_handlers(self.importers)
+        self.perf.instrument_method(self, "_import_parameters_from_json_params",
+                                    lambda obj, nid, json_params, params_def:
+                                    getattr(params_def, "_nameToExport", None) or params_def.__name__)
+        self.perf.instrument_method(self, "_apply_params", lambda obj, params_plan: params_plan.node_type)
+        self._clear_compiled_params()
+        return self.perf
+
+    @staticmethod
+    def _create_converters(scale_factor) -> dict:
+        """
+        bpyのデータに依存しないATypeの値の変換関数 (ファイルの値 -> Blenderの値)
+        :param scale_factor: FLOAT_WITH_SCALEの変換に束縛するスケール
+        """
+        def to_scaled(value):
+            return float(value) * scale_factor
+
+        return {
+            _MP.AType.STRING: _same,
+            _MP.AType.INT: int,
+            _MP.AType.FLOAT: float,
+            _MP.AType.FLOAT_PERCENTAGE: _to_percentage,
+            _MP.AType.FLOAT_ANGLE: _to_radians,
+            _MP.AType.FLOAT_WITH_SCALE: to_scaled,
+            _MP.AType.BOOL: bool,
+            _MP.AType.BOOL_LIST_8: _to_bool_list_8,
+            _MP.AType.FLOAT_VECTOR_2: _same,
+            _MP.AType.COLOR: _to_linear_color,
+            _MP.AType.FLOAT_ARRAY: _same,
+            _MP.AType.FLOAT_ARRAY_STRING: ArrayCodec.encode_array,
+            _MP.AType.COLOR_ARRAY_STRING: ArrayCodec.encode_color_array,
+        }
+
+    def _clear_compiled_params(self):
+        self._converters = None
+        self._compiled_params.clear()
+
+    def get_compiled_params(self, params_def) -> tuple:
+        """
+        ノードの種類のパラメータの代入処理を返す
+        インポートの間はスケールが変わらないため、ノードの種類ごとに1度だけコンパイルする
+        :return: CompiledParamのタプル
+        """
+        compiled = self._compiled_params.get(params_def)
+        if compiled is None:
+            compiled = self._compile_params(params_def)
+            self._compiled_params[params_def] = compiled
+        return compiled
+
+    def _compile_params(self, params_def) -> tuple:
+        converters = self._converters
+        if converters is None:
+            converters = self._create_converters(self.scale_factor)
+            if self.perf is not Instrumentation.NULL_REPORT:
+                converters = self.perf.wrap_handlers(converters)
+            self._converters = converters
+        compiled = []
+        for json_name, attr_name, attr_type, _ in Schema.get_params(params_def):
+            converter = converters.get(attr_type)
+            compiled.append(CompiledParam(json_name, attr_name, attr_type, converter,
+                                          self._compile_setter(attr_name, converter, self.importers[attr_type])))
+        return tuple(compiled)
+
+    @staticmethod
+    def _compile_setter(attr_name, converter, importer):
+        if converter is None:
+            return lambda obj, value: importer(obj, attr_name, value)
+        if converter is _same:
+            return lambda obj, value: setattr(obj, attr_name, value)
+        return lambda obj, value: setattr(obj, attr_name, converter(value))
+
     def enumerate_lines_and_materials_from_json_file(self, json_file_path):
         """
+        ファイルに含まれるラインとマテリアルのIDと名前を列挙する
+        結果は (パス, 更新日時, サイズ) をキーにキャッシュする
+        :param json_file_path:
+        :return: ([(ラインID, 名前)], [(マテリアルID, 名前)])
+        """
+        try:
+            stat = os.stat(json_file_path)
+            lines, materials = self._scan_lines_and_materials(json_file_path, stat.st_mtime_ns, stat.st_size)
+            return (list(lines), list(materials))
+        except OSError:
+            return ([], [])
 
+    def is_patch_file(self, json_file_path) -> bool:
+        """
+        ファイルが差分ファイルかを返す
+        差分ファイルはラインとマテリアルの一覧を持たず、選択や読み込みモードに関わらず全ての差分を適用する
         :param json_file_path:
         :return:
         """
         try:
-            with open(json_file_path) as json_file:
-                json_dict = json.load(json_file)
-                lines, has_lines = self._try_get(json_dict, _keys.LINES)
-                if not has_lines:
-                    return ([], [])
-                return (self._enumerate_lines_in_json_dict(json_dict),
-                        self._enumerate_materials_in_json_dict(json_dict))
-        except ValueError:
-            return ([], [])
+            stat = os.stat(json_file_path)
+            return self._scan_is_patch(json_file_path, stat.st_mtime_ns, stat.st_size)
         except OSError:
-            return ([], [])
+            return False
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _scan_is_patch(json_file_path, mtime_ns, size) -> bool:
+        if BinaryFormat.is_binary_file_path(json_file_path):
+            try:
+                with BinaryFormat.BinaryNodeFile(open(json_file_path, mode="rb")) as binary_file:
+                    return _keys.PATCH in binary_file.values
+            except ValueError:
+                return False
+        try:
+            with util.open_bridge_file(json_file_path) as json_file:
+                reader = JsonStream.JsonStreamReader(json_file)
+                reader.begin_object()
+                while True:
+                    key = reader.next_key()
+                    if key is None:
+                        return False
+                    if key == _keys.PATCH:
+                        return True
+                    reader.skip_value()
+        except (ValueError, EOFError):
+            return False
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _scan_lines_and_materials(json_file_path, mtime_ns, size):
+        """
+        ファイル先頭のインデックスからラインとマテリアルを列挙する
+        インデックスを持たない古いファイルは、ノードを1つずつ読み込みながら列挙する
+        """
+        if BinaryFormat.is_binary_file_path(json_file_path):
+            return Importer._scan_binary_lines_and_materials(json_file_path)
+        try:
+            with util.open_bridge_file(json_file_path) as json_file:
+                reader = JsonStream.JsonStreamReader(json_file)
+                reader.begin_object()
+                lines = None
+                materials = None
+                while lines is None or materials is None:
+                    key = reader.next_key()
+                    if key is None:
+                        break
+                    if key == _keys.INDEX:
+                        index = reader.read_value()
+                        index_lines, has_lines = Importer._try_get(index, _keys.LINES)
+                        index_materials, has_materials = Importer._try_get(index, _keys.MATERIALS)
+                        if has_lines and has_materials:
+                            return (Importer._parse_index_entries(index_lines),
+                                    Importer._parse_index_entries(index_materials))
+                    elif key == _keys.LINES:
+                        lines = tuple(Importer._filter_nodes(
+                            reader.iter_object_items(), _MP.LineNode.get_node_to_export_name()))
+                    elif key == _keys.MATERIALS:
+                        materials = tuple(Importer._filter_nodes(
+                            reader.iter_object_items(), _MP.PencilMaterialNode.get_node_to_export_name()))
+                    else:
+                        reader.skip_value()
+        except (ValueError, EOFError):
+            return ((), ())
+        if lines is None:
+            return ((), ())
+        return (lines, materials if materials is not None else ())
+
+    @staticmethod
+    def _scan_binary_lines_and_materials(file_path):
+        try:
+            with BinaryFormat.BinaryNodeFile(open(file_path, mode="rb")) as binary_file:
+                values = binary_file.values
+                index, _ = Importer._try_get(values, _keys.INDEX)
+                index_lines, has_lines = Importer._try_get(index, _keys.LINES)
+                index_materials, has_materials = Importer._try_get(index, _keys.MATERIALS)
+                if has_lines and has_materials:
+                    return (Importer._parse_index_entries(index_lines),
+                            Importer._parse_index_entries(index_materials))
+                if _keys.LINES not in values:
+                    return ((), ())
+                lines = tuple(Importer._filter_nodes(
+                    values[_keys.LINES].items(), _MP.LineNode.get_node_to_export_name()))
+                materials = tuple(Importer._filter_nodes(
+                    values[_keys.MATERIALS].items(), _MP.PencilMaterialNode.get_node_to_export_name())) \
+                    if _keys.MATERIALS in values else ()
+                return (lines, materials)
+        except ValueError:
+            return ((), ())
+
+    @staticmethod
+    def _parse_index_entries(entries) -> tuple:
+        if not isinstance(entries, list):
+            return ()
+        return tuple((x[0], x[1]) for x in entries
+                     if isinstance(x, list) and len(x) == 2 and isinstance(x[0], str) and isinstance(x[1], str))
+
+    def import_from_file(self, file_path, target_node_tree, target_scene, importer_settings: ImporterSettings,
+                         streaming=False):
+        """
+        ファイルからインポートする
+        形式は拡張子で判別する (.json / .json.gz / .pcl4b)
+        :param file_path:
+        :param target_node_tree:
+        :param target_scene
+        :param importer_settings:
+        :param streaming: Trueの場合はJSONファイルを省メモリで読み込む
+        :return:
+        """
+        if BinaryFormat.is_binary_file_path(file_path):
+            return self.import_from_binary_file(file_path, target_node_tree, target_scene, importer_settings)
+        if streaming:
+            return self.import_from_json_file_streaming(file_path, target_node_tree, target_scene, importer_settings)
+        with util.open_bridge_file(file_path) as json_file:
+            return self.import_from_json_file(json_file, target_node_tree, target_scene, importer_settings)
 
     def import_from_json_file(self, json_file, target_node_tree, target_scene, importer_settings: ImporterSettings):
         """
@@ -116,11 +376,49 @@ class Importer:
         :return:
         """
         try:
-            json_dict = json.load(json_file)
+            with self.perf.phase("load"):
+                json_dict = json.load(json_file)
         except Exception as e:
             raise ValueError("JSON load failed.")
         return self._import_from_json_dict(json_dict, target_node_tree, target_scene, importer_settings)
 
+    def import_from_json_file_streaming(self, json_file_path, target_node_tree, target_scene,
+                                        importer_settings: ImporterSettings):
+        """
+        ファイル全体を辞書に展開せずにインポートする
+        ノードは必要になった時点で1つずつファイルから読み込み、インポートの計画には変換済みの値だけを保持するため、
+        ファイル全体の辞書を展開する場合よりメモリ使用量が少ない
+        :param json_file_path:
+        :param target_node_tree:
+        :param target_scene
+        :param importer_settings:
+        :return:
+        """
+        try:
+            json_file = JsonStream.JsonNodeFile(
+                util.open_bridge_file_seekable(json_file_path), (_keys.LINES, _keys.MATERIALS, _keys.POSITION_GROUP, _keys.COLOR_GROUP))
+        except Exception as e:
+            raise ValueError("JSON load failed.")
+        with json_file:
+            return self._import_from_json_dict(json_file.values, target_node_tree, target_scene, importer_settings)
+
+    def import_from_binary_file(self, file_path, target_node_tree, target_scene, importer_settings: ImporterSettings):
+        """
+        バイナリ形式のファイルからインポートする
+        ノードはオフセット表から必要になった時点で1つずつ読み込む
+        :param file_path:
+        :param target_node_tree:
+        :param target_scene
+        :param importer_settings:
+        :return:
+        """
+        try:
+            binary_file = BinaryFormat.BinaryNodeFile(open(file_path, mode="rb"))
+        except Exception as e:
+            raise ValueError("Binary file load failed.")
+        with binary_file:
+            return self._import_from_json_dict(binary_file.values, target_node_tree, target_scene, importer_settings)
+
     def import_from_json_string(self, json_string, target_node_tree, target_scene, importer_settings: ImporterSettings):
         """
 
@@ -138,46 +436,444 @@ class Importer:
                                target_node_tree,
                                target_scene,
                                importer_settings: ImporterSettings):
+        if Patch.is_patch(json_dict):
+            return self._apply_patch(json_dict, target_node_tree, target_scene, importer_settings)
+
         if not json_dict.keys() >= {_keys.PLATFORM, _keys.FILE_VERSION, _keys.LINES, _keys.MATERIALS}:
             raise ValueError("JSON structure is invalid.")
 
         if not util.is_file_version_supported(json_dict[_keys.FILE_VERSION]):
             raise ValueError("File version is invalid.")
         
-        # 上書きインポートの結果使用されなくなるデータをあとから削除するために、削除対象になり得る使用中のデータを列挙する
+        # 上書きインポートの結果使用されなくなるデータをあとから削除するために、削除対象になり得る使用中のデータを記録する
+        orphan_collector = None
         if importer_settings.should_overwrite:
-            used_materials = set(mat.pcl4_line_functions for mat, _ in util.enumerate_material_and_line_functions())
-            used_node_groups = (x for x in bpy.data.node_groups if x.users > 0)
-
-        # インポート対象のマテリアルIDを列挙
-        if importer_settings.material_ids is None:
-            material_ids = [x for (x, _) in self._enumerate_materials_in_json_dict(json_dict)]
-        else:
-            material_ids = importer_settings.material_ids
+            # 削除対象はインポートで置き換えるPencil+ 4のグループとライン関連機能のマテリアルに限る
+            line_functions_materials = dict.fromkeys(
+                mat.pcl4_line_functions for mat, _ in util.enumerate_material_and_line_functions())
+            pcl4_groups = (x for x in bpy.data.node_groups
+                           if getattr(x, "is_pcl4_position_group", False) or getattr(x, "is_pcl4_color_group", False))
+            orphan_collector = util.OrphanCollector(chain(line_functions_materials, pcl4_groups))
+
+        # 上書きインポートでは、前回のインポートから変わっていないマテリアル・ラインを読み込まない
+        find_unchanged_units = None
+        if importer_settings.should_overwrite and importer_settings.should_skip_unchanged:
+            def find_unchanged_units(material_units, line_units):
+                with self.perf.phase("skip_unchanged"):
+                    return self._find_unchanged_units(material_units, line_units, target_node_tree)
+
+        # ファイルの内容を解釈してインポートの計画を作成する (シーンは変更しない)
+        self._set_scale_factor(json_dict, importer_settings)
+        with self.perf.phase("plan"):
+            is_line_addon_installed = util.is_line_addon_installed()
+            plan = ImportPlan.ImportPlanner(self).create_plan(
+                json_dict, importer_settings,
+                should_plan_materials=util.is_material_addon_installed(),
+                should_plan_line_functions=is_line_addon_installed,
+                should_plan_lines=is_line_addon_installed and target_node_tree is not None,
+                should_plan_content_units=importer_settings.should_skip_unchanged,
+                find_unchanged_units=find_unchanged_units)
+        self._add_plan_skips(plan)
+        executed_attribute_skips_start = len(self.skipped_attributes)
+
+        # マテリアル・ライン関連機能のオブジェクトの参照はラインと同じシーンから探す
+        self.target_scene = target_scene
 
         # 位置グループ・カラーグループのインポート
-        self._create_groups(material_ids, json_dict)
+        with self.perf.phase("groups"):
+            self._create_groups(plan)
 
         # マテリアルのインポート
-        self._create_pcl4_materials(material_ids, json_dict[_keys.MATERIALS], importer_settings.should_overwrite)
+        with self.perf.phase("materials"):
+            self._create_pcl4_materials(plan, importer_settings.should_overwrite)
 
         #  Line Functions Nodeのインポート
-        self._create_line_functions(material_ids, json_dict[_keys.MATERIALS])
+        with self.perf.phase("line_functions"):
+            self._create_line_functions(plan)
 
         # ラインのインポート
-        self._import_lines(json_dict, target_node_tree, target_scene, importer_settings)
+        with self.perf.phase("lines"):
+            self._import_lines(plan, target_node_tree, target_scene, importer_settings)
 
         # 上書きインポートの結果使用されなくなったデータを削除
-        if importer_settings.should_overwrite:
-            for material in used_materials:
-                if material.users == 0:
-                    bpy.data.materials.remove(material)
-            for node_group in used_node_groups:
-                if node_group.users == 0:
+        if orphan_collector is not None:
+            with self.perf.phase("cleanup"):
+                orphan_collector.remove_orphans()
+                self._restore_imported_names(plan)
+
+        # インポートしたマテリアル・ラインのノードに内容のハッシュを保存
+        with self.perf.phase("content_hash"):
+            self._store_content_hashes(plan, executed_attribute_skips_start)
+
+    def _add_plan_skips(self, plan):
+        self.skipped_nodes.update(plan.skipped_nodes)
+        self.skipped_attributes.extend(plan.skipped_attributes)
+
+    def _find_unchanged_units(self, material_units, line_units, target_node_tree):
+        """
+        Blender上のマテリアル・ラインのノードに保存されたハッシュが単位のハッシュと一致し、
+        インポート後にBlender上で変更されていない単位を探す (上書きインポートで削除・再作成しない)
+        :return: (省略するマテリアルの単位のキーの集合, 省略するラインの単位のキーの集合)
+        """
+        exporter = Exporter.Exporter()
+
+        def is_material_unchanged(unit):
+            material = bpy.data.materials.get(unit.name)
+            return material is not None and material.library is None and self._is_unit_unchanged(
+                unit, material, lambda: exporter.create_material_state_items(bpy.context, material))
+
+        unchanged_materials = ContentHash.find_unchanged(material_units, is_material_unchanged)
+        for unit in material_units:
+            if unit.key in unchanged_materials:
+                self.imported_materials[unit.name] = bpy.data.materials[unit.name]
+
+        unchanged_lines = set()
+        if target_node_tree is not None and util.is_line_addon_installed():
+            line_nodes = dict((x.name, x) for x in target_node_tree.enumerate_lines())
+
+            def is_line_unchanged(unit):
+                node = line_nodes.get(unit.name)
+                return node is not None and self._is_unit_unchanged(
+                    unit, node, lambda: exporter.create_line_state_items(bpy.context, node))
+
+            unchanged_lines = ContentHash.find_unchanged(line_units, is_line_unchanged)
+
+        return unchanged_materials, unchanged_lines
+
+    @staticmethod
+    def _is_unit_unchanged(unit, target, create_state_items):
+        """
+        :param target: ハッシュを保存したマテリアル・ラインのノード
+        :param create_state_items: Blender上のデータの (ID, 書き出し結果・フィンガープリント) の列を返す関数
+                                   (内容のハッシュが一致する場合だけ呼び出す)
+        """
+        if unit.content_hash is None or target.get(Settings.CONTENT_HASH_PROPERTY_NAME) != unit.content_hash:
+            return False
+        state_hash = target.get(Settings.STATE_HASH_PROPERTY_NAME)
+        return state_hash is not None and state_hash == ContentHash.hash_state(create_state_items())
+
+    def _store_content_hashes(self, plan, executed_attribute_skips_start):
+        """
+        計画の単位のハッシュと、インポート直後のBlender上のデータのハッシュをインポートしたマテリアル・ラインのノードに保存する
+        読み込みを飛ばしたノード・パラメータを含む単位は、次回のインポートで省略しないようにハッシュを削除する
+        :param executed_attribute_skips_start: 計画の実行中に記録した skipped_attributes の開始位置
+        """
+        prop_names = (Settings.CONTENT_HASH_PROPERTY_NAME, Settings.STATE_HASH_PROPERTY_NAME)
+        failed_ids = set(self.skipped_nodes)
+        failed_ids.update(x[0] for x in self.skipped_attributes[executed_attribute_skips_start:])
+        exporter = Exporter.Exporter()
+        targets = []
+        for unit in plan.material_units:
+            material = self.imported_materials.get(unit.name) or bpy.data.materials.get(unit.name)
+            targets.append((unit, material, lambda x: exporter.create_material_state_items(bpy.context, x)))
+        for unit in plan.line_units:
+            node = self.node_id_to_node_dict.get(unit.key)
+            targets.append((unit, node, lambda x: exporter.create_line_state_items(bpy.context, x)))
+        for unit, target, create_state_items in targets:
+            if target is None or getattr(target, "library", None) is not None:
+                continue
+            state_hash = None
+            if unit.content_hash is not None and not any(nid in failed_ids for _, nid in unit.members):
+                state_hash = ContentHash.hash_state(create_state_items(target))
+            if state_hash is None:
+                for prop_name in prop_names:
+                    target.pop(prop_name, None)
+            else:
+                target[Settings.CONTENT_HASH_PROPERTY_NAME] = unit.content_hash
+                target[Settings.STATE_HASH_PROPERTY_NAME] = state_hash
+
+    def _apply_patch(self,
+                     json_dict,
+                     target_node_tree,
+                     target_scene,
+                     importer_settings: ImporterSettings):
+        """
+        差分ファイルを既存のデータに適用する
+        変更されたノード・マテリアル・グループは作り直さずに、差分に含まれるパラメータだけを書き換える
+        インポート対象のラインとマテリアルの指定は使用せず、差分の全てを適用する
+        """
+        if not json_dict.keys() >= {_keys.PLATFORM, _keys.FILE_VERSION}:
+            raise ValueError("JSON structure is invalid.")
+
+        if not util.is_file_version_supported(json_dict[_keys.FILE_VERSION]):
+            raise ValueError("File version is invalid.")
+
+        patch = json_dict[_keys.PATCH]
+        self.target_scene = target_scene
+        self._set_scale_factor(json_dict, importer_settings)
+
+        with self.perf.phase("groups"):
+            self._apply_groups_patch(patch)
+        with self.perf.phase("materials"):
+            self._apply_materials_patch(patch)
+        with self.perf.phase("lines"):
+            self._apply_lines_patch(patch, target_node_tree)
+
+        # 削除されたグループは、マテリアルの差分を適用した結果使用されなくなった場合だけ削除する
+        if util.is_material_addon_installed():
+            with self.perf.phase("cleanup"):
+                for group_def in self._get_groups_def():
+                    _, removed, _ = self._get_patch_section(patch, group_def[0])
+                    for nid in removed:
+                        node_group = bpy.data.node_groups.get(nid)
+                        if node_group is not None and node_group.users == 0:
+                            bpy.data.node_groups.remove(node_group)
+
+    @staticmethod
+    def _get_patch_section(patch, key):
+        """
+        :return: (追加されたノードの辞書, 削除されたノードのIDのリスト, 変更されたノードの辞書)
+        """
+        section = patch.get(key) or {}
+        return section.get(_keys.ADDED, {}), section.get(_keys.REMOVED, []), section.get(_keys.CHANGED, {})
+
+    def _apply_groups_patch(self, patch):
+        if not util.is_material_addon_installed():
+            return
+
+        # 差分に含まれないグループもマテリアルから参照できるようにする
+        for node_group in bpy.data.node_groups:
+            if getattr(node_group, "is_pcl4_position_group", False) or getattr(node_group, "is_pcl4_color_group", False):
+                self.imported_node_trees[node_group.name_full] = node_group
+
+        new_group_finder = util.NewIdFinder(bpy.data.node_groups)
+        for group_def in self._get_groups_def():
+            groups_key, params_def, _, num_zones_func, current_num_zones_func, _ = group_def
+            added, _, changed = self._get_patch_section(patch, groups_key)
+            # 既に存在するグループが追加された場合は変更として扱う
+            changed_items = [(nid, added[nid]) for nid in added if nid in self.imported_node_trees]
+            changed_items.extend((nid, changed[nid]) for nid in changed)
+            for nid in added:
+                if nid not in self.imported_node_trees:
+                    self._create_group(nid, added[nid], group_def, new_group_finder)
+            for nid, data in changed_items:
+                node_group = self.imported_node_trees.get(nid)
+                if node_group is None:
+                    self.skipped_nodes[nid] = KeyError(nid)
+                    continue
+                try:
+                    json_params = data[_keys.PARAMS]
+                    if num_zones_func(json_params) == current_num_zones_func(node_group):
+                        self._patch_parameters(node_group, nid, json_params, params_def)
+                        continue
+                except Exception as err:
+                    self.skipped_nodes[nid] = err
+                    continue
+                # ゾーン数が変わる場合はグループを作り直して参照を置き換える
+                new_group = self._create_group(nid, data, group_def, new_group_finder)
+                if new_group is not None:
+                    node_group.user_remap(new_group)
+                    new_group_finder.discard(node_group)
                     bpy.data.node_groups.remove(node_group)
+                    new_group.name = data[_keys.NODE_NAME]
 
+    def _apply_materials_patch(self, patch):
+        added, removed, changed = self._get_patch_section(patch, _keys.MATERIALS)
 
-    def _import_lines(self, json_dict, target_node_tree, target_scene, importer_settings: ImporterSettings):
+        # 拡張機能のパラメータ (変更された拡張機能は変更されたパラメータだけを持つ)
+        advanced_params_def = self.node_types[_keys.ADVANCED_MATERIAL].node_class
+        for entries in (added, changed):
+            for nid in entries:
+                data = entries[nid]
+                if data.get(_keys.NODE_TYPE) != _keys.ADVANCED_MATERIAL:
+                    continue
+                dummy = ImportPlan.Dummy()
+                self.dummy_advanced_materials[nid] = dummy
+                self._patch_parameters(dummy, nid, data[_keys.PARAMS], advanced_params_def)
+
+        if util.is_material_addon_installed():
+            material_ids = [nid for nid in added if added[nid].get(_keys.NODE_TYPE) == _keys.PENCIL_MATERIAL]
+            planner = ImportPlan.ImportPlanner(self)
+            planner.plan_materials(material_ids, added)
+            self._add_plan_skips(planner.plan)
+            self._create_pcl4_materials(planner.plan, True)
+
+        # 既に存在するライン関連機能が追加された場合は変更として扱う
+        line_functions_name = _MP.MaterialLineFunctionsNode.get_node_to_export_name()
+        changed_items = []
+        if util.is_line_addon_installed():
+            for nid in added:
+                data = added[nid]
+                if data.get(_keys.NODE_TYPE) != line_functions_name:
+                    continue
+                if data[_keys.NODE_NAME] in bpy.data.materials:
+                    changed_items.append((nid, data))
+                    continue
+                try:
+                    self._create_line_functions_material(nid, data)
+                except Exception as err:
+                    self.skipped_nodes[nid] = err
+        changed_items.extend((nid, changed[nid]) for nid in changed)
+
+        for nid, data in changed_items:
+            node_type = data.get(_keys.NODE_TYPE)
+            try:
+                if node_type == _keys.PENCIL_MATERIAL:
+                    self._patch_pcl4_material(bpy.data.materials[data[_keys.NODE_NAME]], nid, data[_keys.PARAMS])
+                elif node_type == line_functions_name:
+                    material = bpy.data.materials[data[_keys.NODE_NAME]]
+                    node = next(x for x in material.node_tree.nodes
+                                if x.bl_idname == _MP.MaterialLineFunctionsNode._blenderNodeId)
+                    self._patch_parameters(node, nid, data[_keys.PARAMS], self.node_types[node_type].node_class)
+            except Exception as err:
+                self.skipped_nodes[nid] = err
+
+        # ライン関連機能の参照は、追加されたライン関連機能を作成してから設定する
+        if util.is_line_addon_installed():
+            for entries in (added, changed):
+                for nid in entries:
+                    data = entries[nid]
+                    if data.get(_keys.NODE_TYPE) != _keys.PENCIL_MATERIAL or "LineFunctions" not in data[_keys.PARAMS]:
+                        continue
+                    material = bpy.data.materials.get(data[_keys.NODE_NAME])
+                    if material is None:
+                        self.skipped_nodes[nid] = KeyError(nid)
+                        continue
+                    line_functions_id = data[_keys.PARAMS]["LineFunctions"]
+                    line_functions_mat = None
+                    if line_functions_id is not None:
+                        line_functions_mat = self.imported_materials.get(line_functions_id)
+                        if line_functions_mat is None:
+                            line_functions_mat = bpy.data.materials.get(line_functions_id)
+                    material.pcl4_line_functions = line_functions_mat
+
+        # 削除されたマテリアルは、使用されていない場合だけ削除する
+        for nid in removed:
+            material = bpy.data.materials.get(nid)
+            if material is not None and material.users == 0:
+                bpy.data.materials.remove(material)
+
+    def _patch_pcl4_material(self, material, nid, json_params):
+        if "Gradation" not in json_params:
+            self._patch_parameters(material, nid, json_params, _MP.PencilMaterialNode)
+            return
+        # グラデーションが変更された場合はマテリアルの全てのパラメータが差分に含まれる
+        dummy = ImportPlan.GradationDummy(self, nid, json_params["Gradation"])
+        if dummy.zone_num != material.pcl4mtl_num_zones:
+            util.operator_call_with_override(
+                bpy.ops.pcl4mtl.initialize_material,
+                bpy.context, {"material": material}, {"zone_num": dummy.zone_num})
+        self._patch_parameters(material, nid, json_params, _MP.PencilMaterialNode)
+        for _, attr_name, _, _ in Schema.get_implemented_params(_MP.MaxGradation):
+            value = getattr(dummy, attr_name, None)
+            if value is not None:
+                setattr(material, attr_name, value)
+
+    def _apply_lines_patch(self, patch, target_node_tree):
+        if not util.is_line_addon_installed():
+            return
+        added, removed, changed = self._get_patch_section(patch, _keys.LINES)
+
+        # ノードIDの "ツリー名/" の部分はベースラインを書き出したシーンのツリー名のため、
+        # 同じ名前のラインのノードツリーがある場合はそのツリーに、無い場合は読み込み先のツリーに適用する
+        line_trees = dict((x.name, x) for x in util.enumerate_all_node_trees())
+        source_tree_names = dict()
+        for entries in (added, changed):
+            for nid in entries:
+                node_name = entries[nid][_keys.NODE_NAME]
+                if nid.endswith("/" + node_name):
+                    source_tree_names[nid] = nid[:-len(node_name) - 1]
+        # 削除されたノードはIDしか持たないため、適用先のツリーのノード名と一致する部分からツリー名を求める
+        known_tree_names = set(source_tree_names.values())
+        for nid in removed:
+            tree_name = self._find_source_tree_name(nid, line_trees, target_node_tree, known_tree_names)
+            if tree_name is not None:
+                source_tree_names[nid] = tree_name
+
+        # ツリーごとに差分を分ける
+        tree_entries = dict()
+        for nid in chain(added, removed, changed):
+            tree_name = source_tree_names.get(nid)
+            node_tree = line_trees.get(tree_name, target_node_tree) if tree_name is not None else None
+            if node_tree is None:
+                self.skipped_nodes[nid] = KeyError(nid)
+                continue
+            tree_entries.setdefault((tree_name, node_tree), []).append(nid)
+
+        # 複数のツリーのノードを同じツリーに適用すると同じノードを指してしまうため、適用しない
+        source_counts = dict()
+        for _, node_tree in tree_entries:
+            source_counts[node_tree] = source_counts.get(node_tree, 0) + 1
+        for (tree_name, node_tree), nids in tree_entries.items():
+            if source_counts[node_tree] > 1:
+                error = ValueError(f"Patch contains nodes of multiple node trees for {node_tree.name}")
+                for nid in nids:
+                    self.skipped_nodes[nid] = error
+                continue
+            nid_set = set(nids)
+            self._apply_lines_patch_to_tree(
+                node_tree, tree_name,
+                dict((nid, added[nid]) for nid in added if nid in nid_set),
+                [nid for nid in removed if nid in nid_set],
+                dict((nid, changed[nid]) for nid in changed if nid in nid_set))
+
+    def _apply_lines_patch_to_tree(self, node_tree, source_tree_name, added, removed, changed):
+        """
+        1つのツリーから書き出した差分を適用する
+        :param source_tree_name: 差分を書き出したシーンのツリー名 (ノードIDの "ツリー名/" の部分)
+        """
+        for node in node_tree.nodes:
+            node.select = False
+
+        self.target_node_tree = node_tree
+
+        # 差分に含まれるツリー名と適用先のツリー名のどちらでも既存のノードを参照できるようにする
+        for node in node_tree.nodes:
+            for tree_name in (source_tree_name, node_tree.name):
+                self.node_id_to_node_dict[f"{tree_name}/{node.name}"] = node
+
+        for nid in removed:
+            node = self.node_id_to_node_dict.get(nid)
+            if node is None:
+                self.skipped_nodes[nid] = KeyError(nid)
+                continue
+            for key in [k for k, v in self.node_id_to_node_dict.items() if v == node]:
+                del self.node_id_to_node_dict[key]
+            node_tree.nodes.remove(node)
+
+        # 既に存在するノードが追加された場合は変更として扱う
+        changed_items = [(nid, added[nid]) for nid in added if nid in self.node_id_to_node_dict]
+        changed_items.extend((nid, changed[nid]) for nid in changed)
+
+        node_items, _ = self._create_line_nodes(
+            [nid for nid in added if nid not in self.node_id_to_node_dict], added, node_tree)
+        self._set_node_parameters(node_items, added)
+
+        for nid, data in changed_items:
+            node = self.node_id_to_node_dict.get(nid)
+            if node is None:
+                self.skipped_nodes[nid] = KeyError(nid)
+                continue
+            try:
+                if _keys.NODE_LOCATION in data:
+                    node.location = data[_keys.NODE_LOCATION]
+                params_def = self.node_types[data[_keys.NODE_TYPE]].node_class
+                self._patch_parameters(node, nid, data[_keys.PARAMS], params_def)
+            except Exception as err:
+                self.skipped_nodes[nid] = err
+
+    @staticmethod
+    def _find_source_tree_name(nid, line_trees, target_node_tree, known_tree_names):
+        """
+        ノードIDを "ツリー名/ノード名" に分けたときに、ノード名が適用先のツリーのノードと一致するツリー名を返す
+        適用先は同じ名前のラインのノードツリー、無い場合は読み込み先のツリーとする
+        (ツリー名・ノード名とも "/" を含むことがあるため、分け方が複数ある場合は既知のツリー名を優先する)
+        :param line_trees: ツリー名 -> ラインのノードツリー
+        :return: ツリー名 (見つからない場合や1つに決まらない場合はNone)
+        """
+        candidates = []
+        for i, c in enumerate(nid):
+            if c != "/":
+                continue
+            node_tree = line_trees.get(nid[:i], target_node_tree)
+            if node_tree is not None and nid[i + 1:] in node_tree.nodes:
+                candidates.append(nid[:i])
+        known_candidates = [x for x in candidates if x in known_tree_names]
+        if known_candidates:
+            candidates = known_candidates
+        return candidates[0] if len(candidates) == 1 else None
+
+    def _import_lines(self, plan, target_node_tree, target_scene, importer_settings: ImporterSettings):
         if target_node_tree is None or not util.is_line_addon_installed():
             return
 
@@ -186,34 +882,40 @@ class Importer:
 
         self.target_node_tree = target_node_tree
         self.target_scene = target_scene
-        self._set_scale_factor(json_dict, importer_settings)
-
-        if importer_settings.line_ids is None:
-            line_ids = [x for (x, _) in self._enumerate_lines_in_json_dict(json_dict)]
-        else:
-            line_ids = importer_settings.line_ids
-
-        line_children_ids = self._collect_line_nodes(
-            json_dict[_keys.LINES],
-            line_ids,
-            importer_settings.should_import_disabled_brush,
-            importer_settings.should_import_disabled_reduction)
-
-        line_family_ids = line_ids + line_children_ids
-        line_family_to_import = {k: v for k, v in json_dict[_keys.LINES].items() if k in line_family_ids}
 
         if importer_settings.should_overwrite:
-            line_node_names = set(n.name for n in target_node_tree.enumerate_lines())
-            for node_name in (json_dict[_keys.LINES][line_id][_keys.NODE_NAME] for line_id in line_ids):
-                if node_name in line_node_names:
-                    target_node_tree.nodes[node_name].delete_if_unused(target_node_tree)
-                    line_node_names.remove(node_name)
+            with self.perf.phase("overwrite"):
+                line_node_names = set(n.name for n in target_node_tree.enumerate_lines())
+                line_ids = set(plan.line_ids)
+                for node_name in (x.name for x in plan.line_nodes if x.nid in line_ids):
+                    if node_name in line_node_names:
+                        target_node_tree.nodes[node_name].delete_if_unused(target_node_tree)
+                        line_node_names.remove(node_name)
 
+        node_items = dict()
+        has_node_location = True
         #  ラインノードの展開
-        node_items, has_node_location = self._create_line_nodes(line_family_to_import, target_node_tree)
+        with self.perf.phase("create_nodes"):
+            for node_plan in plan.line_nodes:
+                try:
+                    new_node = target_node_tree.nodes.new(type=node_plan.bl_idname)
+                    new_node.name = node_plan.name
+                    if node_plan.location is not None:
+                        new_node.location = node_plan.location
+                    else:
+                        has_node_location = False
+                    node_items[node_plan.nid] = new_node
+                    self.node_id_to_node_dict[node_plan.nid] = new_node
+                except Exception as err:
+                    self.skipped_nodes[node_plan.nid] = err
 
-        #  ラインノードの接続・パラメータの代入
-        self._set_node_parameters(node_items)
+        #  ラインノードのパラメータの代入・接続
+        with self.perf.phase("set_parameters"):
+            for node_plan in plan.line_nodes:
+                node = node_items.get(node_plan.nid)
+                if node is not None:
+                    self._apply_params(node, node_plan.params)
+                    self._apply_links(node, node_plan.params)
 
         # ノード位置をインポートできていない場合はノードを整列
         if not has_node_location:
@@ -230,7 +932,7 @@ class Importer:
                             child.location = node.calc_new_node_position(i)
                         layout_child_nodes(child)
 
-            new_nodes = set(node for node, _ in node_items.values())
+            new_nodes = set(node_items.values())
             line_nodes = target_node_tree.enumerate_lines()
             location = [0, 0]
             for i, node in enumerate(line_nodes):
@@ -245,6 +947,7 @@ class Importer:
             
 
     def _set_scale_factor(self, json_dict: dict, importer_settings: ImporterSettings):
+        self._clear_compiled_params()
         if importer_settings.use_custom_scale:
             self.scale_factor = importer_settings.custom_scale_factor
         else:
@@ -263,16 +966,18 @@ class Importer:
 
     @staticmethod
     def _enumerate_nodes_in_json_dict(json_dict: dict, nodes_key: str, node_type_name: str) -> list:
-        ret = []
-        for node_id, node_data in json_dict[nodes_key].items():
+        return list(Importer._filter_nodes(json_dict[nodes_key].items(), node_type_name))
+
+    @staticmethod
+    def _filter_nodes(node_items, node_type_name: str):
+        for node_id, node_data in node_items:
             node_type, has_node_type = Importer._try_get(node_data, _keys.NODE_TYPE)
             if not has_node_type or node_type != node_type_name:
                 continue
             node_name, has_node_name = Importer._try_get(node_data, _keys.NODE_NAME)
             if not has_node_name or not isinstance(node_name, str):
                 continue
-            ret.append((node_id, node_name))
-        return ret
+            yield (node_id, node_name)
 
     @staticmethod
     def _enumerate_lines_in_json_dict(json_dict: dict) -> list:
@@ -288,93 +993,12 @@ class Importer:
             _keys.MATERIALS,
             _MP.PencilMaterialNode.get_node_to_export_name())
 
-    @staticmethod
-    def _collect_line_nodes(
-            nodes_dict,
-            line_ids_to_import,
-            should_import_disabled_brush: bool,
-            should_import_disabled_reduction: bool):
-        whole_node_ids_to_import = set()
-
-        def _add_brush_related_nodes(brush_node_id):
-            if not brush_node_id:
-                return
-            detail_id = nodes_dict[brush_node_id]["Params"]["BrushDetail"]
-            whole_node_ids_to_import.add(detail_id)
-            color_map_id = nodes_dict[brush_node_id]["Params"]["ColorMap"]
-            whole_node_ids_to_import.add(color_map_id)
-            size_map_id = nodes_dict[brush_node_id]["Params"]["SizeMap"]
-            whole_node_ids_to_import.add(size_map_id)
-            brush_map_id = nodes_dict[detail_id]["Params"]["BrushMap"]
-            whole_node_ids_to_import.add(brush_map_id)
-            distortion_map_id = nodes_dict[detail_id]["Params"]["DistortionMap"]
-            whole_node_ids_to_import.add(distortion_map_id)
-
-        for a_line_id in line_ids_to_import:
-            # Line -> LineSet
-            line_set_ids = nodes_dict[a_line_id]["Params"]["LineSets"]
-            for a_line_set_id in line_set_ids:
-                whole_node_ids_to_import.add(a_line_set_id)
-
-                # LineSet -> BrushSettings, BrushDetails
-                a_line_set_params = nodes_dict[a_line_set_id]["Params"]
-                v_brush_id = a_line_set_params["VBrushSettings"]
-                whole_node_ids_to_import.add(v_brush_id)
-                _add_brush_related_nodes(v_brush_id)
-                h_brush_id = a_line_set_params["HBrushSettings"]
-                whole_node_ids_to_import.add(h_brush_id)
-                _add_brush_related_nodes(h_brush_id)
-
-                # LineSet -> BrushSettings, BrushDetails (Specific)
-                specific_brush_settings = [
-                    ("VOutline", "VOutlineSpecificOn"),
-                    ("VObject", "VObjectSpecificOn"),
-                    ("VIntersection", "VIntersectionSpecificOn"),
-                    ("VSmooth", "VSmoothSpecificOn"),
-                    ("VMaterial", "VMaterialSpecificOn"),
-                    ("VSelected", "VSelectedSpecificOn"),
-                    ("VNormalAngle", "VNormalAngleSpecificOn"),
-                    ("VWireframe", "VWireframeSpecificOn"),
-                    ("HOutline", "HOutlineSpecificOn"),
-                    ("HObject", "HObjectSpecificOn"),
-                    ("HIntersection", "HIntersectionSpecificOn"),
-                    ("HSmooth", "HSmoothSpecificOn"),
-                    ("HMaterial", "HMaterialSpecificOn"),
-                    ("HSelected", "HSelectedSpecificOn"),
-                    ("HNormalAngle", "HNormalAngleSpecificOn"),
-                    ("HWireframe", "HWireframeSpecificOn")
-                ]
-                for brush, is_on in specific_brush_settings:
-                    if brush not in a_line_set_params or is_on not in a_line_set_params:
-                        continue
-                    if should_import_disabled_brush or a_line_set_params[is_on]:
-                        brush_id = a_line_set_params[brush]
-                        whole_node_ids_to_import.add(brush_id)
-                        _add_brush_related_nodes(brush_id)
-
-                # LineSet -> ReductionSettings
-                specific_reduction_settings = [
-                    ("VSizeReduction", "VSizeReductionOn"),
-                    ("VAlphaReduction", "VAlphaReductionOn"),
-                    ("HSizeReduction", "HSizeReductionOn"),
-                    ("HAlphaReduction", "HAlphaReductionOn")
-                ]
-                for reduction, is_on in specific_reduction_settings:
-                    if reduction not in a_line_set_params or is_on not in a_line_set_params:
-                        continue
-                    if should_import_disabled_reduction or a_line_set_params[is_on]:
-                        reduction_id = a_line_set_params[reduction]
-                        whole_node_ids_to_import.add(reduction_id)
-        #
-        if None in whole_node_ids_to_import:
-            whole_node_ids_to_import.remove(None)
-        return list(whole_node_ids_to_import)
-
-    def _create_line_nodes(self, node_dict, target_node_tree: bpy.types.NodeTree):
+    def _create_line_nodes(self, node_ids, nodes_dict, target_node_tree: bpy.types.NodeTree):
         node_items = dict()
         has_node_location = True
-        for nid, data in node_dict.items():
+        for nid in node_ids:
             try:
+                data = nodes_dict[nid]
                 node_bl_idname = self.export_name_to_blender_id_dict[data[_keys.NODE_TYPE]]
                 node_name = data[_keys.NODE_NAME]
                 new_node = target_node_tree.nodes.new(type=node_bl_idname)
@@ -383,14 +1007,16 @@ class Importer:
                     new_node.location = data[_keys.NODE_LOCATION]
                 else:
                     has_node_location = False
-                node_items[nid] = (new_node, data)
+                node_items[nid] = new_node
                 self.node_id_to_node_dict[nid] = new_node
             except Exception as err:
                 self.skipped_nodes[nid] = err
         return node_items, has_node_location
 
-    def _set_node_parameters(self, node_items):
-        for nid, (node, data) in node_items.items():
+    def _set_node_parameters(self, node_items, nodes_dict):
+        # ノードのデータは保持せずに再度参照する (ストリーミングインポート時のメモリ使用量を抑えるため)
+        for nid, node in node_items.items():
+            data = nodes_dict[nid]
             self._import_parameters_from_json_data(node, nid, data)
             json_params = data[_keys.PARAMS]
             if data[_keys.NODE_TYPE] == "TextureMap" \
@@ -399,134 +1025,158 @@ class Importer:
                 self._modify_texture_map_node(node, json_params)
 
     def _import_parameters_from_json_params(self, object, nid, json_params, params_def):
-        for json_param_name, (attr_name, attr_type) in params_def.get_params():
+        for json_param_name, attr_name, _, _, setter in self.get_compiled_params(params_def):
             try:
-                self.importers[attr_type](object, attr_name, json_params[json_param_name])
+                setter(object, json_params[json_param_name])
+            except Exception as err:
+                self.skipped_attributes.append((nid, attr_name, err))
+
+    def _patch_parameters(self, object, nid, json_params, params_def):
+        """
+        差分に含まれるパラメータだけをインポートする
+        ノードの接続・リストなどは既存の値を取り除いてからインポートする
+        """
+        resetters = self.resetters
+        for json_param_name, attr_name, attr_type, _, setter in self.get_compiled_params(params_def):
+            if json_param_name not in json_params:
+                continue
+            try:
+                resetter = resetters.get(attr_type)
+                if resetter is not None:
+                    resetter(object, attr_name)
+                setter(object, json_params[json_param_name])
             except Exception as err:
                 self.skipped_attributes.append((nid, attr_name, err))
 
     def _import_parameters_from_json_data(self, object, nid, data):
-        self._import_parameters_from_json_params(object, nid, data[_keys.PARAMS], self.node_types[data[_keys.NODE_TYPE]])
+        params_def = self.node_types[data[_keys.NODE_TYPE]].node_class
+        self._import_parameters_from_json_params(object, nid, data[_keys.PARAMS], params_def)
+
+    def _apply_params(self, object, params_plan: ImportPlan.ParamsPlan):
+        """
+        計画したパラメータを代入する (ノードの接続を除く)
+        """
+        self._apply_param_list(object, params_plan.nid, params_plan.params)
+
+    def _apply_links(self, node, params_plan: ImportPlan.ParamsPlan):
+        """
+        計画したノードの接続を作成する
+        """
+        self._apply_param_list(node, params_plan.nid, params_plan.links)
 
-    def _create_groups(self, material_ids: Iterable[str], json_dict: dict):
+    def _apply_param_list(self, object, nid, params):
+        importers = self.importers
+        for attr_name, attr_type, value, is_converted in params:
+            try:
+                if is_converted:
+                    setattr(object, attr_name, value)
+                else:
+                    importers[attr_type](object, attr_name, value)
+            except Exception as err:
+                self.skipped_attributes.append((nid, attr_name, err))
+
+    def _create_groups(self, plan):
         if not util.is_material_addon_installed():
             return
 
-        material_ids = set(material_ids)
-        if len(material_ids) == 0:
+        ot_new_groups = dict((x[0], x[5]) for x in self._get_groups_def())
+        new_group_finder = util.NewIdFinder(bpy.data.node_groups)
+        for group_plan in plan.groups:
+            try:
+                new_group = self._new_group(ot_new_groups[group_plan.section_key], group_plan.num_zones,
+                                            new_group_finder)
+                self._apply_params(new_group, group_plan.params)
+                new_group.name = group_plan.name
+                self.imported_node_trees[group_plan.nid] = new_group
+            except Exception as err:
+                print(err)
+                self.skipped_nodes[group_plan.nid] = err
+
+    def _restore_imported_names(self, plan):
+        """
+        置き換えたデータの削除後に、連番の付いたインポートしたグループとライン関連機能のマテリアルの名前を計画した名前に戻す
+        (上書きインポートを繰り返しても名前が変わらないようにする)
+        グループはマテリアルから名前で参照されるため、インポートしたマテリアルの参照も合わせて変更する
+        """
+        renamed_groups = dict()
+        for group_plan in plan.groups:
+            group = self.imported_node_trees.get(group_plan.nid)
+            old_name = self._restore_name(group, group_plan.name, bpy.data.node_groups)
+            if old_name is not None:
+                renamed_groups[old_name] = group.name_full
+        for line_functions_plan in plan.line_functions:
+            self._restore_name(self.imported_materials.get(line_functions_plan.name), line_functions_plan.name,
+                               bpy.data.materials)
+        if len(renamed_groups) == 0:
             return
-        
-        material_dict = json_dict[_keys.MATERIALS]
-        groups_def = (
-            (json_dict.get(_keys.POSITION_GROUP), _MP.PositionGroupNode, "PositionGroup", lambda x: len(x["Positions"]) // 2, bpy.ops.pcl4mtl.new_position_group_node_tree),
-            (json_dict.get(_keys.COLOR_GROUP), _MP.ColorGroupNode, "ColorGroup", lambda x: len(x["Colors"]), bpy.ops.pcl4mtl.new_color_group_node_tree),
+        for material in self.imported_materials.values():
+            for prop_name in ("pcl4mtl_position_group", "pcl4mtl_color_group"):
+                new_name = renamed_groups.get(getattr(material, prop_name, None))
+                if new_name is not None:
+                    setattr(material, prop_name, new_name)
+
+    @staticmethod
+    def _restore_name(id_data, name, id_collection):
+        """
+        :return: 名前を戻した場合は元の名前、同じ名前のデータが残っている場合などはNone
+        """
+        if id_data is None or id_data.name == name or name in id_collection:
+            return None
+        old_name = id_data.name_full
+        id_data.name = name
+        return old_name
+
+    @staticmethod
+    def _get_groups_def():
+        """
+        :return: ((セクションのキー, パラメータ定義, マテリアルのパラメータ名, ゾーン数, 既存のグループのゾーン数, グループの作成オペレーター))
+        """
+        return (
+            (_keys.POSITION_GROUP, _MP.PositionGroupNode, "PositionGroup",
+             lambda x: len(x["Positions"]) // 2,
+             lambda x: len(x.pcl4_position_group_values.split(",")) // 2,
+             bpy.ops.pcl4mtl.new_position_group_node_tree),
+            (_keys.COLOR_GROUP, _MP.ColorGroupNode, "ColorGroup",
+             lambda x: len(x["Colors"]),
+             lambda x: len(x.pcl4_color_group_values.split(";")),
+             bpy.ops.pcl4mtl.new_color_group_node_tree),
         )
-        for groups_dict, params_def, material_param, num_zones_func, ot_new_group in groups_def:
-            if groups_dict is None:
-                continue
-            group_ids = set()
-            for nid, data in material_dict.items():
-                if nid not in material_ids:
-                    continue
-                group_id = data[_keys.PARAMS].get(material_param)
-                if group_id is not None:
-                    group_ids.add(group_id)
-            for nid, data in groups_dict.items():
-                try:
-                    if nid not in group_ids:
-                        continue
-                    node_groups_prev = set(bpy.data.node_groups)
-                    num_zones = num_zones_func(data[_keys.PARAMS])
-                    ot_new_group(num_zones=num_zones)
-                    new_group = next((x for x in bpy.data.node_groups if x not in node_groups_prev))
-                    self._import_parameters_from_json_params(new_group, nid, data[_keys.PARAMS], params_def)
-                    new_group.name = data[_keys.NODE_NAME]
-                    self.imported_node_trees[nid] = new_group
-                except Exception as err:
-                    print(err)
-                    self.skipped_nodes[nid] = err
 
-    def _create_pcl4_materials(self, material_ids: Iterable[str], materials_dict: dict, should_overwrite: bool):
-        if not util.is_material_addon_installed():
-            return
+    @staticmethod
+    def _new_group(ot_new_group, num_zones, new_group_finder=None):
+        """
+        :param new_group_finder: 複数のグループを作成する場合に共有する util.NewIdFinder
+                                 Noneの場合は呼び出しごとに作成する
+        """
+        if new_group_finder is None:
+            new_group_finder = util.NewIdFinder(bpy.data.node_groups)
+        ot_new_group(num_zones=num_zones)
+        return new_group_finder.find(ot_new_group)
 
-        material_ids = set(material_ids)
-        if len(material_ids) == 0:
+    def _create_group(self, nid, data, group_def, new_group_finder=None):
+        _, params_def, _, num_zones_func, _, ot_new_group = group_def
+        try:
+            new_group = self._new_group(ot_new_group, num_zones_func(data[_keys.PARAMS]), new_group_finder)
+            self._import_parameters_from_json_params(new_group, nid, data[_keys.PARAMS], params_def)
+            new_group.name = data[_keys.NODE_NAME]
+            self.imported_node_trees[nid] = new_group
+            return new_group
+        except Exception as err:
+            self.skipped_nodes[nid] = err
+            return None
+
+    def _create_pcl4_materials(self, plan, should_overwrite: bool):
+        if not util.is_material_addon_installed():
             return
 
-        class Dummy:
-            pass
-        class GradationDummy:
-            def __init__(self, importer, nid, data) -> None:
-                gradation_data = data.get("MaxGradation")
-                if gradation_data is None and "UniversalGradation" in data:
-                    gradation_data = list()
-                    src_data = data["UniversalGradation"]
-                    prev = None
-                    prev_interpolation = 0
-                    for gradation in src_data:
-                        curr = Dummy()
-                        importer._import_parameters_from_json_params(curr, nid, gradation, _MP.UniversalGradation)
-                        position = gradation.get("Position", 0.0)
-                        interpolation = gradation.get("Interpolation", 0)
-                        if prev is not None and prev_interpolation == 0:
-                            gradation_data[-1]["PosMax"] = position
-                            if interpolation != 0 and vars(prev) == vars(curr):
-                                prev = None
-                                continue
-                        zone = dict(vars(curr))
-                        zone["PosMin"] = position
-                        zone["PosMax"] = position
-                        gradation_data.append(zone)
-                        prev = curr
-                        prev_interpolation = interpolation
-                    if len(gradation_data) > 0:
-                        gradation_data[0]["PosMin"] = 0.0
-                        gradation_data[-1]["PosMax"] = 1.0
-                if gradation_data is None:
-                    self.zone_num = 0
-                    return
-                params_def = _MP.MaxGradation
-                self.zone_num = len(gradation_data)
-                dummies = []
-                for json_params in gradation_data:
-                    dummy = Dummy()
-                    dummies.append(dummy)
-                    importer._import_parameters_from_json_params(dummy, nid, json_params, params_def)
-                attr_defaults = {
-                    "pcl4mtl_zone_ids": 1,
-                    "pcl4mtl_zone_min_positions": 0.0,
-                    "pcl4mtl_zone_max_positions": 0.0,
-                    "pcl4mtl_zone_color_ons": True,
-                    "pcl4mtl_zone_colors": (0.0, 0.0, 0.0, 1.0),
-                    "pcl4mtl_zone_map_opacities": 1.0,
-                    "pcl4mtl_zone_map_ons": False,
-                    "pcl4mtl_zone_color_amounts": 1.0,
-                }
-                for _, (attr_name, attr_type) in params_def.get_params():
-                    if attr_type == _MP.AType.NOT_IMPLEMENTED:
-                        continue
-                    value_list = [getattr(dummy, attr_name, attr_defaults[attr_name]) for dummy in dummies]
-                    attr = ",".join([str(x) for x in value_list]) if attr_type != _MP.AType.COLOR else\
-                        ";".join([",".join([str(x) for x in sub_list]) for sub_list in value_list])
-                    setattr(self, attr_name, attr)
-
-        for nid in material_ids:
-            data = materials_dict[nid]
-            try:
-                if data[_keys.NODE_TYPE] != "AdvancedMaterial" or nid in self.dummy_advanced_materials:
-                    continue
-                dummy = Dummy()
-                self.dummy_advanced_materials[nid] = dummy
-                self._import_parameters_from_json_data(dummy, nid, data)
-            except Exception as err:
-                self.skipped_nodes[nid] = err
-        for nid in material_ids:
-            data = materials_dict[nid]
+        for nid, dummy in plan.advanced_materials.items():
+            self.dummy_advanced_materials.setdefault(nid, dummy)
+        # マテリアルの作成・初期化・パラメータの設定をそれぞれまとめて行う
+        # 初期化のオペレーターはコンテキストの上書きを全てのマテリアルで共有して呼び出す
+        created = []
+        for material_plan in plan.materials:
             try:
-                if data[_keys.NODE_TYPE] != "PencilMaterial" or nid not in material_ids:
-                    continue
-                name = data[_keys.NODE_NAME]
+                name = material_plan.name
                 if should_overwrite and name in bpy.data.materials and bpy.data.materials[name].library is None:
                     material = bpy.data.materials[name]
                 else:
@@ -534,31 +1184,36 @@ class Importer:
                     material.name = name
                 self.imported_materials[name] = material
                 material.use_nodes = True
-                dummy = GradationDummy(self, nid, data[_keys.PARAMS].get("Gradation"))
-                util.operator_call_with_override(
-                    bpy.ops.pcl4mtl.initialize_material,
-                    bpy.context, {"material": material}, {"zone_num": dummy.zone_num})
-                self._import_parameters_from_json_data(material, nid, data)
-                for _, (attr_name, _) in _MP.MaxGradation.get_params():
-                    value = getattr(dummy, attr_name, None) if attr_name is not None else None
-                    if value is not None:
-                        setattr(material, attr_name, value)
+                created.append((material_plan, material))
             except Exception as err:
-                self.skipped_nodes[nid] = err
+                self.skipped_nodes[material_plan.nid] = err
 
+        initialized = []
+        with self.perf.phase("initialize_material"):
+            override = util.OperatorOverride(bpy.context)
+            ot_initialize_material = bpy.ops.pcl4mtl.initialize_material
+            for material_plan, material in created:
+                try:
+                    override.call(ot_initialize_material, {"material": material},
+                                  {"zone_num": material_plan.zone_num})
+                    initialized.append((material_plan, material))
+                except Exception as err:
+                    self.skipped_nodes[material_plan.nid] = err
 
-    def _create_line_functions(self, material_ids: Iterable[str], materials_dict):
+        for material_plan, material in initialized:
+            try:
+                self._apply_params(material, material_plan.params)
+                for attr_name, value in material_plan.gradation:
+                    setattr(material, attr_name, value)
+            except Exception as err:
+                self.skipped_nodes[material_plan.nid] = err
+
+    def _create_line_functions(self, plan):
         if not util.is_line_addon_installed():
             return
-        for nid in material_ids:
-            data = materials_dict[nid]
+        for line_functions_plan in plan.line_functions:
             try:
-                if data[_keys.NODE_TYPE] != "PencilMaterial":
-                    continue
-                line_functions_id = data[_keys.PARAMS]["LineFunctions"]
-                if line_functions_id is None or line_functions_id not in materials_dict:
-                    continue
-                material_name = data[_keys.NODE_NAME]
+                material_name = line_functions_plan.material_name
                 target_material = self.imported_materials.get(material_name)
                 if target_material is None:
                     target_material = bpy.data.materials.get(material_name)
@@ -566,40 +1221,62 @@ class Importer:
                         target_material = bpy.data.materials.new(name=material_name)
                         target_material.name = material_name
                         self.imported_materials[material_name] = target_material
-                line_functions_data = materials_dict[line_functions_id]
-                line_finctions_name = line_functions_data[_keys.NODE_NAME]
-                line_functions_mat = self.imported_materials.get(line_finctions_name)
+                line_functions_mat = self.imported_materials.get(line_functions_plan.name)
                 if line_functions_mat is None:
-                    line_functions_mat = bpy.data.materials.new(name=line_finctions_name)
-                    self.imported_materials[line_finctions_name] = line_functions_mat
-                    line_functions_mat.use_nodes = True
-                    while len(line_functions_mat.node_tree.nodes) > 0:
-                        line_functions_mat.node_tree.nodes.remove(line_functions_mat.node_tree.nodes[0])
-                    node = line_functions_mat.node_tree.nodes.new(type="Pencil4LineFunctionsContainerNodeType")
-                    node.name = line_finctions_name
-                    line_functions_mat.use_nodes = False
-
-                    json_params = line_functions_data[_keys.PARAMS]
-                    node_params_def = self.node_types["LineRelatedFunctions"]
-                    for json_param_name, (attr_name, attr_type) in node_params_def.get_params():
-                        try:
-                            self.importers[attr_type](node, attr_name, json_params[json_param_name])
-                        except Exception as err:
-                            self.skipped_attributes.append((nid, attr_name, err))
+                    line_functions_mat, node = self._new_line_functions_material(line_functions_plan.name)
+                    self._apply_params(node, line_functions_plan.params)
                 target_material.pcl4_line_functions = line_functions_mat
             except Exception as err:
-                self.skipped_nodes[nid] = err
+                self.skipped_nodes[line_functions_plan.nid] = err
+
+    def _new_line_functions_material(self, line_finctions_name):
+        """
+        :return: (ライン関連機能のマテリアル, ライン関連機能のノード)
+        """
+        line_functions_mat = bpy.data.materials.new(name=line_finctions_name)
+        self.imported_materials[line_finctions_name] = line_functions_mat
+        line_functions_mat.use_nodes = True
+        while len(line_functions_mat.node_tree.nodes) > 0:
+            line_functions_mat.node_tree.nodes.remove(line_functions_mat.node_tree.nodes[0])
+        node = line_functions_mat.node_tree.nodes.new(type="Pencil4LineFunctionsContainerNodeType")
+        node.name = line_finctions_name
+        line_functions_mat.use_nodes = False
+        return line_functions_mat, node
+
+    def _create_line_functions_material(self, nid, line_functions_data):
+        line_functions_mat, node = self._new_line_functions_material(line_functions_data[_keys.NODE_NAME])
+        json_params = line_functions_data[_keys.PARAMS]
+        node_params_def = self.node_types["LineRelatedFunctions"].node_class
+        self._import_parameters_from_json_params(node, nid, json_params, node_params_def)
+        return line_functions_mat
 
     """
     Importers
     """
 
+    def _get_input_socket_index(self, node, prop_name):
+        """
+        プロパティに対応する入力ソケットのインデックス
+        インデックスはノードのクラスごとに保持し、識別子が一致しない場合だけ探し直す
+        """
+        key = (node.__class__, prop_name)
+        socket_index = self._input_socket_indices.get(key)
+        if socket_index is not None:
+            socket_id, index = socket_index
+            inputs = node.inputs
+            if index < len(inputs) and inputs[index].identifier == socket_id:
+                return index
+        else:
+            socket_id = node.bl_rna.properties[prop_name].default
+        index = node.find_input_socket_index(socket_id)
+        self._input_socket_indices[key] = (socket_id, index)
+        return index
+
     def _import_node_connection(self, node, prop_name, value):
         if value not in self.node_id_to_node_dict:
             return
-        socket_id = node.bl_rna.properties[prop_name].default
         child_node = self.node_id_to_node_dict[value]
-        self.target_node_tree.links.new(node.inputs[node.find_input_socket_index(socket_id)], child_node.outputs[0])
+        self.target_node_tree.links.new(node.inputs[self._get_input_socket_index(node, prop_name)], child_node.outputs[0])
 
     def _import_node_list(self, node, prop_name, value):
         if len(value) == 0:
@@ -609,6 +1286,7 @@ class Importer:
             if val not in self.node_id_to_node_dict:
                 continue
             child_node = self.node_id_to_node_dict[val]
+            # 次のソケットはこのソケットをリンクした時に追加されるため、予約せずにすぐにリンクする
             self.target_node_tree.links.new(node.inputs[i], child_node.outputs[0])
 
     def _import_curve(self, node, prop_name, value):
@@ -642,12 +1320,10 @@ class Importer:
         setattr(node, prop_name, float(value))
 
     def _import_float_percentage(self, node, prop_name, value):
-        #  JSON: raw value -> Blender: percentage
-        setattr(node, prop_name, float(value) * 100.0)
+        setattr(node, prop_name, _to_percentage(value))
 
     def _import_float_angle(self, node, prop_name, value):
-        #  JSON: degree -> Blender: radian
-        setattr(node, prop_name, math.radians(float(value)))
+        setattr(node, prop_name, _to_radians(value))
 
     def _import_float_with_scale(self, node, prop_name, value):
         setattr(node, prop_name, float(value) * self.scale_factor)
@@ -656,7 +1332,7 @@ class Importer:
         setattr(node, prop_name, bool(value))
 
     def _import_bool_list_8(self, node, prop_name, value):
-        setattr(node, prop_name, value[:min(8, len(value))] + [False] * max(0, 8 - len(value)))
+        setattr(node, prop_name, _to_bool_list_8(value))
 
     def _import_enum(self, node, prop_name, value):
         enum_items = node.bl_rna.properties[prop_name].enum_items
@@ -666,9 +1342,11 @@ class Importer:
         setattr(node, prop_name, value)
 
     def _import_color(self, node, prop_name, value):
-        setattr(node, prop_name, util.srgb_to_linear(value[0:3]))
+        setattr(node, prop_name, _to_linear_color(value))
 
     def _import_image(self, node, prop_name, value):
+        if value is None:
+            return
         if value in bpy.data.images:
             setattr(node, prop_name, bpy.data.images[value])
 
@@ -698,8 +1376,8 @@ class Importer:
         dummy = self.dummy_advanced_materials.get(value, None)
         if dummy is None:
             return
-        params_def = self.node_types["AdvancedMaterial"]
-        for _, (attr_name, _) in params_def.get_params():
+        params_def = self.node_types["AdvancedMaterial"].node_class
+        for _, attr_name, _, _ in Schema.get_implemented_params(params_def):
             if attr_name is not None and hasattr(dummy, attr_name):
                 setattr(node, attr_name, getattr(dummy, attr_name))
     
@@ -711,10 +1389,10 @@ class Importer:
         setattr(node, prop_name, value)
 
     def _import_float_array_string(self, node, prop_name, value):
-        setattr(node, prop_name, ",".join([str(x) for x in value]))
+        setattr(node, prop_name, ArrayCodec.encode_array(value))
     
     def _import_color_array_string(self, node, prop_name, value):
-        setattr(node, prop_name, ";".join([",".join([str(x) for x in sub_list]) for sub_list in value]))
+        setattr(node, prop_name, ArrayCodec.encode_color_array(value))
 
     def _import_userdef(self, node, prop_name, value):
         pass
@@ -722,6 +1400,31 @@ class Importer:
     def _import_not_implemented(*_):
         pass
 
+    """
+    Resetters
+    """
+
+    def _reset_node_connection(self, node, prop_name):
+        socket_id = node.bl_rna.properties[prop_name].default
+        socket = node.inputs[node.find_input_socket_index(socket_id)]
+        for link in list(socket.links):
+            self.target_node_tree.links.remove(link)
+
+    def _reset_node_list(self, node, prop_name):
+        socket_id = node.bl_rna.properties[prop_name].default
+        for socket in [x for x in node.inputs if x.identifier.startswith(socket_id)]:
+            for link in list(socket.links):
+                self.target_node_tree.links.remove(link)
+
+    def _reset_pointer(self, node, prop_name):
+        setattr(node, prop_name, None)
+
+    def _reset_collection(self, node, prop_name):
+        getattr(node, prop_name).clear()
+
+    def _reset_string(self, node, prop_name):
+        setattr(node, prop_name, "")
+
     """
     for Unity
     """
@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+import json
+import time
+import functools
+import contextlib
+from collections import OrderedDict
+
+
+class Counter:
+    __slots__ = ("count", "time")
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def add(self, elapsed):
+        self.count += 1
+        self.time += elapsed
+
+    def to_dict(self):
+        return OrderedDict((("count", self.count), ("time", self.time)))
+
+
+class PerformanceReport:
+    """
+    インポート・エクスポートの処理時間と呼び出し回数
+        phases: 処理の段階ごと (入れ子の段階は "親/子" の名前で記録する)
+        node_types: ノードの種類ごとのパラメータの読み書き (ATypeごとの処理の時間を含む)
+        attr_types: ATypeごとのインポート・エクスポート処理
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.total_time = 0.0
+        self.phases = OrderedDict()
+        self.node_types = OrderedDict()
+        self.attr_types = OrderedDict()
+        self._phase_stack = []
+
+    @staticmethod
+    def _get_counter(counters, key):
+        counter = counters.get(key)
+        if counter is None:
+            counter = Counter()
+            counters[key] = counter
+        return counter
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self._phase_stack.append(name)
+        counter = self._get_counter(self.phases, "/".join(self._phase_stack))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            counter.add(elapsed)
+            self._phase_stack.pop()
+            if len(self._phase_stack) == 0:
+                self.total_time += elapsed
+
+    def wrap_handlers(self, handlers: dict) -> dict:
+        """
+        ATypeをキーにした処理の辞書の各処理を、時間を計測する関数に置き換えた辞書を返す
+        """
+        def wrap(attr_type, handler):
+            counter = self._get_counter(self.attr_types, attr_type)
+
+            @functools.wraps(handler)
+            def wrapper(*args):
+                start = time.perf_counter()
+                try:
+                    return handler(*args)
+                finally:
+                    counter.add(time.perf_counter() - start)
+            return wrapper
+        return {attr_type: wrap(attr_type, handler) for attr_type, handler in handlers.items()}
+
+    def instrument_method(self, obj, method_name, key_func):
+        """
+        インスタンスのメソッドを、key_funcが返すノードの種類ごとに時間を計測するメソッドに置き換える
+        :param key_func: メソッドの引数からノードの種類の名前を返す関数
+        """
+        method = getattr(obj, method_name)
+        node_types = self.node_types
+
+        @functools.wraps(method)
+        def wrapper(*args):
+            counter = self._get_counter(node_types, key_func(*args))
+            start = time.perf_counter()
+            try:
+                return method(*args)
+            finally:
+                counter.add(time.perf_counter() - start)
+        setattr(obj, method_name, wrapper)
+
+    def to_dict(self):
+        def counters_to_dict(counters):
+            return OrderedDict((k, v.to_dict()) for k, v in counters.items())
+        ret = OrderedDict()
+        ret["name"] = self.name
+        ret["total_time"] = self.total_time
+        ret["phases"] = counters_to_dict(self.phases)
+        ret["node_types"] = counters_to_dict(
+            OrderedDict(sorted(self.node_types.items(), key=lambda x: -x[1].time)))
+        ret["attr_types"] = counters_to_dict(
+            OrderedDict(sorted(((k, v) for k, v in self.attr_types.items() if v.count > 0), key=lambda x: -x[1].time)))
+        return ret
+
+    def write_json(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+
+    def format(self):
+        lines = [f"{self.name}: {self.total_time * 1e3:.1f} ms"]
+        for title, counters in (("phase", self.phases), ("node type", self.node_types), ("attr type", self.attr_types)):
+            items = [(k, v) for k, v in counters.items() if v.count > 0]
+            if title != "phase":
+                items.sort(key=lambda x: -x[1].time)
+            if len(items) == 0:
+                continue
+            lines.append(f"  {title:<38}{'calls':>10}{'time [ms]':>12}")
+            for key, counter in items:
+                lines.append(f"  {key:<38}{counter.count:>10}{counter.time * 1e3:>12.2f}")
+        return "\n".join(lines)
+
+    def summary(self, count=3):
+        """
+        処理時間の長い段階の上位を1行で返す
+        """
+        top_phases = sorted(((k, v) for k, v in self.phases.items() if "/" not in k), key=lambda x: -x[1].time)[:count]
+        return f"{self.name} {self.total_time:.2f}s (" +\
+            ", ".join(f"{k} {v.time:.2f}s" for k, v in top_phases) + ")"
+
+
+class NullReport:
+    """
+    計測しない場合のPerformanceReportの代わり
+    """
+
+    @staticmethod
+    def phase(name):
+        return contextlib.nullcontext()
+
+
+NULL_REPORT = NullReport()
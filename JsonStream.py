@@ -0,0 +1,348 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+import io
+import json
+from collections import OrderedDict
+from collections.abc import Mapping
+
+
+class JsonStreamWriter:
+    """
+    JSONオブジェクトを要素単位で逐次書き出す
+    indentを指定した場合は json.dumps(obj, indent=indent, ensure_ascii=False) と同一の文字列を出力する
+    indentがNoneの場合は空白を含まないコンパクトな形式で出力する
+    """
+
+    def __init__(self, fp, indent=4, buffer_size=1 << 16):
+        """
+        :param fp: 書き込み先のテキストストリーム
+        :param indent: インデント幅 (Noneでコンパクト形式)
+        :param buffer_size: fp.writeを呼ぶまでに溜め込む最大文字数
+        """
+        self._fp = fp
+        self._indent = indent
+        self._buffer = []
+        self._buffered_size = 0
+        self._buffer_size = buffer_size
+        self._item_counts = []
+        if indent is None:
+            self._key_separator = ":"
+            self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        else:
+            self._key_separator = ": "
+            self._encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+
+    def begin_object(self):
+        self._write("{")
+        self._item_counts.append(0)
+
+    def begin_object_item(self, key):
+        self._write_key(key)
+        self.begin_object()
+
+    def write_item(self, key, value):
+        self._write_key(key)
+        encoded = self._encoder.encode(value)
+        if self._indent is not None and "\n" in encoded:
+            # 値の内部の改行に現在の階層のインデントを追加する (JSON文字列は生の改行を含まない)
+            encoded = encoded.replace("\n", self._newline(len(self._item_counts)))
+        self._write(encoded)
+
+    def end_object(self):
+        item_count = self._item_counts.pop()
+        if item_count > 0 and self._indent is not None:
+            self._write(self._newline(len(self._item_counts)))
+        self._write("}")
+
+    def flush(self):
+        if len(self._buffer) > 0:
+            self._fp.write("".join(self._buffer))
+            self._buffer.clear()
+            self._buffered_size = 0
+
+    def _write_key(self, key):
+        level = len(self._item_counts)
+        if self._item_counts[-1] > 0:
+            self._write(",")
+        self._item_counts[-1] += 1
+        if self._indent is not None:
+            self._write(self._newline(level))
+        self._write(self._encoder.encode(key))
+        self._write(self._key_separator)
+
+    def _newline(self, level):
+        return "\n" + " " * (self._indent * level)
+
+    def _write(self, s):
+        self._buffer.append(s)
+        self._buffered_size += len(s)
+        if self._buffered_size >= self._buffer_size:
+            self.flush()
+
+
+class JsonStreamReader:
+    """
+    テキストストリームを少しずつ読み込みながらJSONオブジェクトを先頭から辿る
+    個々の値はjson.JSONDecoder.raw_decodeで復元するため、メモリ上に保持するのは現在の値の範囲だけになる
+    """
+
+    _WHITESPACE = " \t\n\r"
+    _DELIMITERS = " \t\n\r,:]}"
+
+    def __init__(self, fp, chunk_size=1 << 16, track_byte_offsets=False):
+        """
+        :param fp: 読み込み元のテキストストリーム
+        :param chunk_size: 一度に読み込む文字数
+        :param track_byte_offsets: Trueの場合は値のファイル上のバイト位置を取得できるようにする
+                                   (fpは改行を変換しない newline="" で開いておくこと)
+        """
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self._encoding = (getattr(fp, "encoding", None) or "utf-8") if track_byte_offsets else None
+        # バッファ先頭のバイト位置と、バイト位置を計算済みのバッファ内の位置
+        self._buffer_byte_start = 0
+        self._marked_pos = 0
+        self._marked_byte_offset = 0
+
+    def begin_object(self):
+        """
+        オブジェクトの開始 '{' を読み込む
+        """
+        self._expect("{")
+
+    def next_key(self):
+        """
+        現在のオブジェクトの次のキーを読み込む
+        :return: キー文字列、オブジェクトの終端に達した場合はNone
+        """
+        c = self._peek()
+        if c == "}":
+            self._pos += 1
+            return None
+        if c == ",":
+            self._pos += 1
+            self._peek()
+        key = self._decode()
+        if not isinstance(key, str):
+            raise ValueError("JSON object key must be a string.")
+        self._expect(":")
+        return key
+
+    def read_value(self):
+        """
+        現在位置の値を読み込む
+        """
+        self._peek()
+        return self._decode()
+
+    def skip_value(self):
+        """
+        現在位置の値を読み飛ばす
+        """
+        self.read_value()
+
+    def read_value_range(self):
+        """
+        現在位置の値を読み込み、そのファイル上のバイト範囲と共に返す
+        (値の終端を求めるには値を復元する必要がある: json.JSONDecoderより速く読み飛ばす方法がないため)
+        :return: (値, (開始位置, 終了位置))
+        """
+        self._peek()
+        start = self.tell_bytes()
+        value = self._decode()
+        return value, (start, self.tell_bytes())
+
+    def tell_bytes(self):
+        """
+        現在位置のファイル上のバイト位置を返す (track_byte_offsets=Trueの場合のみ)
+        """
+        if self._encoding is None:
+            raise ValueError("Byte offsets are not tracked.")
+        # 前回計算した位置からの差分だけをエンコードする
+        if self._pos < self._marked_pos:
+            self._marked_pos = 0
+            self._marked_byte_offset = 0
+        self._marked_byte_offset += len(self._buffer[self._marked_pos:self._pos].encode(self._encoding))
+        self._marked_pos = self._pos
+        return self._buffer_byte_start + self._marked_byte_offset
+
+    def iter_object_items(self):
+        """
+        現在位置のオブジェクトを (キー, 値) の組で1要素ずつ列挙する
+        """
+        self.begin_object()
+        while True:
+            key = self.next_key()
+            if key is None:
+                return
+            yield key, self.read_value()
+
+    def iter_object_keys(self):
+        """
+        現在位置のオブジェクトを読み進め、キーのみを列挙する
+        """
+        self.begin_object()
+        while True:
+            key = self.next_key()
+            if key is None:
+                return
+            yield key
+            self.skip_value()
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._fp.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not chunk:
+            self._eof = True
+            return False
+        if self._encoding is not None:
+            self._buffer_byte_start = self.tell_bytes()
+            self._marked_pos = 0
+            self._marked_byte_offset = 0
+        # 読み込み済みの部分を捨ててバッファの大きさを抑える
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            length = len(buffer)
+            while pos < length and buffer[pos] in self._WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < length:
+                return buffer[pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON data.")
+
+    def _expect(self, c):
+        if self._peek() != c:
+            raise ValueError(f"Expecting '{c}' at {self._pos}.")
+        self._pos += 1
+
+    def _decode(self):
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # 数値はバッファの終端で途切れている可能性があるため、区切り文字が続くことを確認する
+                if self._eof or (end < len(self._buffer) and self._buffer[end] in self._DELIMITERS):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._fill():
+                if self._pos >= len(self._buffer):
+                    raise ValueError("Unexpected end of JSON data.")
+
+
+class JsonNodeFile:
+    """
+    JSONファイルを1度だけ先頭から読み進め、トップレベルの値を保持する
+    section_keysに指定したセクションは要素ごとのバイト範囲を記録し、要素は参照された時点でファイルから読み込む
+    バイト範囲を求めるために復元した要素は最初の参照で渡し、2回目以降の参照ではファイルから読み込み直す
+    """
+
+    def __init__(self, fp, section_keys, cache_size=256):
+        """
+        :param fp: シーク可能なバイナリストリーム (closeでJsonNodeFileと共に閉じる)
+        :param section_keys: 遅延読み込みするセクションのキー
+        :param cache_size: セクションごとに保持しておく読み込み済み要素の数
+        """
+        self.values = OrderedDict()
+        self._fp = fp
+        try:
+            self._index(section_keys, cache_size)
+        except Exception:
+            self.close()
+            raise
+
+    def _index(self, section_keys, cache_size):
+        # open()と同じ既定のエンコーディングで、改行を変換せずに読み込む
+        text = io.TextIOWrapper(self._fp, newline="")
+        try:
+            self._encoding = text.encoding
+            reader = JsonStreamReader(text, track_byte_offsets=True)
+            reader.begin_object()
+            while True:
+                key = reader.next_key()
+                if key is None:
+                    break
+                if key in section_keys:
+                    ranges = OrderedDict()
+                    decoded = dict()
+                    reader.begin_object()
+                    while True:
+                        item_key = reader.next_key()
+                        if item_key is None:
+                            break
+                        decoded[item_key], ranges[item_key] = reader.read_value_range()
+                    self.values[key] = JsonLazySection(self, ranges, cache_size, decoded)
+                else:
+                    self.values[key] = reader.read_value()
+        finally:
+            # TextIOWrapperの破棄でバイナリストリームが閉じられないように切り離す
+            text.detach()
+
+    def read_range(self, byte_range):
+        start, end = byte_range
+        self._fp.seek(start)
+        return json.loads(self._fp.read(end - start).decode(self._encoding))
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JsonLazySection(Mapping):
+    """
+    JsonNodeFileのセクション
+    読み取り専用の辞書として振る舞い、要素は参照された時点でファイルから読み込む
+    """
+
+    def __init__(self, source, ranges, cache_size, decoded=None):
+        """
+        :param decoded: 読み込み済みの要素 (最初の参照で渡し、以降は保持しない)
+        """
+        self._source = source
+        self._ranges = ranges
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._decoded = decoded if decoded is not None else dict()
+
+    def __getitem__(self, key):
+        value = self._cache.get(key)
+        if value is not None:
+            self._cache.move_to_end(key)
+            return value
+        value = self._decoded.pop(key, None)
+        if value is None:
+            value = self._source.read_range(self._ranges[key])
+        self._cache[key] = value
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def __contains__(self, key):
+        return key in self._ranges
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __len__(self):
+        return len(self._ranges)
@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+from collections import OrderedDict
+
+from .template import KeyNames as _keys
+
+from . import Utilities as util
+from . import JsonStream
+from . import BinaryFormat
+
+
+# 変更された場合に他のパラメータも含めて全て出力するパラメータ
+# (グラデーションのゾーン数が変わるとマテリアルを初期化し直すため)
+_FULL_PARAMS_KEYS = frozenset(("Gradation",))
+
+
+def is_patch(json_dict) -> bool:
+    return _keys.PATCH in json_dict
+
+
+def open_baseline(file_path):
+    """
+    差分の基準にするファイルを開く
+    ノードは比較する時点で1つずつ読み込むため、ファイル全体を辞書に展開しない
+    :return: valuesにトップレベルの値を持つオブジェクト (withで閉じる)
+    """
+    if BinaryFormat.is_binary_file_path(file_path):
+        return BinaryFormat.BinaryNodeFile(open(file_path, mode="rb"))
+    return JsonStream.JsonNodeFile(util.open_bridge_file_seekable(file_path), BinaryFormat.SECTION_KEYS)
+
+
+def values_equal(a, b) -> bool:
+    """
+    JSONとして同じ値になるかを比較する (タプルとリストを区別しない)
+    """
+    if isinstance(a, (list, tuple)):
+        return isinstance(b, (list, tuple)) and len(a) == len(b) and all(values_equal(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(values_equal(v, b[k]) for k, v in a.items())
+    return a == b
+
+
+def create_patch(baseline, sections):
+    """
+    ベースラインとの差分を作成する
+    :param baseline: ベースラインのファイルのトップレベルの値
+    :param sections: (セクションのキー, (ID, ノードの辞書) のイテレータ) のイテレータ
+    :return: セクションごとの {"Added": {ID: ノード}, "Removed": [ID], "Changed": {ID: 変更されたパラメータ}}
+    """
+    patch = OrderedDict()
+    for key, items in sections:
+        base_section = baseline.get(key)
+        patch[key] = _diff_section(base_section if base_section is not None else {}, items)
+    return patch
+
+
+def _diff_section(base_section, items):
+    added = OrderedDict()
+    changed = OrderedDict()
+    removed = []
+    seen_ids = set()
+    owner_id = None
+    for nid, data in items:
+        seen_ids.add(nid)
+        node_type = data.get(_keys.NODE_TYPE)
+        base = base_section.get(nid)
+        if base is None or base.get(_keys.NODE_TYPE) != node_type:
+            if base is not None:
+                removed.append(nid)
+            added[nid] = data
+        else:
+            entry = _diff_node(base, data)
+            if entry is not None:
+                changed[nid] = entry
+
+        # 拡張機能はPencil+ マテリアルの直後に出力される
+        # 拡張機能だけが変更された場合もインポート時に持ち主を特定できるように、持ち主の変更に拡張機能のIDを含める
+        if node_type == _keys.PENCIL_MATERIAL:
+            owner_id = nid
+        elif node_type == _keys.ADVANCED_MATERIAL and nid in changed and owner_id is not None and owner_id not in added:
+            owner_entry = changed.get(owner_id)
+            if owner_entry is None:
+                owner_entry = _create_entry(base_section[owner_id])
+                changed[owner_id] = owner_entry
+            owner_entry[_keys.PARAMS][_keys.ADVANCED_MATERIAL] = nid
+
+    removed.extend(nid for nid in base_section.keys() if nid not in seen_ids)
+
+    section = OrderedDict()
+    section[_keys.ADDED] = added
+    section[_keys.REMOVED] = removed
+    section[_keys.CHANGED] = changed
+    return section
+
+
+def _create_entry(data):
+    entry = OrderedDict()
+    entry[_keys.NODE_NAME] = data[_keys.NODE_NAME]
+    if _keys.NODE_TYPE in data:
+        entry[_keys.NODE_TYPE] = data[_keys.NODE_TYPE]
+    entry[_keys.PARAMS] = OrderedDict()
+    return entry
+
+
+def _diff_node(base, data):
+    """
+    :return: 変更されたパラメータだけを持つノードの辞書、変更が無い場合はNone
+    """
+    entry = _create_entry(data)
+    is_changed = False
+    if _keys.NODE_LOCATION in data and not values_equal(data[_keys.NODE_LOCATION], base.get(_keys.NODE_LOCATION)):
+        entry[_keys.NODE_LOCATION] = data[_keys.NODE_LOCATION]
+        is_changed = True
+
+    params = data[_keys.PARAMS]
+    base_params = base.get(_keys.PARAMS, {})
+    changed_params = entry[_keys.PARAMS]
+    for key, value in params.items():
+        if key not in base_params or not values_equal(value, base_params[key]):
+            changed_params[key] = value
+    if not _FULL_PARAMS_KEYS.isdisjoint(changed_params):
+        changed_params = OrderedDict(params)
+        entry[_keys.PARAMS] = changed_params
+    return entry if is_changed or len(changed_params) > 0 else None
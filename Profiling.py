@@ -0,0 +1,89 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+from . import Settings
+
+
+class ProfileCapture:
+    """
+    withの範囲をcProfileで計測し、同時に別スレッドから呼び出し履歴を一定間隔で記録する
+    cProfileの結果 (.prof) は関数ごとの集計、呼び出し履歴 (collapsed stacks) はフレームグラフの作成に使用する
+    """
+
+    def __init__(self, interval=0.001):
+        """
+        :param interval: 呼び出し履歴を記録する間隔 [秒] (実際の間隔はGILの切り替え間隔に制限される)
+        """
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.samples = Counter()
+        self.elapsed = 0.0
+        self._thread_id = None
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._start_time = 0.0
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._stop_event.clear()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self._start_time = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profile.disable()
+        self.elapsed = time.perf_counter() - self._start_time
+        self._stop_event.set()
+        self._sampler.join()
+        self._sampler = None
+        return False
+
+    def _sample(self):
+        current_frames = sys._current_frames
+        thread_id = self._thread_id
+        while not self._stop_event.wait(self.interval):
+            frame = current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                             .replace(";", ":"))
+                frame = frame.f_back
+            if len(stack) > 0:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, file_path):
+        """
+        計測結果をファイルの隣に書き出す
+        :return: (.profのパス, collapsed stacksのパス)
+        """
+        prof_path = file_path + Settings.PROFILE_FILE_EXTENSION
+        collapsed_path = file_path + Settings.COLLAPSED_STACKS_FILE_EXTENSION
+        self.profile.dump_stats(prof_path)
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        return prof_path, collapsed_path
+
+    def get_top_functions(self, count=3):
+        """
+        :return: 自身の処理時間 (呼び出し先を除く) が長い関数の [(関数名, 時間 [秒])]
+        """
+        stats = pstats.Stats(self.profile)
+        items = sorted(stats.stats.items(), key=lambda x: -x[1][2])[:count]
+        return [(f"{name} ({os.path.basename(file_name)}:{line})", tottime)
+                for (file_name, line, name), (_, _, tottime, _, _) in items]
+
+    def summary(self, count=3):
+        top = ", ".join(f"{name} {t:.2f}s" for name, t in self.get_top_functions(count))
+        return f"profiled {self.elapsed:.2f}s, {sum(self.samples.values())} samples (top: {top})"
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+import inspect
+from collections import namedtuple
+
+from . import template as _MP
+
+
+"""
+パラメータ定義
+    json_name: JSON上のパラメータ名
+    attr_name: Blender上のプロパティ名
+    attr_type: AType
+    converter: 文字列から値を復元する型変換関数 (INT/FLOAT/BOOL以外はNone)
+"""
+ParamDef = namedtuple("ParamDef", ("json_name", "attr_name", "attr_type", "converter"))
+
+"""
+ノード定義をコンパイルしたスキーマ
+    node_class: template.Nodeのサブクラス
+    params: 全パラメータのParamDefのタプル (template.Node.get_params()と同じ順序)
+    implemented_params: NOT_IMPLEMENTED以外のParamDefのタプル
+"""
+NodeSchema = namedtuple("NodeSchema", ("node_class", "params", "implemented_params"))
+
+
+_converters = {
+    _MP.AType.INT: int,
+    _MP.AType.FLOAT: float,
+    _MP.AType.BOOL: bool,
+}
+
+
+def compile_schema(node_class) -> NodeSchema:
+    params = tuple(ParamDef(json_name, attr_name, attr_type, _converters.get(attr_type))
+                   for json_name, (attr_name, attr_type) in node_class.get_params())
+    implemented_params = tuple(x for x in params if x.attr_type != _MP.AType.NOT_IMPLEMENTED)
+    return NodeSchema(node_class, params, implemented_params)
+
+
+# アドオンの読み込み時に全てのノード定義をコンパイルしておく
+_schemas = dict((cls, compile_schema(cls)) for _, cls
+                in inspect.getmembers(_MP, inspect.isclass)
+                if issubclass(cls, _MP.Node) and cls is not _MP.Node)
+
+
+def get_schema(node_class) -> NodeSchema:
+    schema = _schemas.get(node_class)
+    if schema is None:
+        schema = compile_schema(node_class)
+        _schemas[node_class] = schema
+    return schema
+
+
+def get_params(node_class) -> tuple:
+    return get_schema(node_class).params
+
+
+def get_implemented_params(node_class) -> tuple:
+    return get_schema(node_class).implemented_params
+
+
+class NodeTypeRegistry:
+    """
+    ノード定義の名前引き表
+    エクスポート名・Blenderのクラス名・bl_idnameのいずれからもコンパイル済みスキーマを引ける
+    """
+
+    def __init__(self, schemas):
+        self.export_name_to_schema = dict()
+        self.blender_node_name_to_schema = dict()
+        self.blender_id_name_to_schema = dict()
+        for schema in schemas:
+            node_class = schema.node_class
+            if not node_class.is_blender_node():
+                continue
+            self.export_name_to_schema[node_class.get_node_to_export_name()] = schema
+            if node_class.get_blender_node_name():
+                self.blender_node_name_to_schema[node_class.get_blender_node_name()] = schema
+            if node_class.get_blender_id_name():
+                self.blender_id_name_to_schema[node_class.get_blender_id_name()] = schema
+        self.export_name_to_blender_id_name = dict(
+            (k, v.node_class.get_blender_id_name()) for k, v in self.export_name_to_schema.items())
+        self.blender_id_name_to_export_name = dict(
+            (k, v.node_class.get_node_to_export_name()) for k, v in self.blender_id_name_to_schema.items())
+
+
+_registry = None
+
+
+def get_registry() -> NodeTypeRegistry:
+    global _registry
+    if _registry is None:
+        _registry = NodeTypeRegistry(_schemas.values())
+    return _registry
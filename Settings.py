@@ -21,6 +21,52 @@ SUPPORTED_FILE_VERSION_MIN = "1.0"
 """
 UNSUPPORTED_FILE_VERSION_MIN = "2.0"
 
+"""
+ファイルの拡張子
+"""
+JSON_FILE_EXTENSION = ".json"
+COMPRESSED_JSON_FILE_EXTENSION = ".json.gz"
+
+BINARY_FILE_EXTENSION = ".pcl4b"
+
+"""
+バイナリ形式のファイル構成のバージョン (格納するデータ自体のバージョンはFILE_VERSION)
+"""
+BINARY_FORMAT_VERSION = 1
+
+"""
+圧縮ファイルの既定の圧縮レベル (1-9)
+"""
+DEFAULT_COMPRESSION_LEVEL = 6
+
+"""
+処理時間の計測結果を書き出すファイルの拡張子 (Bridgeファイルのパスの末尾に追加する)
+"""
+PERFORMANCE_REPORT_FILE_EXTENSION = ".perf.json"
+
+"""
+プロファイルの結果を書き出すファイルの拡張子 (Bridgeファイルのパスの末尾に追加する)
+.prof はcProfileの結果、.collapsed.txt はフレームグラフ用の呼び出し履歴
+"""
+PROFILE_FILE_EXTENSION = ".prof"
+COLLAPSED_STACKS_FILE_EXTENSION = ".collapsed.txt"
+
+"""
+バックグラウンドでの書き出し中の一時ファイルの接頭辞 (ファイル名の先頭に追加する)
+拡張子で形式を判別するため、拡張子は変えない
+"""
+TEMPORARY_FILE_PREFIX = "~"
+
+"""
+インポートしたラインのノード・マテリアルに保存する、インポート元の内容のハッシュのカスタムプロパティ名
+"""
+CONTENT_HASH_PROPERTY_NAME = "pcl4bridge_content_hash"
+
+"""
+インポートしたラインのノード・マテリアルに保存する、インポート直後のBlender上のデータのハッシュのカスタムプロパティ名
+"""
+STATE_HASH_PROPERTY_NAME = "pcl4bridge_state_hash"
+
 """
 1m = 1.0とした時のスケール
 """
@@ -9,6 +9,22 @@ translation_dict = {
     "ja_JP": {
         ("*", "Bridge"):
             "ブリッジ",
+        ("*", "Compact"):
+            "コンパクト",
+        ("*", "Compression Level"):
+            "圧縮レベル",
+        ("*", "Binary"):
+            "バイナリ",
+        ("*", "Incremental"):
+            "差分書き出し",
+        ("*", "Baseline"):
+            "ベースライン",
+        ("*", "Performance Report"):
+            "処理時間の記録",
+        ("*", "Capture Profile"):
+            "プロファイルの記録",
+        ("*", "Background Write"):
+            "バックグラウンドで書き出し",
 
         (ctxt, "Import"):
             "読み込み",
@@ -38,5 +54,15 @@ translation_dict = {
             "無効の 個別ブラシ設定 を読み込む",
         (ctxt, "Import disabled Reduction Settings"):
             "無効の 減衰設定 を読み込む",
+        (ctxt, "Low Memory Import"):
+            "省メモリ読み込み",
+        (ctxt, "Patch File: all differences are applied"):
+            "差分ファイル: 全ての差分を適用します",
+        (ctxt, "Skip Unchanged"):
+            "変更のないデータを読み込まない",
+        (ctxt, "Performance Report"):
+            "処理時間の記録",
+        (ctxt, "Capture Profile"):
+            "プロファイルの記録",
     }
 }
@@ -2,6 +2,9 @@
 # The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
 
 import bpy
+import gzip
+import shutil
+import tempfile
 from itertools import chain, repeat
 from collections import OrderedDict
 from . import Settings as settings
@@ -21,14 +24,22 @@ def enumerate_material_and_line_functions():
     if not is_line_addon_installed():
         return
     for mat in bpy.data.materials:
-        if mat.pcl4_line_functions is None:
-            continue
-        node = next((x for x in mat.pcl4_line_functions.node_tree.nodes
-                     if x.bl_idname == "Pencil4LineFunctionsContainerNodeType"), None)
+        node = get_line_functions_node(mat)
         if node is not None:
             yield mat, node
 
 
+def get_line_functions_node(mat):
+    """
+    :return: マテリアルに設定されたライン関連機能のノード (設定されていない場合はNone)
+    """
+    line_functions = getattr(mat, "pcl4_line_functions", None)
+    if line_functions is None:
+        return None
+    return next((x for x in line_functions.node_tree.nodes
+                 if x.bl_idname == "Pencil4LineFunctionsContainerNodeType"), None)
+
+
 def get_curve_points(node, curve_name):
     curve_node = node.get_curve_data(curve_name)
     if curve_node is None:
@@ -71,26 +82,6 @@ def create_pencil_material_dummy(node_name, line_functions_id):
     return dic
 
 
-def srgb_to_linear(srgb_array):
-    def conv(srgb):
-        if srgb <= 0.040448:
-            return srgb / 12.92
-        else:
-            return pow(((srgb + 0.055) / 1.055), 2.4)
-
-    return [conv(x) for x in srgb_array]
-
-
-def linear_to_srgb(linear_array):
-    def conv(linear):
-        if linear > 0.003231:
-            return 1.055 * (pow(linear, (1 / 2.4))) - 0.055
-        else:
-            return 12.92 * linear
-
-    return [conv(x) for x in linear_array]
-
-
 def is_file_version_supported(version):
     try:
         major, minor = (int(x) for x in version.split("."))
@@ -102,15 +93,174 @@ def is_file_version_supported(version):
     except ValueError:
         return False
 
+def is_compressed_file_path(file_path) -> bool:
+    return file_path.lower().endswith(".gz")
+
+
+def open_bridge_file(file_path, mode="r", compression_level=settings.DEFAULT_COMPRESSION_LEVEL):
+    """
+    Bridgeファイルをテキストストリームとして開く
+    拡張子が .gz の場合はgzipで圧縮・展開しながら逐次読み書きする
+    :param file_path:
+    :param mode: "r" または "w"
+    :param compression_level: 書き込み時の圧縮レベル (1-9)
+    """
+    if is_compressed_file_path(file_path):
+        return gzip.open(file_path, mode + "t", compresslevel=compression_level)
+    return open(file_path, mode=mode)
+
+
+def open_bridge_file_seekable(file_path):
+    """
+    Bridgeファイルをランダムアクセス可能なバイナリストリームとして開く
+    圧縮ファイルは逆方向のシークが遅いため、一時ファイルに展開してから開く
+    """
+    if not is_compressed_file_path(file_path):
+        return open(file_path, mode="rb")
+    temp_file = tempfile.TemporaryFile()
+    try:
+        with gzip.open(file_path, "rb") as src:
+            shutil.copyfileobj(src, temp_file)
+        temp_file.seek(0)
+    except Exception:
+        temp_file.close()
+        raise
+    return temp_file
+
+
+class OperatorOverride:
+    """
+    コンテキストを上書きしてオペレーターを繰り返し呼び出す
+    context.copy() は全てのコンテキストのメンバーを辞書にするため、呼び出しごとに行わずに共有する
+        temp_override がある場合: 上書きするメンバーだけを渡す (その他のメンバーは現在のコンテキストのまま)
+        temp_override がない場合: 最初の呼び出しでコピーした辞書を、上書きするメンバーだけ更新して使い回す
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.has_temp_override = hasattr(context, "temp_override")
+        self._override = None
+
+    def call(self, op, overrides, args={}):
+        if self.has_temp_override:
+            with self.context.temp_override(**overrides):
+                return op('INVOKE_DEFAULT', **args)
+        if self._override is None:
+            self._override = self.context.copy()
+        self._override.update(overrides)
+        return op(self._override, 'INVOKE_DEFAULT', **args)
+
+
 def operator_call_with_override(op, context, overrides, args={}):
-    override = context.copy()
-    for k, v in overrides.items():
-        override[k] = v
-    if hasattr(context, "temp_override"):
-        with context.temp_override(**override):
-            op('INVOKE_DEFAULT', **args)
-    else:
-        op(override, 'INVOKE_DEFAULT', **args)
+    OperatorOverride(context).call(op, overrides, args)
+
+
+class OrphanCollector:
+    """
+    処理の結果使用されなくなったIDをまとめて削除する
+    処理の前に使用中のIDとその使用数を記録し、処理の後に使用数が0になったIDだけを削除対象にする
+    (処理で作成されたIDや、処理の前から使用されていなかったIDは削除しない)
+    """
+
+    def __init__(self, ids):
+        """
+        :param ids: 削除対象になり得るIDの列 (作成時に1度だけ列挙する)
+        """
+        self.users_before = dict()
+        for id_data in ids:
+            users = id_data.users
+            if users > 0:
+                self.users_before[id_data] = users
+
+    def collect(self) -> list:
+        """
+        :return: 使用されなくなったIDのリスト (記録した順)
+        """
+        orphans = []
+        for id_data in self.users_before:
+            try:
+                if id_data.users == 0:
+                    orphans.append(id_data)
+            except ReferenceError:
+                # 処理の中で削除されたID
+                pass
+        return orphans
+
+    def remove_orphans(self) -> list:
+        """
+        使用されなくなったIDを bpy.data.batch_remove で1度に削除する
+        :return: 削除したIDの名前のリスト
+        """
+        orphans = self.collect()
+        names = [x.name_full for x in orphans]
+        if len(orphans) > 0:
+            bpy.data.batch_remove(orphans)
+        self.users_before.clear()
+        return names
+
+
+"""
+NewIdFinder が既定の名前から連番の名前を探す最大数 (超えた場合は全体を走査する)
+"""
+NEW_ID_NAME_PROBES_MAX = 64
+
+
+def split_numbered_name(name):
+    """
+    :return: Blenderが重複を避けるために付ける連番 (.001 など) を除いた名前
+    """
+    base, sep, number = name.rpartition(".")
+    if sep and len(number) >= 3 and number.isdigit():
+        return base
+    return name
+
+
+class NewIdFinder:
+    """
+    オペレーターで作成されたIDを見つける
+    呼び出し前のIDの集合を全ての呼び出しで共有し、作成されたIDを追加していく
+    Blenderは作成したIDに既定の名前 (使用中の場合は .001 などの連番を付けた名前) を付けるため、
+    作成の種類ごとに最初に見つけたIDから既定の名前を覚え、以降は名前で検索する
+    (bpy.data の get はCで検索するため、Pythonで全てのIDを走査するより十分に速い)
+    名前で見つからない場合は全てのIDを走査する
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.known = set(collection)
+        self._base_names = dict()
+
+    def find(self, key=None):
+        """
+        :param key: 作成の種類 (既定の名前が同じ作成ごとに同じ値を指定する)
+        :return: 前回の呼び出し以降に作成されたID
+        """
+        new_id = None
+        base_name = self._base_names.get(key)
+        if base_name is not None:
+            new_id = self._find_by_name(base_name)
+        if new_id is None:
+            new_id = next((x for x in self.collection if x not in self.known))
+            self._base_names[key] = split_numbered_name(new_id.name)
+        self.known.add(new_id)
+        return new_id
+
+    def discard(self, id_data):
+        """
+        削除するIDを集合から取り除く (削除後に作成されたIDと区別できなくなるため、削除の前に呼び出す)
+        """
+        self.known.discard(id_data)
+
+    def _find_by_name(self, base_name):
+        # 連番は使用されていない最小の番号が付けられるため、見つからない名前があればそれ以降は探さない
+        for i in range(NEW_ID_NAME_PROBES_MAX):
+            id_data = self.collection.get(base_name if i == 0 else f"{base_name}.{i:03d}")
+            if id_data is None:
+                return None
+            if id_data not in self.known:
+                return id_data
+        return None
+
 
 def is_material_addon_installed() -> bool:
     return hasattr(bpy.types.Material, "is_pcl4_material")
@@ -39,17 +39,23 @@ class KeyNames:
     PLATFORM = "Platform"
     FILE_VERSION = "FileVersion"
     SCALE_FACTOR = "ScaleFactor"
+    INDEX = "Index"
     LINES = "LineNode"
     MATERIALS = "MaterialNode"
     POSITION_GROUP = "PositionGroup"
     COLOR_GROUP = "ColorGroup"
     PENCIL_MATERIAL = "PencilMaterial"
+    ADVANCED_MATERIAL = "AdvancedMaterial"
     BLENDER_CURVE_KEYS = "BlenderCurveKeys"
     UNIVERSAL_CURVE_KEYS = "UniversalKeys"
     NODE_NAME = "NodeName"
     NODE_TYPE = "NodeType"
     PARAMS = "Params"
     NODE_LOCATION = "BlenderNodeLocation"
+    PATCH = "Patch"
+    ADDED = "Added"
+    REMOVED = "Removed"
+    CHANGED = "Changed"
 
 
 class Node:
@@ -0,0 +1,29 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+Blenderの外からアドオンのモジュールを読み込むためのヘルパー
+アドオンの__init__.pyはbpyを必要とするため、実行せずにパッケージとして登録する
+"""
+
+import sys
+import types
+import importlib
+from pathlib import Path
+
+ADDON_DIR = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = "pcl4bridge"
+
+
+def load_addon_package():
+    package = sys.modules.get(PACKAGE_NAME)
+    if package is None:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [str(ADDON_DIR)]
+        sys.modules[PACKAGE_NAME] = package
+    return package
+
+
+def import_addon_module(name):
+    load_addon_package()
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+複数の .blend ファイルに対して、バックグラウンドのBlenderでエクスポート・インポートを並列に実行する
+    python tools/batch.py MANIFEST.json [--workers N] [--blender PATH] [--report REPORT.json] [--timeout SEC]
+
+マニフェストの形式 (相対パスはマニフェストのディレクトリを基準にする)
+    {
+        "jobs": [
+            {"blend": "shots/s010.blend", "action": "export", "output": "out/s010.json"},
+            {"blend": "shots/s020.blend", "action": "import", "input": "presets/show.json", "mode": "REPLACE"}
+        ]
+    }
+export: output (拡張子で形式を判別), compact, compression_level, baseline (差分の基準)
+import: input, tree (省略時は最初のラインノードツリー), mode ("MERGE" / "REPLACE"), line_ids, material_ids,
+        scale_factor, streaming, save (既定値 true), save_as
+共通: perf (true の場合は処理時間の計測結果をレポートに含める)
+
+同じ .blend ファイルのジョブはマニフェストの順序で1つのBlenderプロセスで実行する
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "batch_worker.py")
+
+# ジョブの中でパスとして扱うキー
+_PATH_KEYS = ("blend", "output", "input", "baseline", "save_as")
+
+
+def load_manifest(manifest_path):
+    """
+    :return: .blend ファイルのパスをキーにした、ジョブのリストの辞書 (マニフェストの順序を保持する)
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    groups = OrderedDict()
+    for job in manifest["jobs"]:
+        job = dict(job)
+        for key in _PATH_KEYS:
+            if job.get(key):
+                job[key] = os.path.normpath(os.path.join(base_dir, job[key]))
+        groups.setdefault(job.pop("blend"), []).append(job)
+    return groups
+
+
+def run_blend(blender, blend_path, jobs, timeout):
+    """
+    1つの .blend ファイルのジョブをBlenderで実行する
+    :return: 結果の辞書
+    """
+    result = OrderedDict()
+    result["blend"] = blend_path
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jobs_path = os.path.join(temp_dir, "jobs.json")
+        result_path = os.path.join(temp_dir, "result.json")
+        with open(jobs_path, "w", encoding="utf-8") as f:
+            json.dump(jobs, f)
+        for job in jobs:
+            for key in ("output", "save_as"):
+                if job.get(key):
+                    os.makedirs(os.path.dirname(job[key]), exist_ok=True)
+
+        command = [blender, "--background", blend_path, "--python-exit-code", "1",
+                   "--python", WORKER_SCRIPT, "--", jobs_path, result_path]
+        error = None
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     timeout=timeout, encoding="utf-8", errors="replace")
+            result["returncode"] = process.returncode
+            output = process.stdout
+        except subprocess.TimeoutExpired as e:
+            result["returncode"] = None
+            error = "timeout"
+            output = e.stdout if isinstance(e.stdout, str) else (e.stdout or b"").decode("utf-8", "replace")
+        except OSError as e:
+            result["returncode"] = None
+            error = output = str(e)
+        result["process_time"] = time.perf_counter() - start
+
+        job_results = None
+        if os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                job_results = json.load(f)
+
+    if job_results is None:
+        # Blenderの起動失敗やタイムアウトなどで結果が書き出されなかった場合は全てのジョブを失敗とする
+        if error is None:
+            error = "worker did not report results"
+        job_results = [{"action": job.get("action"), "status": "failed", "error": error} for job in jobs]
+        result["log"] = output[-4000:] if output else ""
+    for job, job_result in zip(jobs, job_results):
+        job_result.update((k, job[k]) for k in ("input", "output") if k in job)
+    result["jobs"] = job_results
+    result["status"] = "ok" if all(x["status"] == "ok" for x in job_results) else "failed"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("manifest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"))
+    parser.add_argument("--report", default=None)
+    parser.add_argument("--timeout", type=float, default=None)
+    args = parser.parse_args()
+
+    groups = load_manifest(args.manifest)
+    start = time.perf_counter()
+    # 各スレッドはBlenderプロセスの終了を待つだけのため、並列数はBlenderのプロセス数になる
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(run_blend, args.blender, blend_path, jobs, args.timeout)
+                   for blend_path, jobs in groups.items()]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(f"[{result['status']}] {result['blend']} ({result['process_time']:.1f}s)", flush=True)
+
+    job_results = [x for result in results for x in result["jobs"]]
+    report = OrderedDict()
+    report["manifest"] = os.path.abspath(args.manifest)
+    report["workers"] = args.workers
+    report["wall_time"] = time.perf_counter() - start
+    report["process_time"] = sum(x["process_time"] for x in results)
+    report["blend_files"] = len(results)
+    report["jobs"] = len(job_results)
+    report["succeeded"] = sum(1 for x in job_results if x["status"] == "ok")
+    report["failed"] = len(job_results) - report["succeeded"]
+    report["results"] = results
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"{report['succeeded']}/{report['jobs']} jobs succeeded in {report['wall_time']:.1f}s "
+          f"({report['process_time']:.1f}s of Blender time, {args.workers} workers)")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
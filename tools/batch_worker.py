@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+tools/batch.py から起動されるBlender側の処理
+    blender --background FILE.blend --python tools/batch_worker.py -- JOBS.json RESULT.json
+JOBS.json の全てのジョブを開いている .blend ファイルに対して順に実行し、結果を RESULT.json に書き出す
+"""
+
+import os
+import sys
+import json
+import time
+import traceback
+
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _bootstrap import import_addon_module
+
+Exporter = import_addon_module("Exporter")
+Importer = import_addon_module("Importer")
+Settings = import_addon_module("Settings")
+util = import_addon_module("Utilities")
+
+
+def find_target_node_tree(tree_name):
+    if tree_name:
+        return bpy.data.node_groups.get(tree_name)
+    return next(iter(util.enumerate_all_node_trees()), None)
+
+
+def run_export(job):
+    exporter = Exporter.Exporter()
+    perf = exporter.enable_instrumentation() if job.get("perf", False) else None
+    exporter.export_to_file(bpy.context, job["output"],
+                            compact=job.get("compact", False),
+                            compression_level=job.get("compression_level", Settings.DEFAULT_COMPRESSION_LEVEL),
+                            baseline_file_path=job.get("baseline"))
+    result = {"output_size": os.path.getsize(job["output"])}
+    if perf is not None:
+        result["perf"] = perf.to_dict()
+    return result
+
+
+def run_import(job):
+    settings = Importer.ImporterSettings()
+    settings.line_ids = job.get("line_ids")
+    settings.material_ids = job.get("material_ids")
+    settings.should_overwrite = job.get("mode", "MERGE") == "REPLACE"
+    if "scale_factor" in job:
+        settings.use_custom_scale = True
+        settings.custom_scale_factor = float(job["scale_factor"])
+
+    target_node_tree = find_target_node_tree(job.get("tree"))
+    importer = Importer.Importer()
+    perf = importer.enable_instrumentation() if job.get("perf", False) else None
+    importer.import_from_file(job["input"], target_node_tree, bpy.context.scene, settings,
+                              streaming=job.get("streaming", False))
+
+    save_path = job.get("save_as")
+    if save_path:
+        bpy.ops.wm.save_as_mainfile(filepath=save_path, copy=True)
+    elif job.get("save", True):
+        bpy.ops.wm.save_mainfile()
+    result = {
+        "target_node_tree": target_node_tree.name if target_node_tree is not None else None,
+        "skipped_nodes": {k: str(v) for k, v in importer.skipped_nodes.items()},
+        "skipped_attributes": len(importer.skipped_attributes),
+    }
+    if perf is not None:
+        result["perf"] = perf.to_dict()
+    return result
+
+
+_actions = {
+    "export": run_export,
+    "import": run_import,
+}
+
+
+def main():
+    jobs_path, result_path = sys.argv[sys.argv.index("--") + 1:][:2]
+    with open(jobs_path, encoding="utf-8") as f:
+        jobs = json.load(f)
+
+    results = []
+    for job in jobs:
+        result = {"action": job.get("action")}
+        start = time.perf_counter()
+        try:
+            result.update(_actions[job["action"]](job))
+            result["status"] = "ok"
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = f"{type(e).__name__}: {e}"
+            result["traceback"] = traceback.format_exc()
+        result["time"] = time.perf_counter() - start
+        results.append(result)
+
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+JSONとバイナリ形式の読み込み時間を比較する
+    python tools/bench_binary.py FILE.json [FILE.json ...] [--repeat N]
+全体の読み込みと、ファイルを開いて1つのノードだけを取り出す場合 (ランダムアクセス) を計測する
+"""
+
+import io
+import json
+import timeit
+import argparse
+
+from _bootstrap import import_addon_module
+
+BinaryFormat = import_addon_module("BinaryFormat")
+JsonStream = import_addon_module("JsonStream")
+_keys = import_addon_module("template").KeyNames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=args.repeat)) * 1e3
+
+    for path in args.files:
+        with open(path, mode="rb") as f:
+            json_bytes = f.read()
+        json_dict = json.loads(json_bytes)
+        out = io.BytesIO()
+        BinaryFormat.dump(json_dict, out)
+        binary_bytes = out.getvalue()
+        assert BinaryFormat.load(io.BytesIO(binary_bytes)) == json_dict
+
+        lines = list(json_dict.get(_keys.LINES, {}).keys())
+        target = lines[len(lines) // 2] if len(lines) > 0 else None
+
+        def json_random_access():
+            with JsonStream.JsonNodeFile(io.BytesIO(json_bytes), BinaryFormat.SECTION_KEYS) as json_file:
+                return json_file.values[_keys.LINES][target]
+
+        def binary_random_access():
+            with BinaryFormat.BinaryNodeFile(io.BytesIO(binary_bytes)) as binary_file:
+                return binary_file.values[_keys.LINES][target]
+
+        json_load = best(lambda: json.loads(json_bytes))
+        binary_load = best(lambda: BinaryFormat.load(io.BytesIO(binary_bytes)))
+        print(path)
+        print(f"{'':<26}{'json':>12}{'binary':>12}{'speedup':>10}")
+        print(f"{'size [KB]':<26}{len(json_bytes) / 1024:>12.1f}{len(binary_bytes) / 1024:>12.1f}"
+              f"{len(json_bytes) / len(binary_bytes):>9.1f}x")
+        print(f"{'load all [ms]':<26}{json_load:>12.1f}{binary_load:>12.1f}{json_load / binary_load:>9.1f}x")
+        if target is not None:
+            json_one = best(json_random_access)
+            binary_one = best(binary_random_access)
+            print(f"{'open + one node [ms]':<26}{json_one:>12.1f}{binary_one:>12.1f}{json_one / binary_one:>9.1f}x")
+        print()
+
+
+if __name__ == "__main__":
+    main()
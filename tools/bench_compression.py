@@ -0,0 +1,121 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+Bridgeファイルの圧縮レベルごとのサイズと書き込み・読み込み時間を比較する
+    python tools/bench_compression.py FILE.json [FILE.json ...] [--scale N] [--levels 1,6,9]
+--scaleを指定した場合は、ノードをN倍に複製した巨大なファイルを想定して計測する
+"""
+
+import io
+import gzip
+import json
+import time
+import argparse
+from collections import OrderedDict
+
+from _bootstrap import import_addon_module
+
+JsonStream = import_addon_module("JsonStream")
+_keys = import_addon_module("template").KeyNames
+
+
+def scale_document(json_dict, scale):
+    """
+    ノードをscale倍に複製する (複製したノードのIDと参照先には連番の接尾辞を付ける)
+    """
+    if scale <= 1:
+        return json_dict
+    sections = (_keys.LINES, _keys.MATERIALS, _keys.POSITION_GROUP, _keys.COLOR_GROUP)
+    ids = set()
+    for section in sections:
+        ids.update(json_dict.get(section, {}).keys())
+
+    def rename(value, suffix):
+        if isinstance(value, str):
+            return value + suffix if value in ids else value
+        if isinstance(value, list):
+            return [rename(x, suffix) for x in value]
+        if isinstance(value, dict):
+            return OrderedDict((k, rename(v, suffix)) for k, v in value.items())
+        return value
+
+    result = OrderedDict()
+    for key, value in json_dict.items():
+        if key in sections:
+            section = OrderedDict()
+            for i in range(scale):
+                suffix = f"_{i}" if i > 0 else ""
+                for nid, data in value.items():
+                    section[nid + suffix] = rename(data, suffix)
+            result[key] = section
+        elif key != _keys.INDEX:
+            result[key] = value
+    return result
+
+
+def write_document(json_dict, fp):
+    writer = JsonStream.JsonStreamWriter(fp)
+    writer.begin_object()
+    for key, value in json_dict.items():
+        writer.write_item(key, value)
+    writer.end_object()
+    writer.flush()
+
+
+def measure(json_dict, level):
+    """
+    :param level: gzipの圧縮レベル (Noneで非圧縮)
+    :return: (サイズ, 書き込み時間, 読み込み時間)
+    """
+    raw = io.BytesIO()
+    start = time.perf_counter()
+    if level is None:
+        fp = io.TextIOWrapper(raw, encoding="utf-8")
+    else:
+        fp = io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level), encoding="utf-8")
+    write_document(json_dict, fp)
+    stream = fp.detach()
+    if level is not None:
+        # GzipFileを閉じてフッターを書き出す (BytesIOは閉じない)
+        stream.close()
+    write_time = time.perf_counter() - start
+    size = raw.getbuffer().nbytes
+
+    raw.seek(0)
+    start = time.perf_counter()
+    if level is None:
+        fp = io.TextIOWrapper(raw, encoding="utf-8")
+    else:
+        fp = io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode="rb"), encoding="utf-8")
+    json.load(fp)
+    read_time = time.perf_counter() - start
+    return size, write_time, read_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--levels", default="1,3,6,9")
+    args = parser.parse_args()
+    levels = [int(x) for x in args.levels.split(",")]
+
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            json_dict = scale_document(json.load(f, object_pairs_hook=OrderedDict), args.scale)
+        print(f"{path} (scale x{args.scale})")
+        print(f"{'format':<14}{'size [KB]':>12}{'ratio':>8}{'write [ms]':>12}{'read [ms]':>12}")
+        base_size = None
+        for level in [None] + levels:
+            size, write_time, read_time = measure(json_dict, level)
+            if base_size is None:
+                base_size = size
+            name = "json" if level is None else f"json.gz -{level}"
+            print(f"{name:<14}{size / 1024:>12.1f}{size / base_size:>8.3f}"
+                  f"{write_time * 1e3:>12.1f}{read_time * 1e3:>12.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+Pencil+ 4 マテリアル・グループの初期化について、アイテムごとにオペレーターを呼び出す従来の方法とまとめて呼び出す方法の時間を比較する
+    python tools/bench_material_init.py [--items 100,1000] [--zones 8] [--existing-groups 0,1000] [--repeat 3]
+    blender --background --python tools/bench_material_init.py -- [--items 100,1000] [--zones 8] [--existing-groups 0,1000] [--repeat 3]
+従来の方法: マテリアルごとに operator_call_with_override (context.copy()) を呼び出し、
+          グループごとに bpy.data.node_groups の集合を作成して全てのグループを走査する
+まとめる方法: OperatorOverride を全てのマテリアルで共有し、グループは util.NewIdFinder で名前から検索する
+グループは --existing-groups の数のグループが既にあるファイルへの作成を計測する
+Blenderの外では fake_bpy を使用する (fake_bpy の context.copy() は軽いため、差はBlender上の方が大きい)
+Blender上では Pencil+ 4 Material アドオンが有効である必要があり、作成したマテリアル・グループは計測ごとに削除する
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import bpy
+    is_fake_bpy = False
+except ImportError:
+    import fake_bpy
+    bpy = fake_bpy.install()
+    is_fake_bpy = True
+
+from _bootstrap import import_addon_module
+
+Importer = import_addon_module("Importer")
+util = import_addon_module("Utilities")
+
+_NAME_PREFIX = "BenchMaterialInit_"
+
+
+def initialize_legacy(count, zone_num):
+    for i in range(count):
+        material = bpy.data.materials.new(name=f"{_NAME_PREFIX}{i}")
+        material.use_nodes = True
+        util.operator_call_with_override(
+            bpy.ops.pcl4mtl.initialize_material,
+            bpy.context, {"material": material}, {"zone_num": zone_num})
+
+
+def initialize_batched(count, zone_num):
+    materials = []
+    for i in range(count):
+        material = bpy.data.materials.new(name=f"{_NAME_PREFIX}{i}")
+        material.use_nodes = True
+        materials.append(material)
+    override = util.OperatorOverride(bpy.context)
+    ot_initialize_material = bpy.ops.pcl4mtl.initialize_material
+    for material in materials:
+        override.call(ot_initialize_material, {"material": material}, {"zone_num": zone_num})
+
+
+def new_groups_legacy(count, zone_num):
+    ot_new_groups = (bpy.ops.pcl4mtl.new_position_group_node_tree, bpy.ops.pcl4mtl.new_color_group_node_tree)
+    for i in range(count):
+        node_groups_prev = set(bpy.data.node_groups)
+        ot_new_groups[i % 2](num_zones=zone_num)
+        new_group = next((x for x in bpy.data.node_groups if x not in node_groups_prev))
+        new_group.name = f"{_NAME_PREFIX}{i}"
+
+
+def new_groups_batched(count, zone_num):
+    ot_new_groups = (bpy.ops.pcl4mtl.new_position_group_node_tree, bpy.ops.pcl4mtl.new_color_group_node_tree)
+    new_group_finder = util.NewIdFinder(bpy.data.node_groups)
+    for i in range(count):
+        new_group = Importer.Importer._new_group(ot_new_groups[i % 2], zone_num, new_group_finder)
+        new_group.name = f"{_NAME_PREFIX}{i}"
+
+
+def add_existing_groups(count):
+    for i in range(count):
+        bpy.data.node_groups.new(f"{_NAME_PREFIX}Existing_{i}", "ShaderNodeTree")
+
+
+def cleanup(created_groups_before):
+    for material in [x for x in bpy.data.materials if x.name.startswith(_NAME_PREFIX)]:
+        bpy.data.materials.remove(material)
+    for group in [x for x in bpy.data.node_groups if x not in created_groups_before]:
+        bpy.data.node_groups.remove(group)
+
+
+def measure(func, count, zone_num, repeat):
+    best = None
+    for _ in range(repeat):
+        groups_before = set(bpy.data.node_groups)
+        start = time.perf_counter()
+        func(count, zone_num)
+        elapsed = time.perf_counter() - start
+        cleanup(groups_before)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", default="100,1000")
+    parser.add_argument("--zones", type=int, default=8)
+    parser.add_argument("--existing-groups", default="0,1000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if not util.is_material_addon_installed():
+        print("Pencil+ 4 Material add-on is not enabled")
+        return
+    if is_fake_bpy:
+        fake_bpy.reset()
+
+    print(f"bpy: {'fake_bpy' if is_fake_bpy else bpy.app.version_string}, zones: {args.zones}")
+    print(f"{'items':<14}{'existing':>10}{'count':>8}{'legacy [ms]':>14}{'batched [ms]':>14}{'speedup':>10}")
+    cases = [("materials", 0, initialize_legacy, initialize_batched)]
+    cases.extend(("groups", int(x), new_groups_legacy, new_groups_batched) for x in args.existing_groups.split(","))
+    for count in (int(x) for x in args.items.split(",")):
+        for label, existing, legacy, batched in cases:
+            existing_groups_before = set(bpy.data.node_groups)
+            add_existing_groups(existing)
+            legacy_time = measure(legacy, count, args.zones, args.repeat)
+            batched_time = measure(batched, count, args.zones, args.repeat)
+            cleanup(existing_groups_before)
+            print(f"{label:<14}{existing:>10}{count:>8}{legacy_time * 1e3:>14.2f}{batched_time * 1e3:>14.2f}"
+                  f"{legacy_time / batched_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
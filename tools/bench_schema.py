@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+template.Node.get_params() とコンパイル済みスキーマのノード毎のコストを比較する
+    python tools/bench_schema.py [--nodes N]
+"""
+
+import argparse
+import timeit
+
+from _bootstrap import import_addon_module
+
+_MP = import_addon_module("template")
+Schema = import_addon_module("Schema")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10000)
+    args = parser.parse_args()
+
+    node_classes = [schema.node_class for schema in Schema._schemas.values()]
+    print(f"{'node type':<28}{'params':>8}{'get_params [us]':>18}{'schema [us]':>14}{'speedup':>10}")
+    total_legacy = 0.0
+    total_schema = 0.0
+    for cls in sorted(node_classes, key=lambda x: x.__name__):
+        def legacy():
+            for _, (_, _) in cls.get_params():
+                pass
+
+        def compiled():
+            for _, _, _, _ in Schema.get_params(cls):
+                pass
+
+        legacy_time = timeit.timeit(legacy, number=args.nodes) / args.nodes
+        schema_time = timeit.timeit(compiled, number=args.nodes) / args.nodes
+        total_legacy += legacy_time
+        total_schema += schema_time
+        print(f"{cls.__name__:<28}{len(Schema.get_params(cls)):>8}"
+              f"{legacy_time * 1e6:>18.2f}{schema_time * 1e6:>14.2f}{legacy_time / schema_time:>9.1f}x")
+    print(f"{'total':<36}{total_legacy * 1e6:>18.2f}{total_schema * 1e6:>14.2f}{total_legacy / total_schema:>9.1f}x")
+    print(f"overhead removed for {args.nodes} nodes of each type: {(total_legacy - total_schema) * args.nodes:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
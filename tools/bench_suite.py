@@ -0,0 +1,281 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+Blenderを使わずに、fake_bpy上の合成シーンでエクスポート・インポートの時間とメモリを計測する
+    python tools/bench_suite.py [--sizes 10,100,1000,10000] [--zones 8,64,512] [--repeat 3] [--output RESULT.json]
+                                [--baseline RESULT.json] [--threshold 1.2]
+ノード数ごとに以下を計測し、前のサイズからの増加率 (スケーリング指数、1.0で線形) を表示する
+    export / import: 全体の時間、tracemallocによるメモリ確保量のピークと終了後も保持されている量
+    snapshot: Exporter.create_snapshot (バックグラウンドでの書き出し時にメインスレッドで行う読み出し) の時間
+    plan: ImportPlan.ImportPlanner.create_plan (シーンを変更しないインポートの計画の作成) の時間
+    collect_line_nodes / material_dict: DependencyGraph によるラインの参照の収集と Exporter._create_material_dict の時間
+    line_node_items: Exporter._create_line_node_item による全てのラインのノードのパラメータの読み出しの時間
+    param_dispatch / param_compiled: 計画の作成時の、LineSetの値のパラメータ1つあたりの変換の時間
+        (ATypeごとのインポート処理を毎回辞書から引いてダミーに代入する場合と、コンパイルした変換関数を呼び出す場合)
+グラデーションのゾーン数ごとに以下を計測する
+    gradation_export / gradation_import: マテリアルのゾーンの文字列とBridgeファイルのグラデーションの相互変換の時間
+--baseline に以前の --output の結果を指定した場合は、時間が threshold 倍を超えた項目を報告する
+"""
+
+import io
+import sys
+import json
+import math
+import timeit
+import argparse
+import tracemalloc
+from collections import OrderedDict
+
+import fake_bpy
+bpy = fake_bpy.install()
+import synthetic_scene
+
+from _bootstrap import import_addon_module
+
+Exporter = import_addon_module("Exporter")
+Importer = import_addon_module("Importer")
+Utilities = import_addon_module("Utilities")
+ImportPlan = import_addon_module("ImportPlan")
+DependencyGraph = import_addon_module("DependencyGraph")
+_MP = import_addon_module("template")
+_keys = _MP.KeyNames
+
+# 1つのLineSetに synthetic_scene が生成するノード数 (LineSet, V/H/VOutlineブラシ, マップ, 減衰設定)
+_NODES_PER_LINE_SET = 10
+
+_TIME_KEYS = ("export", "snapshot", "import", "plan", "collect_line_nodes", "material_dict", "line_node_items",
+              "param_dispatch", "param_compiled")
+_GRADATION_TIME_KEYS = ("gradation_export", "gradation_import")
+
+# グラデーションの計測に使用するマテリアル数
+_GRADATION_MATERIALS = 20
+
+
+def scene_params(node_count):
+    """
+    ノード数がおよそnode_countになる合成シーンのパラメータ
+    """
+    line_sets = max(1, node_count // _NODES_PER_LINE_SET)
+    line_trees = max(1, min(8, line_sets // 100))
+    lines_per_tree = 2
+    return dict(
+        line_trees=line_trees,
+        lines_per_tree=lines_per_tree,
+        line_sets_per_line=max(1, math.ceil(line_sets / (line_trees * lines_per_tree))),
+        materials=max(1, node_count // 100),
+        zones_per_material=3)
+
+
+def prepare_import_scene(objects):
+    """
+    インポート先として、オブジェクトと空のラインノードツリーだけを持つシーンを作る
+    """
+    fake_bpy.reset()
+    for i in range(objects):
+        bpy.data.objects.new(f"Object{i}")
+    return bpy.data.node_groups.new("Line Tree 0", fake_bpy.LINE_NODE_TREE_ID)
+
+
+def measure_memory(func):
+    """
+    :return: (確保量のピーク [byte], 終了後も保持されている量 [byte])
+    """
+    tracemalloc.start()
+    try:
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, current
+
+
+def best_time(func, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        times.append(timeit.timeit(func, number=1))
+    return min(times)
+
+
+def run_param_overhead(json_dict, repeat):
+    """
+    :return: (param_dispatch, param_compiled) LineSetの値のパラメータ1つあたりの時間 [秒]
+    """
+    line_set_name = _MP.LineSetNode.get_node_to_export_name()
+    json_params_list = [x[_keys.PARAMS] for x in json_dict[_keys.LINES].values() if x[_keys.NODE_TYPE] == line_set_name]
+    importer = Importer.Importer()
+    compiled = [x for x in importer.get_compiled_params(_MP.LineSetNode) if x.converter is not None]
+    target = ImportPlan.Dummy()
+
+    def dispatch():
+        importers = importer.importers
+        for json_params in json_params_list:
+            for json_name, attr_name, attr_type, _, _ in compiled:
+                importers[attr_type](target, attr_name, json_params[json_name])
+                getattr(target, attr_name)
+
+    def run_compiled():
+        for json_params in json_params_list:
+            for json_name, _, _, converter, _ in compiled:
+                converter(json_params[json_name])
+
+    count = max(1, len(json_params_list) * len(compiled))
+    return best_time(dispatch, repeat) / count, best_time(run_compiled, repeat) / count
+
+
+def run_size(node_count, repeat):
+    params = scene_params(node_count)
+
+    def build():
+        synthetic_scene.build_scene(**params)
+
+    def export():
+        stream = io.StringIO()
+        Exporter.Exporter().export_to_stream(bpy.context, stream)
+        return stream.getvalue()
+
+    build()
+    json_string = export()
+    json_dict = json.loads(json_string)
+    result = OrderedDict()
+    result["nodes"] = len(json_dict[_keys.LINES])
+    result["materials"] = len(json_dict[_keys.MATERIALS])
+    result["file_size"] = len(json_string.encode("utf-8"))
+
+    def best(func, setup=None):
+        return best_time(func, repeat, setup)
+
+    result["export"] = best(export)
+    result["export_peak"], result["export_retained"] = measure_memory(export)
+    result["snapshot"] = best(lambda: Exporter.Exporter().create_snapshot(bpy.context))
+
+    exporter = Exporter.Exporter()
+    exporter.context = bpy.context
+    result["material_dict"] = best(exporter._create_material_dict)
+    line_nodes = [x for tree in Utilities.enumerate_all_node_trees() for x in tree.nodes]
+    result["line_node_items"] = best(lambda: [exporter._create_line_node_item(x) for x in line_nodes])
+
+    line_ids = [nid for nid, _ in Importer.Importer._enumerate_lines_in_json_dict(json_dict)]
+    result["collect_line_nodes"] = best(
+        lambda: DependencyGraph.DependencyIndex(json_dict[_keys.LINES]).closure(line_ids))
+    result["plan"] = best(
+        lambda: ImportPlan.ImportPlanner(Importer.Importer()).create_plan(json_dict, Importer.ImporterSettings()))
+    result["param_dispatch"], result["param_compiled"] = run_param_overhead(json_dict, repeat)
+
+    objects = len(bpy.data.objects)
+    state = {}
+
+    def setup_import():
+        state["tree"] = prepare_import_scene(objects)
+
+    def do_import():
+        Importer.Importer().import_from_json_string(
+            json_string, state["tree"], bpy.context.scene, Importer.ImporterSettings())
+
+    result["import"] = best(do_import, setup_import)
+    setup_import()
+    result["import_peak"], result["import_retained"] = measure_memory(do_import)
+    return result
+
+
+def run_gradation(zones, repeat):
+    synthetic_scene.build_scene(line_sets_per_line=1, materials=_GRADATION_MATERIALS, zones_per_material=zones)
+    materials = [x for x in bpy.data.materials if x.is_pcl4_material]
+    exporter = Exporter.Exporter()
+    exporter.context = bpy.context
+    gradation_dicts = [exporter._create_gradation_dict(x) for x in materials]
+    importer = Importer.Importer()
+
+    result = OrderedDict(zones=zones)
+    result["gradation_export"] = best_time(
+        lambda: [exporter._create_gradation_dict(x) for x in materials], repeat)
+    result["gradation_import"] = best_time(
+        lambda: [ImportPlan.GradationDummy(importer, "", x) for x in gradation_dicts], repeat)
+    return result
+
+
+def print_results(results):
+    print(f"{'nodes':>8}{'export [ms]':>13}{'scaling':>9}{'peak [KB]':>11}{'kept [KB]':>11}{'snapshot [ms]':>15}"
+          f"{'import [ms]':>13}{'scaling':>9}{'peak [KB]':>11}{'kept [KB]':>11}"
+          f"{'plan [ms]':>11}{'collect [ms]':>14}{'materials [ms]':>16}{'nodes [ms]':>12}{'dispatch [ns]':>15}{'compiled [ns]':>15}")
+    prev = None
+    for r in results:
+        def exponent(key):
+            if prev is None or prev[key] <= 0 or r["nodes"] == prev["nodes"]:
+                return ""
+            return f"{math.log(r[key] / prev[key]) / math.log(r['nodes'] / prev['nodes']):.2f}"
+        print(f"{r['nodes']:>8}{r['export'] * 1e3:>13.1f}{exponent('export'):>9}{r['export_peak'] / 1024:>11.0f}"
+              f"{r['export_retained'] / 1024:>11.0f}{r['snapshot'] * 1e3:>15.1f}{r['import'] * 1e3:>13.1f}{exponent('import'):>9}"
+              f"{r['import_peak'] / 1024:>11.0f}{r['import_retained'] / 1024:>11.0f}"
+              f"{r['plan'] * 1e3:>11.1f}{r['collect_line_nodes'] * 1e3:>14.2f}{r['material_dict'] * 1e3:>16.2f}{r['line_node_items'] * 1e3:>12.1f}"
+              f"{r['param_dispatch'] * 1e9:>15.0f}{r['param_compiled'] * 1e9:>15.0f}")
+        prev = r
+
+
+def print_gradation_results(results):
+    print(f"{'zones':>8}{'export [ms]':>13}{'import [ms]':>13}   ({_GRADATION_MATERIALS} materials)")
+    for r in results:
+        print(f"{r['zones']:>8}{r['gradation_export'] * 1e3:>13.2f}{r['gradation_import'] * 1e3:>13.2f}")
+
+
+def compare_results(results, baseline_results, threshold, size_key="size", keys=_TIME_KEYS):
+    """
+    :return: 時間がthreshold倍を超えた (サイズ, 項目, 倍率) のリスト
+    """
+    baseline_by_size = {x[size_key]: x for x in baseline_results}
+    regressions = []
+    for r in results:
+        base = baseline_by_size.get(r[size_key])
+        if base is None:
+            continue
+        for key in keys:
+            if base.get(key, 0) > 0 and r[key] / base[key] > threshold:
+                regressions.append((r[size_key], key, r[key] / base[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--zones", default="8,64,512")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(x) for x in args.sizes.split(",")):
+        result = OrderedDict(size=size)
+        result.update(run_size(size, args.repeat))
+        results.append(result)
+    print_results(results)
+
+    gradation_results = [run_gradation(int(x), args.repeat) for x in args.zones.split(",") if x]
+    if len(gradation_results) > 0:
+        print_gradation_results(gradation_results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(OrderedDict((("sizes", results), ("gradation", gradation_results))), f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline["sizes"], args.threshold)
+        for nodes, key, ratio in regressions:
+            print(f"regression: {key} at {nodes} nodes is {ratio:.2f}x slower than baseline")
+        gradation_regressions = compare_results(gradation_results, baseline.get("gradation", []), args.threshold,
+                                                "zones", _GRADATION_TIME_KEYS)
+        for zones, key, ratio in gradation_regressions:
+            print(f"regression: {key} at {zones} zones is {ratio:.2f}x slower than baseline")
+        regressions += gradation_regressions
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+Bridgeファイルを JSON (.json / .json.gz) とバイナリ形式 (.pcl4b) の間で相互変換する
+    python tools/convert_bridge_file.py SRC DST [--compact] [--compression-level N]
+形式は拡張子で判別する。値はそのまま保持するため、JSON → バイナリ → JSON で元のJSONと同じ内容に戻る
+"""
+
+import gzip
+import json
+import argparse
+
+from _bootstrap import import_addon_module
+
+Settings = import_addon_module("Settings")
+BinaryFormat = import_addon_module("BinaryFormat")
+JsonStream = import_addon_module("JsonStream")
+
+
+def open_json(path, mode, compression_level=Settings.DEFAULT_COMPRESSION_LEVEL):
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", compresslevel=compression_level, encoding="utf-8")
+    return open(path, mode=mode, encoding="utf-8")
+
+
+def read_document(path):
+    if BinaryFormat.is_binary_file_path(path):
+        with open(path, mode="rb") as f:
+            return BinaryFormat.load(f)
+    with open_json(path, "r") as f:
+        return json.load(f)
+
+
+def write_document(json_dict, path, compact=False, compression_level=Settings.DEFAULT_COMPRESSION_LEVEL):
+    if BinaryFormat.is_binary_file_path(path):
+        with open(path, mode="wb") as f:
+            BinaryFormat.dump(json_dict, f)
+        return
+    with open_json(path, "w", compression_level) as f:
+        writer = JsonStream.JsonStreamWriter(f, indent=None if compact else 4)
+        writer.begin_object()
+        for key, value in json_dict.items():
+            writer.write_item(key, value)
+        writer.end_object()
+        writer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("src")
+    parser.add_argument("dst")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--compression-level", type=int, default=Settings.DEFAULT_COMPRESSION_LEVEL)
+    args = parser.parse_args()
+    write_document(read_document(args.src), args.dst, args.compact, args.compression_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,885 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+ベンチマーク用の軽量なbpyの代替実装
+Exporter/Importerが触るbpy.data・ノードツリー・RNAの範囲だけをプロセス内で模倣する
+ノードのプロパティはtemplate.pyの定義から生成するため、テンプレートの変更に追従する
+
+    import fake_bpy
+    bpy = fake_bpy.install()
+"""
+
+import sys
+import types
+import contextlib
+from itertools import count
+
+from _bootstrap import import_addon_module
+
+_MP = import_addon_module("template")
+AType = _MP.AType
+
+LINE_NODE_TREE_ID = "Pencil4NodeTreeType"
+LINE_FUNCTIONS_CONTAINER_ID = "Pencil4LineFunctionsContainerNodeType"
+
+# 列挙型のうち、アドオンのコードが識別子を直接参照するもの
+_special_enum_items = {
+    "uv_source": ("SCREEN", "OBJECTUV"),
+    "uv_selection_mode": ("INDEX", "NAME"),
+    "object_color_selection_mode": ("INDEX", "NAME"),
+}
+_generic_enum_items = ("ITEM_0", "ITEM_1", "ITEM_2", "ITEM_3")
+
+_pointer_counter = count(1)
+
+
+class Vector:
+    __slots__ = ("_values",)
+
+    def __init__(self, values):
+        self._values = [float(x) for x in values]
+
+    def __getitem__(self, index):
+        return self._values[index]
+
+    def __setitem__(self, index, value):
+        self._values[index] = float(value)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __repr__(self):
+        return f"Vector({self._values})"
+
+    @property
+    def x(self):
+        return self._values[0]
+
+    @x.setter
+    def x(self, value):
+        self._values[0] = float(value)
+
+    @property
+    def y(self):
+        return self._values[1]
+
+    @y.setter
+    def y(self, value):
+        self._values[1] = float(value)
+
+
+class _VectorAttribute:
+    """値の代入時にVectorへ変換する記述子 (location, tiling, offset用)"""
+
+    def __init__(self, name, default):
+        self.name = "_" + name
+        self.default = default
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__.get(self.name)
+        if value is None:
+            value = Vector(self.default)
+            obj.__dict__[self.name] = value
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = Vector(value)
+
+
+class EnumItem:
+    __slots__ = ("identifier", "value", "name")
+
+    def __init__(self, identifier, value):
+        self.identifier = identifier
+        self.value = value
+        self.name = identifier
+
+
+class PropertyRNA:
+    __slots__ = ("identifier", "default", "enum_items")
+
+    def __init__(self, identifier, default=None, enum_items=()):
+        self.identifier = identifier
+        self.default = default
+        self.enum_items = enum_items
+
+
+class StructRNA:
+    def __init__(self, properties):
+        self.properties = properties
+
+
+class CollectionElement:
+    __slots__ = ("content",)
+
+    def __init__(self):
+        self.content = None
+
+
+class PropertyCollection(list):
+    def add(self):
+        element = CollectionElement()
+        self.append(element)
+        return element
+
+
+"""
+ID
+"""
+
+
+class ID:
+    bl_idname = ""
+
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+        self._pointer = next(_pointer_counter)
+        self.library = None
+        self.tag = False
+        self.use_fake_user = False
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        if self._collection is not None:
+            self._collection._rename(self, value)
+        else:
+            self._name = value
+
+    @property
+    def name_full(self):
+        return self._name
+
+    @property
+    def users(self):
+        return int(self.use_fake_user) + self._count_users()
+
+    def _count_users(self):
+        return 0
+
+    def as_pointer(self):
+        return self._pointer
+
+    def user_remap(self, new_id):
+        pass
+
+    def __getitem__(self, key):
+        return self.__dict__.setdefault("_id_properties", {})[key]
+
+    def __setitem__(self, key, value):
+        self.__dict__.setdefault("_id_properties", {})[key] = value
+
+    def get(self, key, default=None):
+        return self.__dict__.get("_id_properties", {}).get(key, default)
+
+    def pop(self, key, default=None):
+        return self.__dict__.get("_id_properties", {}).pop(key, default)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} '{self._name}'>"
+
+
+def _unique_name(name, exists):
+    if not exists(name):
+        return name
+    base = name
+    if len(name) > 4 and name[-4] == "." and name[-3:].isdigit():
+        base = name[:-4]
+    for i in count(1):
+        candidate = f"{base}.{i:03d}"
+        if not exists(candidate):
+            return candidate
+
+
+class IDCollection:
+    """bpy.data.*と同様に名前順に並ぶIDの集合"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._items = {}
+        self._sorted = None
+
+    def _add(self, id_data):
+        id_data._name = _unique_name(id_data._name, self._items.__contains__)
+        id_data._collection = self
+        self._items[id_data._name] = id_data
+        self._sorted = None
+        return id_data
+
+    def _rename(self, id_data, new_name):
+        if new_name == id_data._name:
+            return
+        del self._items[id_data._name]
+        id_data._name = _unique_name(new_name, self._items.__contains__)
+        self._items[id_data._name] = id_data
+        self._sorted = None
+
+    def _ordered(self):
+        if self._sorted is None:
+            self._sorted = [self._items[k] for k in sorted(self._items)]
+        return self._sorted
+
+    def new(self, name, *args, **kwargs):
+        return self._add(self._factory(name, *args, **kwargs))
+
+    def remove(self, id_data, do_unlink=True):
+        del self._items[id_data._name]
+        id_data._collection = None
+        self._sorted = None
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def keys(self):
+        return [x.name for x in self._ordered()]
+
+    def values(self):
+        return list(self._ordered())
+
+    def items(self):
+        return [(x.name, x) for x in self._ordered()]
+
+    def tag(self, value):
+        for id_data in self._items.values():
+            id_data.tag = value
+
+    def clear(self):
+        self._items.clear()
+        self._sorted = None
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._items[key]
+        return self._ordered()[key]
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return key in self._items
+        if not isinstance(key, ID):
+            raise TypeError("expected a string or an ID")
+        return self._items.get(key.name) is key
+
+    def __iter__(self):
+        return iter(list(self._ordered()))
+
+    def __len__(self):
+        return len(self._items)
+
+
+"""
+Nodes
+"""
+
+
+class NodeSocket:
+    __slots__ = ("node", "identifier", "is_output", "links")
+
+    def __init__(self, node, identifier, is_output):
+        self.node = node
+        self.identifier = identifier
+        self.is_output = is_output
+        self.links = []
+
+    @property
+    def is_linked(self):
+        return len(self.links) > 0
+
+    def get_connected_node(self):
+        return self.links[0].from_node if len(self.links) > 0 else None
+
+
+class NodeLink:
+    __slots__ = ("from_socket", "to_socket")
+
+    def __init__(self, from_socket, to_socket):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+
+    @property
+    def from_node(self):
+        return self.from_socket.node
+
+    @property
+    def to_node(self):
+        return self.to_socket.node
+
+
+class CurveData:
+    class _Point:
+        __slots__ = ("location", "handle_type")
+
+        def __init__(self, x, y):
+            self.location = [x, y]
+            self.handle_type = "AUTO"
+
+    class _Points(list):
+        def new(self, x, y):
+            point = CurveData._Point(x, y)
+            self.append(point)
+            return point
+
+        def remove(self, point):
+            list.remove(self, point)
+
+        def foreach_get(self, attr, seq):
+            if attr == "location":
+                for i, point in enumerate(self):
+                    seq[i * 2] = point.location[0]
+                    seq[i * 2 + 1] = point.location[1]
+            else:
+                for i, point in enumerate(self):
+                    seq[i] = getattr(point, attr)
+
+    def __init__(self):
+        points = CurveData._Points([CurveData._Point(0.0, 1.0), CurveData._Point(1.0, 0.0)])
+        self.mapping = types.SimpleNamespace(curves=[types.SimpleNamespace(points=points)])
+
+    def evaluate(self, x):
+        points = sorted(self.mapping.curves[0].points, key=lambda p: p.location[0])
+        if x <= points[0].location[0]:
+            return points[0].location[1]
+        for a, b in zip(points, points[1:]):
+            if x <= b.location[0]:
+                width = b.location[0] - a.location[0]
+                t = (x - a.location[0]) / width if width > 0 else 0.0
+                return a.location[1] + (b.location[1] - a.location[1]) * t
+        return points[-1].location[1]
+
+
+class Node:
+    bl_idname = ""
+    bl_rna = StructRNA({})
+    _socket_layout = ()
+    _list_socket_prefix = None
+    _param_defaults_def = ()
+
+    new_node_step_x = 0.0
+    new_node_step_y = -200.0
+    new_node_offset_x = -250.0
+    new_node_offset_y = 0.0
+
+    location = _VectorAttribute("location", (0.0, 0.0))
+
+    def __init__(self, tree, name):
+        self.id_data = tree
+        self._name = name
+        self.select = True
+        self.inputs = [NodeSocket(self, x, False) for x in self._socket_layout]
+        self.outputs = [NodeSocket(self, "output", True)]
+        self._curves = {}
+        if self._list_socket_prefix is not None:
+            self.inputs.append(NodeSocket(self, f"{self._list_socket_prefix}0", False))
+        for attr_name, attr_type in self._param_defaults_def:
+            setattr(self, attr_name, _default_value(attr_name, attr_type))
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self.id_data.nodes._rename(self, value)
+
+    def tree_from_node(self):
+        return self.id_data
+
+    def __getitem__(self, key):
+        return self.__dict__.setdefault("_id_properties", {})[key]
+
+    def __setitem__(self, key, value):
+        self.__dict__.setdefault("_id_properties", {})[key] = value
+
+    def get(self, key, default=None):
+        return self.__dict__.get("_id_properties", {}).get(key, default)
+
+    def pop(self, key, default=None):
+        return self.__dict__.get("_id_properties", {}).pop(key, default)
+
+    def find_input_socket_index(self, identifier):
+        return next(i for i, x in enumerate(self.inputs) if x.identifier == identifier)
+
+    def get_curve_data(self, curve_name):
+        if not curve_name:
+            return None
+        curve = self._curves.get(curve_name)
+        if curve is None:
+            curve = CurveData()
+            self._curves[curve_name] = curve
+        return curve
+
+    def evaluate_curve(self, curve_name, num):
+        curve = self.get_curve_data(curve_name)
+        return [curve.evaluate(i / (num - 1)) for i in range(num)]
+
+    def calc_new_node_position(self, index):
+        return [self.location[0] + self.new_node_offset_x, self.location[1] + self.new_node_step_y * index]
+
+    def _on_input_linked(self, socket):
+        if self._list_socket_prefix is not None and socket is self.inputs[-1]:
+            self.inputs.append(NodeSocket(self, f"{self._list_socket_prefix}{len(self.inputs)}", False))
+
+    def delete_if_unused(self, tree):
+        if any(len(x.links) > 0 for x in self.outputs):
+            return
+        children = [x.get_connected_node() for x in self.inputs]
+        tree.nodes.remove(self)
+        for child in children:
+            if child is not None:
+                child.delete_if_unused(tree)
+
+
+def _default_value(attr_name, attr_type):
+    if attr_type in (AType.INT,):
+        return 0
+    if attr_type in (AType.FLOAT, AType.FLOAT_PERCENTAGE, AType.FLOAT_ANGLE, AType.FLOAT_WITH_SCALE):
+        return 0.0
+    if attr_type == AType.BOOL:
+        return False
+    if attr_type == AType.BOOL_LIST_8:
+        return [False] * 8
+    if attr_type == AType.ENUM:
+        return (_special_enum_items.get(attr_name) or _generic_enum_items)[0]
+    if attr_type == AType.COLOR:
+        return [0.0, 0.0, 0.0]
+    if attr_type == AType.STRING:
+        return ""
+    if attr_type == AType.CURVE:
+        return attr_name
+    if attr_type in (AType.OBJECT_LIST, AType.MATERIAL_LIST):
+        return PropertyCollection()
+    if attr_type in (AType.POSITION_GROUP, AType.COLOR_GROUP):
+        return ""
+    return None
+
+
+def _create_node_class(node_def):
+    properties = {}
+    socket_layout = []
+    list_socket_prefix = None
+    defaults_def = []
+    class_dict = {}
+    for json_name, (attr_name, attr_type) in node_def.get_params():
+        if attr_name is None:
+            continue
+        if attr_type == AType.NODE:
+            socket_id = f"{attr_name}_socket"
+            socket_layout.append(socket_id)
+            properties[attr_name] = PropertyRNA(attr_name, default=socket_id)
+        elif attr_type == AType.NODE_LIST:
+            list_socket_prefix = attr_name
+            properties[attr_name] = PropertyRNA(attr_name, default=attr_name)
+        elif attr_type == AType.ENUM:
+            identifiers = _special_enum_items.get(attr_name) or _generic_enum_items
+            properties[attr_name] = PropertyRNA(
+                attr_name, enum_items=[EnumItem(x, i) for i, x in enumerate(identifiers)])
+            defaults_def.append((attr_name, attr_type))
+        elif attr_type == AType.FLOAT_VECTOR_2:
+            class_dict[attr_name] = _VectorAttribute(attr_name, (1.0, 1.0) if attr_name == "tiling" else (0.0, 0.0))
+            properties[attr_name] = PropertyRNA(attr_name)
+        else:
+            properties[attr_name] = PropertyRNA(attr_name)
+            defaults_def.append((attr_name, attr_type))
+    class_dict.update({
+        "bl_idname": node_def.get_blender_id_name(),
+        "bl_rna": StructRNA(properties),
+        "_socket_layout": tuple(socket_layout),
+        "_list_socket_prefix": list_socket_prefix,
+        "_param_defaults_def": tuple(defaults_def),
+    })
+    return type(node_def.get_blender_node_name(), (Node,), class_dict)
+
+
+node_classes = dict((cls.get_blender_id_name(), _create_node_class(cls))
+                    for cls in vars(_MP).values()
+                    if isinstance(cls, type) and issubclass(cls, _MP.Node) and cls is not _MP.Node
+                    and cls.is_blender_node() and cls.get_blender_id_name())
+
+
+class NodeCollection:
+    def __init__(self, tree):
+        self._tree = tree
+        self._nodes = []
+        self._by_name = {}
+
+    def new(self, type):
+        node = node_classes[type](self._tree, "")
+        node._name = _unique_name(type.replace("Pencil4", "").replace("NodeType", ""), self._by_name.__contains__)
+        self._nodes.append(node)
+        self._by_name[node._name] = node
+        self._tree._on_update()
+        return node
+
+    def remove(self, node):
+        for socket in node.inputs + node.outputs:
+            for link in list(socket.links):
+                self._tree.links.remove(link)
+        self._nodes.remove(node)
+        del self._by_name[node._name]
+        self._tree._on_update()
+
+    def _rename(self, node, new_name):
+        if new_name == node._name:
+            return
+        del self._by_name[node._name]
+        node._name = _unique_name(new_name, self._by_name.__contains__)
+        self._by_name[node._name] = node
+
+    def foreach_get(self, attr, seq):
+        for i, node in enumerate(self._nodes):
+            value = getattr(node, attr)
+            if isinstance(value, Vector):
+                seq[i * len(value):(i + 1) * len(value)] = list(value)
+            else:
+                seq[i] = value
+
+    def get(self, name, default=None):
+        return self._by_name.get(name, default)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._by_name[key]
+        return self._nodes[key]
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __iter__(self):
+        return iter(list(self._nodes))
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+class LinkCollection:
+    def __init__(self, tree):
+        self._tree = tree
+        self._links = []
+
+    def new(self, input, output, verify_limits=True):
+        if input.is_output:
+            input, output = output, input
+        for link in list(input.links):
+            self.remove(link)
+        link = NodeLink(output, input)
+        output.links.append(link)
+        input.links.append(link)
+        self._links.append(link)
+        input.node._on_input_linked(input)
+        self._tree._on_update()
+        return link
+
+    def remove(self, link):
+        link.from_socket.links.remove(link)
+        link.to_socket.links.remove(link)
+        self._links.remove(link)
+        self._tree._on_update()
+
+    def __iter__(self):
+        return iter(list(self._links))
+
+    def __len__(self):
+        return len(self._links)
+
+
+class NodeTree(ID):
+    def __init__(self, name, type=LINE_NODE_TREE_ID):
+        super().__init__(name)
+        self.bl_idname = type
+        self.nodes = NodeCollection(self)
+        self.links = LinkCollection(self)
+        self.is_pcl4_position_group = False
+        self.is_pcl4_color_group = False
+        self.update_count = 0
+        if type == LINE_NODE_TREE_ID:
+            self.use_fake_user = True
+
+    def _on_update(self):
+        self.update()
+
+    def update(self):
+        self.update_count += 1
+
+    def enumerate_lines(self):
+        return [x for x in self.nodes if x.bl_idname == _MP.LineNode.get_blender_id_name()]
+
+    def _count_users(self):
+        if not (self.is_pcl4_position_group or self.is_pcl4_color_group):
+            return 0
+        prop = "pcl4mtl_position_group" if self.is_pcl4_position_group else "pcl4mtl_color_group"
+        return sum(1 for x in data.materials if getattr(x, prop, None) == self.name_full)
+
+
+class ShaderNodeTree:
+    def __init__(self, owner):
+        self.id_data = owner
+        self.nodes = NodeCollection(self)
+        self.links = LinkCollection(self)
+
+    def _on_update(self):
+        pass
+
+
+"""
+Materials
+"""
+
+
+def _material_param_defs():
+    for node_def in (_MP.PencilMaterialNode, _MP.AdvancedMaterialNode):
+        for _, (attr_name, attr_type) in node_def.get_params():
+            if attr_name is not None and attr_type not in (AType.NOT_IMPLEMENTED, AType.ADVANCED_MATERIAL):
+                yield attr_name, attr_type
+
+
+class Material(ID):
+    is_pcl4_material = False
+    pcl4_line_functions = None
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.use_nodes = False
+        self._node_tree = None
+        self.users_from_scene = 0
+
+    @property
+    def node_tree(self):
+        if self._node_tree is None and self.use_nodes:
+            self._node_tree = ShaderNodeTree(self)
+        return self._node_tree
+
+    def _count_users(self):
+        return self.users_from_scene + sum(1 for x in data.materials if x.pcl4_line_functions is self)
+
+    def initialize_pcl4_material(self, zone_num):
+        self.is_pcl4_material = True
+        for attr_name, attr_type in _material_param_defs():
+            setattr(self, attr_name, _default_value(attr_name, attr_type))
+        self.pcl4mtl_position_group = ""
+        self.pcl4mtl_color_group = ""
+        self.pcl4mtl_num_zones = zone_num
+        zones = range(zone_num)
+        self.pcl4mtl_zone_ids = ",".join(str(i + 1) for i in zones)
+        self.pcl4mtl_zone_min_positions = ",".join(str(i / max(zone_num, 1)) for i in zones)
+        self.pcl4mtl_zone_max_positions = ",".join(str(i / max(zone_num, 1)) for i in zones)
+        self.pcl4mtl_zone_color_ons = ",".join("True" for _ in zones)
+        self.pcl4mtl_zone_colors = ";".join("0.5,0.5,0.5" for _ in zones)
+        self.pcl4mtl_zone_map_opacities = ",".join("1.0" for _ in zones)
+        self.pcl4mtl_zone_map_ons = ",".join("False" for _ in zones)
+        self.pcl4mtl_zone_color_amounts = ",".join("1.0" for _ in zones)
+
+
+Material.bl_rna = StructRNA(dict(
+    (attr_name, PropertyRNA(attr_name, enum_items=[EnumItem(x, i) for i, x in enumerate(_generic_enum_items)]
+                            if attr_type == AType.ENUM else ()))
+    for attr_name, attr_type in _material_param_defs()))
+
+
+class Object(ID):
+    pass
+
+
+class Image(ID):
+    pass
+
+
+class Scene(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = IDCollection(Object)
+
+
+"""
+Context / Operators
+"""
+
+
+class Context:
+    def __init__(self):
+        self.scene = None
+        self.view_layer = types.SimpleNamespace(name="ViewLayer")
+        self.material = None
+        self.window_manager = types.SimpleNamespace(pcl4bridge_target_node_tree=None)
+        self.space_data = None
+
+    def copy(self):
+        return {"scene": self.scene, "material": self.material,
+                "window_manager": self.window_manager, "space_data": self.space_data}
+
+    @contextlib.contextmanager
+    def temp_override(self, **kwargs):
+        saved = dict((k, getattr(self, k, None)) for k in kwargs)
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        try:
+            yield
+        finally:
+            for k, v in saved.items():
+                setattr(self, k, v)
+
+
+def _op_initialize_material(*args, zone_num=0, **kwargs):
+    context.material.initialize_pcl4_material(zone_num)
+    return {"FINISHED"}
+
+
+def _op_new_group(kind):
+    def op(*args, num_zones=0, **kwargs):
+        if kind == "position":
+            tree = data.node_groups.new("Position Group", "ShaderNodeTree")
+            tree.is_pcl4_position_group = True
+            tree.pcl4_position_group_values = ",".join("0.0,1.0" for _ in range(num_zones))
+        else:
+            tree = data.node_groups.new("Color Group", "ShaderNodeTree")
+            tree.is_pcl4_color_group = True
+            tree.pcl4_color_group_values = ";".join("1.0,1.0,1.0" for _ in range(num_zones))
+        return {"FINISHED"}
+    return op
+
+
+"""
+bpy module
+"""
+
+data = None
+context = None
+
+
+def reset():
+    """bpy.dataを空の状態に戻す"""
+    data.node_groups.clear()
+    data.materials.clear()
+    data.objects.clear()
+    data.images.clear()
+    data.scenes.clear()
+    context.scene = data.scenes.new("Scene")
+    context.scene.objects = data.objects
+    context.material = None
+
+
+def _batch_remove(ids):
+    for id_data in list(ids):
+        if id_data._collection is not None:
+            id_data._collection.remove(id_data)
+
+
+def install(line_addon=True, material_addon=True):
+    """
+    sys.modulesに偽のbpy / bpy_extrasを登録する
+    :param line_addon: Pencil+ 4 Lineアドオンがインストールされている状態を模倣する
+    :param material_addon: Pencil+ 4 Materialアドオンがインストールされている状態を模倣する
+    :return: bpyモジュール
+    """
+    global data, context
+    if "bpy" in sys.modules and getattr(sys.modules["bpy"], "_is_fake_bpy", False):
+        return sys.modules["bpy"]
+
+    bpy = types.ModuleType("bpy")
+    bpy._is_fake_bpy = True
+
+    data = types.SimpleNamespace(
+        node_groups=IDCollection(NodeTree),
+        materials=IDCollection(Material),
+        objects=IDCollection(Object),
+        images=IDCollection(Image),
+        scenes=IDCollection(Scene),
+        batch_remove=_batch_remove,
+        filepath="",
+    )
+    context = Context()
+    bpy.data = data
+    bpy.context = context
+
+    def persistent(func):
+        return func
+
+    bpy.app = types.SimpleNamespace(
+        version=(4, 1, 0),
+        version_string="4.1.0",
+        background=True,
+        handlers=types.SimpleNamespace(
+            depsgraph_update_post=[], save_post=[], load_post=[], undo_post=[], redo_post=[],
+            persistent=persistent),
+        timers=types.SimpleNamespace(register=lambda func, first_interval=0.0, persistent=False: None,
+                                     is_registered=lambda func: False,
+                                     unregister=lambda func: None),
+        translations=types.SimpleNamespace(register=lambda *args: None, unregister=lambda *args: None),
+    )
+
+    class _Base:
+        pass
+
+    if not line_addon:
+        del Material.pcl4_line_functions
+    if not material_addon:
+        del Material.is_pcl4_material
+
+    bpy.types = types.SimpleNamespace(
+        Operator=type("Operator", (_Base,), {"report": lambda self, level, message: print(*level, message)}),
+        Panel=type("Panel", (_Base,), {}),
+        Menu=type("Menu", (_Base,), {}),
+        UIList=type("UIList", (_Base,), {}),
+        PropertyGroup=type("PropertyGroup", (_Base,), {}),
+        Node=Node,
+        NodeTree=NodeTree,
+        ID=ID,
+        Material=Material,
+        Object=Object,
+        Image=Image,
+        WindowManager=type("WindowManager", (_Base,), {}),
+        Context=Context,
+    )
+
+    def _prop(*args, **kwargs):
+        return ("property", kwargs)
+
+    bpy.props = types.SimpleNamespace(
+        StringProperty=_prop, BoolProperty=_prop, IntProperty=_prop, FloatProperty=_prop,
+        EnumProperty=_prop, CollectionProperty=_prop, PointerProperty=_prop)
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+    bpy.path = types.SimpleNamespace(abspath=lambda path: path)
+
+    ops = types.SimpleNamespace(pcl4mtl=types.SimpleNamespace(
+        initialize_material=_op_initialize_material,
+        new_position_group_node_tree=_op_new_group("position"),
+        new_color_group_node_tree=_op_new_group("color"),
+    ))
+    bpy.ops = ops
+
+    bpy_extras = types.ModuleType("bpy_extras")
+    io_utils = types.ModuleType("bpy_extras.io_utils")
+
+    class ImportHelper:
+        filepath = ""
+
+        def invoke(self, context, event):
+            return {"RUNNING_MODAL"}
+
+    class ExportHelper:
+        filepath = ""
+
+        def check(self, context):
+            return False
+
+        def invoke(self, context, event):
+            return {"RUNNING_MODAL"}
+
+    io_utils.ImportHelper = ImportHelper
+    io_utils.ExportHelper = ExportHelper
+    bpy_extras.io_utils = io_utils
+
+    sys.modules["bpy"] = bpy
+    sys.modules["bpy_extras"] = bpy_extras
+    sys.modules["bpy_extras.io_utils"] = io_utils
+
+    reset()
+    return bpy
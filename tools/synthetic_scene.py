@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+# The Original Code is Copyright (C) P SOFTHOUSE Co., Ltd. All rights reserved.
+
+"""
+fake_bpy上に合成シーンを生成する
+    line_trees: ラインノードツリーの数
+    lines_per_tree: ツリー毎のLineノード数
+    line_sets_per_line: Line毎のLineSet数 (LineSet毎にV/Hブラシ、個別ブラシ、減衰設定を生成する)
+    materials: Pencil+ マテリアルの数 (それぞれグラデーション、ライン関連機能、位置/カラーグループを持つ)
+    zones_per_material: マテリアル毎のグラデーションゾーン数
+"""
+
+import random
+
+import fake_bpy
+
+_MP = fake_bpy._MP
+
+
+def _link(tree, parent, prop_name, child):
+    socket_id = parent.bl_rna.properties[prop_name].default
+    tree.links.new(parent.inputs[parent.find_input_socket_index(socket_id)], child.outputs[0])
+
+
+def _new_node(tree, node_def, name, rng):
+    node = tree.nodes.new(type=node_def.get_blender_id_name())
+    node.name = name
+    node.location = (rng.uniform(-2000, 2000), rng.uniform(-2000, 2000))
+    for _, (attr_name, attr_type) in node_def.get_params():
+        if attr_name is None:
+            continue
+        if attr_type in (_MP.AType.FLOAT, _MP.AType.FLOAT_WITH_SCALE):
+            setattr(node, attr_name, rng.random())
+        elif attr_type == _MP.AType.FLOAT_PERCENTAGE:
+            setattr(node, attr_name, rng.random() * 100.0)
+        elif attr_type == _MP.AType.FLOAT_ANGLE:
+            setattr(node, attr_name, rng.random())
+        elif attr_type == _MP.AType.INT:
+            setattr(node, attr_name, rng.randint(0, 8))
+        elif attr_type == _MP.AType.BOOL:
+            setattr(node, attr_name, rng.random() < 0.5)
+        elif attr_type == _MP.AType.COLOR:
+            setattr(node, attr_name, [rng.random(), rng.random(), rng.random()])
+        elif attr_type == _MP.AType.ENUM:
+            items = node.bl_rna.properties[attr_name].enum_items
+            setattr(node, attr_name, items[rng.randrange(len(items))].identifier)
+        elif attr_type == _MP.AType.CURVE:
+            curve = node.get_curve_data(getattr(node, attr_name))
+            curve.mapping.curves[0].points.new(0.5, rng.random())
+    return node
+
+
+def _new_brush(tree, prefix, rng, with_maps):
+    brush = _new_node(tree, _MP.BrushSettingsNode, f"{prefix} Brush", rng)
+    detail = _new_node(tree, _MP.BrushDetailNode, f"{prefix} Detail", rng)
+    _link(tree, brush, "brush_detail_node", detail)
+    if with_maps:
+        _link(tree, brush, "color_map", _new_node(tree, _MP.TextureMapNode, f"{prefix} ColorMap", rng))
+        _link(tree, detail, "brush_map", _new_node(tree, _MP.TextureMapNode, f"{prefix} BrushMap", rng))
+    return brush
+
+
+def build_scene(line_trees=1, lines_per_tree=2, line_sets_per_line=2, materials=4, zones_per_material=3,
+                objects=16, seed=0):
+    """
+    合成シーンを生成する
+    :return: 生成したラインノードツリーのリスト
+    """
+    bpy = fake_bpy.install()
+    fake_bpy.reset()
+    rng = random.Random(seed)
+
+    scene_objects = [bpy.data.objects.new(f"Object{i}") for i in range(objects)]
+
+    line_functions = []
+    for i in range(materials):
+        mat = bpy.data.materials.new(f"Material{i}")
+        mat.users_from_scene = 1
+        mat.initialize_pcl4_material(zones_per_material)
+        for json_name, (attr_name, attr_type) in _MP.PencilMaterialNode.get_params():
+            if attr_type == _MP.AType.FLOAT:
+                setattr(mat, attr_name, rng.random())
+        zones = range(zones_per_material)
+        mat.pcl4mtl_zone_min_positions = ",".join(str(z / zones_per_material) for z in zones)
+        mat.pcl4mtl_zone_max_positions = ",".join(str((z + 0.5) / zones_per_material) for z in zones)
+        mat.pcl4mtl_zone_colors = ";".join(f"{rng.random()},{rng.random()},{rng.random()}" for _ in zones)
+        position_group = bpy.data.node_groups.new(f"Position Group {i}", "ShaderNodeTree")
+        position_group.is_pcl4_position_group = True
+        position_group.pcl4_position_group_values = ",".join(str(rng.random()) for _ in range(zones_per_material * 2))
+        mat.pcl4mtl_position_group = position_group.name_full
+        color_group = bpy.data.node_groups.new(f"Color Group {i}", "ShaderNodeTree")
+        color_group.is_pcl4_color_group = True
+        color_group.pcl4_color_group_values = ";".join(
+            f"{rng.random()},{rng.random()},{rng.random()}" for _ in range(zones_per_material))
+        mat.pcl4mtl_color_group = color_group.name_full
+
+        line_functions_mat = bpy.data.materials.new(f"Material{i} Line Functions")
+        line_functions_mat.use_nodes = True
+        container = _new_node(line_functions_mat.node_tree, _MP.MaterialLineFunctionsNode,
+                              line_functions_mat.name, rng)
+        container.draw_hidden_lines_of_targets_objects.add().content = scene_objects[i % len(scene_objects)]
+        line_functions_mat.use_nodes = False
+        mat.pcl4_line_functions = line_functions_mat
+        line_functions.append(line_functions_mat)
+
+    trees = []
+    pencil_materials = [x for x in bpy.data.materials if getattr(x, "is_pcl4_material", False)]
+    for t in range(line_trees):
+        tree = bpy.data.node_groups.new(f"Line Tree {t}", fake_bpy.LINE_NODE_TREE_ID)
+        trees.append(tree)
+        for l in range(lines_per_tree):
+            line = _new_node(tree, _MP.LineNode, f"Line {t}-{l}", rng)
+            for s in range(line_sets_per_line):
+                prefix = f"{t}-{l}-{s}"
+                line_set = _new_node(tree, _MP.LineSetNode, f"LineSet {prefix}", rng)
+                tree.links.new(line.inputs[s], line_set.outputs[0])
+                line_set.objects.add().content = scene_objects[rng.randrange(len(scene_objects))]
+                if len(pencil_materials) > 0:
+                    line_set.materials.add().content = pencil_materials[rng.randrange(len(pencil_materials))]
+                _link(tree, line_set, "v_brush_settings", _new_brush(tree, f"{prefix} V", rng, True))
+                _link(tree, line_set, "h_brush_settings", _new_brush(tree, f"{prefix} H", rng, False))
+                _link(tree, line_set, "v_outline_brush_settings", _new_brush(tree, f"{prefix} VOutline", rng, False))
+                _link(tree, line_set, "v_size_reduction_settings",
+                      _new_node(tree, _MP.ReductionSettingsNode, f"{prefix} VSizeReduction", rng))
+    return trees